@@ -0,0 +1,84 @@
+"""
+Benchmark: analisis carta a carta vs. lote con nlp.pipe
+
+Compara el rendimiento de /validate y /generate_cloze antes y despues de
+agrupar los textos con nlp.pipe, sobre un mazo sintetico grande.
+
+Uso:
+    python benchmarks/bench_batch_parse.py --cards 2000 --model es_core_news_lg
+    python benchmarks/bench_batch_parse.py --cards 2000 --batch-size 128 --n-process 2
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = ["La celula", "El imperio romano", "Marie Curie", "La fotosintesis", "El teorema de Pitagoras",
+            "La Revolucion Francesa", "El ADN", "Isaac Newton", "La economia de mercado", "El sistema solar"]
+VERBS = ["explica", "describe", "transformo", "produce", "estudia", "permite", "contiene", "influyo en"]
+OBJECTS = ["la energia de la luz", "la estructura de la sociedad", "los procesos quimicos", "la historia de Europa",
+           "las leyes del movimiento", "la informacion genetica", "el comercio internacional", "los planetas"]
+
+
+def make_deck(n_cards, seed=13):
+    rng = random.Random(seed)
+    deck = []
+    for i in range(n_cards):
+        subject = rng.choice(SUBJECTS)
+        answer = f"{subject} {rng.choice(VERBS)} {rng.choice(OBJECTS)} desde {1500 + i % 500}."
+        deck.append({"question": f"¿Que {rng.choice(VERBS)} {subject.lower()}?", "answer": answer})
+    return deck
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--model", default=None, help="Nombre o ruta del modelo (por defecto el del registro)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ[f"FLASHGEN_MODEL_{args.lang.upper()}"] = args.model
+    # Sin cache: se mide el coste real del analisis
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+    os.environ.pop("FLASHGEN_DOC_CACHE_DIR", None)
+
+    import server
+
+    nlp = server.registry.get(args.lang)
+    if nlp is None:
+        sys.exit(server.model_error(args.lang))
+
+    deck = make_deck(args.cards)
+    texts = [c["question"] for c in deck] + [c["answer"] for c in deck]
+    nlp("calentamiento")
+
+    _, t_single = timed(lambda: [nlp(t) for t in texts])
+    _, t_pipe = timed(lambda: list(nlp.pipe(texts, batch_size=args.batch_size, n_process=args.n_process)))
+
+    payload = {"cards": deck, "lang": args.lang, "batch_size": args.batch_size, "n_process": args.n_process}
+    _, t_validate = timed(lambda: server.validate_flashcards(payload))
+    _, t_cloze = timed(lambda: server.generate_cloze(payload))
+
+    print(f"Mazo: {args.cards} cards ({len(texts)} textos) | modelo: {nlp.meta.get('name')} | "
+          f"batch_size={args.batch_size} n_process={args.n_process}")
+    print(f"  nlp(text) uno a uno : {t_single:8.2f}s  {len(texts) / t_single:9.1f} textos/s")
+    print(f"  nlp.pipe            : {t_pipe:8.2f}s  {len(texts) / t_pipe:9.1f} textos/s  (x{t_single / t_pipe:.2f})")
+    print(f"  /validate           : {t_validate:8.2f}s  {args.cards / t_validate:9.1f} cards/s")
+    print(f"  /generate_cloze     : {t_cloze:8.2f}s  {args.cards / t_cloze:9.1f} cards/s")
+
+
+if __name__ == "__main__":
+    main()
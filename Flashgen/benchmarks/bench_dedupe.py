@@ -0,0 +1,81 @@
+"""
+Benchmark: deteccion de casi duplicados con LSH frente a comparar todos los pares
+
+Genera n textos sinteticos (un 10% son copias con una palabra cambiada) y
+compara minhash_pairs (MinHash LSH) con el calculo de Jaccard de todos los
+pares, O(n^2). Comprueba ademas que LSH encuentra los mismos duplicados.
+
+Uso:
+    python benchmarks/bench_dedupe.py
+    python benchmarks/bench_dedupe.py --sizes 1000 5000 20000 --threshold 0.7
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import duplicate_report, minhash_pairs, shingles
+
+WORDS = ["celula", "energia", "proceso", "planta", "luz", "agua", "historia", "guerra", "rey", "tratado",
+         "molecula", "atomo", "fuerza", "masa", "tiempo", "ciudad", "rio", "montaña", "idioma", "numero"]
+
+
+def make_texts(n, words_per_text, duplicate_rate, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        if texts and rng.random() < duplicate_rate:
+            words = rng.choice(texts).split()
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+        else:
+            words = [rng.choice(WORDS) + str(rng.randrange(50)) for _ in range(words_per_text)]
+        texts.append(" ".join(words))
+    return texts
+
+
+def pairwise_pairs(texts, threshold):
+    """Referencia: Jaccard de todos los pares"""
+    sets = [shingles(text) for text in texts]
+    pairs = []
+    for j in range(len(sets)):
+        for i in range(j):
+            union = len(sets[i] | sets[j])
+            value = len(sets[i] & sets[j]) / union if union else 0.0
+            if value >= threshold:
+                pairs.append((i, j, value))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000])
+    parser.add_argument("--words", type=int, default=30)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--skip-pairwise", action="store_true", help="No medir la comparacion de todos los pares")
+    args = parser.parse_args()
+
+    print(f"{'textos':>7s} {'duplicados':>10s} {'lsh':>10s} {'todos':>10s} {'igual':>6s}")
+    for n in args.sizes:
+        texts = make_texts(n, args.words, args.duplicates)
+        start = time.perf_counter()
+        report = duplicate_report(n, minhash_pairs(texts, args.threshold))
+        t_lsh = time.perf_counter() - start
+        if args.skip_pairwise:
+            pairwise, same = "-", "-"
+        else:
+            start = time.perf_counter()
+            reference = duplicate_report(n, pairwise_pairs(texts, args.threshold))
+            t_all = time.perf_counter() - start
+            found = {item["index"] for item in report["duplicates"]}
+            expected = {item["index"] for item in reference["duplicates"]}
+            pairwise, same = f"{t_all * 1000:8.1f}ms", "si" if found == expected else f"{len(found & expected)}/{len(expected)}"
+        print(f"{n:7d} {len(report['duplicates']):10d} {t_lsh * 1000:8.1f}ms {pairwise:>10s} {same:>6s}")
+
+
+if __name__ == "__main__":
+    main()
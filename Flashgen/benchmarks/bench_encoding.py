@@ -0,0 +1,129 @@
+"""
+Benchmark: tamaño en la red y tiempo de codificacion por endpoint
+
+Genera la respuesta de cada endpoint una vez y mide, para cada formato
+(json estandar, orjson, MessagePack) y compresion (ninguna, gzip, brotli),
+los bytes resultantes y el tiempo de codificacion. Tambien muestra el efecto
+de una proyeccion ?fields= tipica. Los formatos cuyo paquete no esta
+instalado se omiten.
+
+Uso:
+    python benchmarks/bench_encoding.py --paragraphs 50
+    python benchmarks/bench_encoding.py --paragraphs 200 --repeat 3 --lang en
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = ("Marie Curie nacio en Varsovia en 1867. Estudio fisica y quimica en la Universidad de Paris. "
+             "Junto a Pierre Curie descubrio el polonio y el radio, y en 1903 recibio el Premio Nobel de Fisica. "
+             "Mas tarde obtuvo tambien el Nobel de Quimica, algo que nadie habia conseguido antes.")
+
+# Proyecciones tipicas de un cliente que solo necesita parte de la respuesta
+FIELDS = {
+    "process": ["chunks", "stats"],
+    "enhance": ["entities", "noun_phrases", "stats"],
+    "validate": ["stats"],
+    "generate_cloze": ["cloze_cards"],
+    "analyze": ["enrichment.entities", "cloze.stats"]
+}
+
+
+def timed(fn, repeat):
+    """Mejor tiempo de `repeat` ejecuciones y el ultimo resultado"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def make_payloads(lang, paragraphs):
+    text = "\n\n".join(PARAGRAPH for _ in range(paragraphs))
+    cards = [
+        {"question": "¿Donde nacio Marie Curie?", "answer": "Marie Curie nacio en Varsovia en 1867."},
+        {"question": "¿Que descubrio?", "answer": "Junto a Pierre Curie descubrio el polonio y el radio."}
+    ] * (paragraphs * 2)
+    return {
+        "process": {"text": text, "lang": lang, "strategy": "sentences",
+                    "include": ["sentences", "entities", "noun_chunks"]},
+        "enhance": {"text": text, "lang": lang},
+        "validate": {"cards": cards, "lang": lang},
+        "generate_cloze": {"cards": cards, "lang": lang},
+        "analyze": {"text": text, "lang": lang, "enhance": ["all"], "cards": cards,
+                    "validation": True, "cloze": {}}
+    }
+
+
+def encoders(encoding):
+    """(nombre, funcion contenido -> bytes) de los formatos disponibles"""
+    result = [("json", lambda c: json.dumps(c, ensure_ascii=False, default=encoding._default).encode("utf-8"))]
+    if encoding.orjson is not None:
+        result.append(("orjson", encoding.dumps_json))
+    if encoding.msgpack is not None:
+        result.append(("msgpack", encoding.dumps_msgpack))
+    return result
+
+
+def compressors(encoding):
+    result = [("-", None), ("gzip", lambda b: gzip.compress(b, compresslevel=encoding.GZIP_LEVEL))]
+    if encoding.brotli is not None:
+        result.append(("br", lambda b: encoding.brotli.compress(b, quality=encoding.BROTLI_QUALITY)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--paragraphs", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--endpoints", nargs="+", default=list(FIELDS), choices=list(FIELDS))
+    args = parser.parse_args()
+
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+    os.environ.pop("FLASHGEN_DOC_CACHE_DIR", None)
+
+    import encoding
+    import server
+
+    if server.registry.get(args.lang) is None:
+        sys.exit(server.model_error(args.lang))
+
+    payloads = make_payloads(args.lang, args.paragraphs)
+    print(f"{args.paragraphs} parrafos | mejor de {args.repeat} | "
+          f"orjson={'si' if encoding.orjson else 'no'} msgpack={'si' if encoding.msgpack else 'no'} "
+          f"brotli={'si' if encoding.brotli else 'no'}")
+    print(f"{'endpoint':15s} {'formato':8s} {'compr.':6s} {'bytes':>12s} {'codificar':>10s} {'comprimir':>10s}")
+
+    for name in args.endpoints:
+        handler, payload_model = server.POOL_HANDLERS[name]
+        payload = payloads[name]
+        content = handler(payload_model(**payload) if payload_model else payload)
+        if "error" in content:
+            print(f"{name:15s} error: {content['error']}")
+            continue
+
+        for label, fields in (("", None), (" fields", FIELDS[name])):
+            projected = encoding.project(content, fields)
+            for fmt, dumps in encoders(encoding):
+                body, t_encode = timed(lambda: dumps(projected), args.repeat)
+                for comp, compress in compressors(encoding):
+                    if compress is None:
+                        size, t_compress = len(body), 0.0
+                    else:
+                        compressed, t_compress = timed(lambda: compress(body), args.repeat)
+                        size = len(compressed)
+                    print(f"{name + label:15s} {fmt:8s} {comp:6s} {size:12,d} "
+                          f"{t_encode * 1000:8.1f}ms {t_compress * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
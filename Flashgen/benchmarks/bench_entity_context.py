@@ -0,0 +1,120 @@
+"""
+Benchmark: escalado de la estrategia entity_context con el tamaño del documento
+
+Construye Docs sinteticos (oraciones de longitud fija con entidades marcadas,
+sin modelo) de 10k a 100k tokens y compara la implementacion anterior
+(`sentences.index(ent.sent)` por entidad, O(entidades x oraciones)) con la
+actual (indice token -> oracion, lineal). Comprueba ademas que ambas dan la
+misma salida.
+
+Uso:
+    python benchmarks/bench_entity_context.py
+    python benchmarks/bench_entity_context.py --tokens 10000 50000 100000 200000 --ents-per-sent 2
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ["el", "estudio", "de", "la", "historia", "muestra", "que", "los", "cambios", "fueron", "lentos"]
+ENTITIES = [("Marie", "Curie", "PERSON"), ("Buenos", "Aires", "GPE"), ("Naciones", "Unidas", "ORG"),
+            ("mayo", "1810", "DATE"), ("Revolucion", "Francesa", "EVENT")]
+
+
+def legacy_entity_context(doc, context_window=1):
+    """Implementacion anterior (referencia para comparar salida y tiempo)"""
+    chunks = []
+    processed_sents = set()
+    sentences = list(doc.sents)
+    for ent in doc.ents:
+        if ent.label_ not in ['PERSON', 'ORG', 'GPE', 'LOC', 'DATE', 'EVENT', 'NORP']:
+            continue
+        sent = ent.sent
+        try:
+            sent_idx = sentences.index(sent)
+        except ValueError:
+            continue
+        if sent_idx in processed_sents:
+            continue
+        start = max(0, sent_idx - context_window)
+        end = min(len(sentences), sent_idx + context_window + 1)
+        chunks.append({
+            'text': ' '.join(s.text.strip() for s in sentences[start:end]),
+            'metadata': {
+                'entity': ent.text,
+                'entity_type': ent.label_,
+                'main_sentence': sent.text.strip(),
+                'type': 'entity_context'
+            }
+        })
+        processed_sents.update(range(start, end))
+    return chunks
+
+
+def make_doc(vocab, n_tokens, sent_len, ents_per_sent, every):
+    """Doc de ~n_tokens con `ents_per_sent` entidades en una de cada `every` oraciones"""
+    from spacy.tokens import Doc
+
+    words, sent_starts, ent_tags = [], [], []
+    sent = 0
+    while len(words) < n_tokens:
+        body = [WORDS[(sent + i) % len(WORDS)] for i in range(sent_len - 1)]
+        tags = ["O"] * len(body)
+        if sent % every == 0:
+            for k in range(ents_per_sent):
+                first, second, label = ENTITIES[(sent + k) % len(ENTITIES)]
+                pos = 1 + k * 3
+                if pos + 1 < len(body):
+                    body[pos:pos + 2] = [first, second]
+                    tags[pos:pos + 2] = [f"B-{label}", f"I-{label}"]
+        words.extend(body + ["."])
+        ent_tags.extend(tags + ["O"])
+        sent_starts.extend([True] + [False] * (len(body)))
+        sent += 1
+    return Doc(vocab, words=words, sent_starts=sent_starts, ents=ent_tags)
+
+
+def timed(fn, doc, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(doc)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10000, 25000, 50000, 100000])
+    parser.add_argument("--sent-len", type=int, default=20)
+    parser.add_argument("--ents-per-sent", type=int, default=2)
+    parser.add_argument("--every", type=int, default=2, help="Entidades en una de cada N oraciones")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="No medir la implementacion anterior")
+    args = parser.parse_args()
+
+    import spacy
+    from server import segment_entity_context
+
+    vocab = spacy.blank("es").vocab
+    print(f"{'tokens':>8s} {'oraciones':>9s} {'entidades':>9s} {'chunks':>7s} "
+          f"{'actual':>10s} {'us/token':>9s} {'anterior':>10s} {'igual':>6s}")
+    for n_tokens in args.tokens:
+        doc = make_doc(vocab, n_tokens, args.sent_len, args.ents_per_sent, args.every)
+        n_sents = sum(1 for _ in doc.sents)
+        chunks, t_new = timed(segment_entity_context, doc, args.repeat)
+        if args.skip_legacy:
+            legacy, same = "-", "-"
+        else:
+            legacy_chunks, t_old = timed(legacy_entity_context, doc, 1)
+            legacy, same = f"{t_old * 1000:8.1f}ms", "si" if legacy_chunks == chunks else "NO"
+        print(f"{len(doc):8d} {n_sents:9d} {len(doc.ents):9d} {len(chunks):7d} "
+              f"{t_new * 1000:8.1f}ms {t_new * 1e6 / len(doc):9.2f} {legacy:>10s} {same:>6s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Regresion y benchmark: ejecucion parcial de pipelines (nlp_pipes.py)
+
+1. Regresion sin modelo: un pipeline con componentes funcion (@Language.component,
+   sin .pipe, como merge_entities o doc_cleaner) ejecutado con run_components,
+   parse_components y pipe_components, con y sin component_timer, debe dar el
+   mismo Doc que nlp(text, disable=...) para cada subconjunto de componentes.
+2. Con el modelo del idioma (si esta disponible): mismo resultado y tiempo de
+   pipe_components frente a nlp.pipe para el pipeline completo y uno parcial.
+
+Uso:
+    python benchmarks/bench_nlp_pipes.py
+    python benchmarks/bench_nlp_pipes.py --lang en --texts 200
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEXT = "El rey firmo el tratado. Luego volvio a Madrid con su corte. La paz duro diez años."
+
+
+def function_pipeline():
+    """Pipeline en blanco con tres componentes funcion, cada uno con un efecto distinto"""
+    import spacy
+    from spacy.language import Language
+
+    @Language.component("bench_sents")
+    def bench_sents(doc):
+        for token in doc[1:]:
+            token.is_sent_start = doc[token.i - 1].text == "."
+        return doc
+
+    @Language.component("bench_tags")
+    def bench_tags(doc):
+        for token in doc:
+            token.tag_ = "PUNCT" if token.is_punct else "W"
+        return doc
+
+    @Language.component("bench_norms")
+    def bench_norms(doc):
+        for token in doc:
+            token.norm_ = token.text.upper()
+        return doc
+
+    nlp = spacy.blank("es")
+    for name in ("bench_sents", "bench_tags", "bench_norms"):
+        nlp.add_pipe(name)
+    return nlp
+
+
+def doc_state(doc):
+    from spacy.attrs import NORM, SENT_START, TAG
+
+    return doc.to_array([SENT_START, TAG, NORM]).tolist()
+
+
+def check_function_components():
+    import nlp_pipes
+
+    nlp = function_pipeline()
+    names = nlp.pipe_names
+    failures = 0
+    for timer in (None, lambda name, seconds: None):
+        nlp_pipes.set_component_timer(timer)
+        for size in range(1, len(names) + 1):
+            for subset in itertools.combinations(names, size):
+                expected = doc_state(nlp(TEXT, disable=[name for name in names if name not in subset]))
+                results = {
+                    "run_components": doc_state(next(iter(nlp_pipes.run_components(nlp, [TEXT], subset)))),
+                    "parse_components": doc_state(nlp_pipes.parse_components(nlp, TEXT, list(subset))),
+                    "pipe_components": doc_state(next(iter(nlp_pipes.pipe_components(nlp, [TEXT], list(subset)))))
+                }
+                for function, state in results.items():
+                    if state != expected:
+                        failures += 1
+                        print(f"❌ {function} {list(subset)} (timer={'si' if timer else 'no'}) no coincide con nlp()")
+    nlp_pipes.set_component_timer(None)
+    print(f"{'✅' if not failures else '❌'} componentes funcion: {failures} diferencias")
+    return failures
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_model(lang, n_texts):
+    import nlp_pipes
+    import server
+    from corpus import make_text
+
+    nlp = server.registry.get(lang)
+    if nlp is None:
+        print(f"⚠️ Sin modelo para {lang}: solo la regresion sin modelo")
+        return 0
+    texts = [make_text(lang, 2048, seed=seed) for seed in range(n_texts)]
+    failures = 0
+    cases = [("completo", None), ("parcial (sintaxis)", server.SYNTAX_COMPONENTS)]
+    print(f"{'pipeline':20s} {'nlp.pipe':>10s} {'pipe_components':>16s} {'igual':>6s}")
+    for label, needs in cases:
+        components = None if needs is None else nlp_pipes.resolve_components(nlp, needs)
+        disable = [] if components is None else [name for name in nlp.pipe_names if name not in components]
+        expected, base = timed(lambda: [doc.to_bytes() for doc in nlp.pipe(texts, disable=disable)])
+        actual, elapsed = timed(lambda: [doc.to_bytes() for doc in nlp_pipes.pipe_components(nlp, texts, components)])
+        same = expected == actual
+        failures += not same
+        print(f"{label:20s} {base * 1000:8.1f}ms {elapsed * 1000:14.1f}ms {'si' if same else 'NO':>6s}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--texts", type=int, default=50)
+    args = parser.parse_args()
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+
+    failures = check_function_components()
+    failures += bench_model(args.lang, args.texts)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
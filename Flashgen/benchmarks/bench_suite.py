@@ -0,0 +1,334 @@
+"""
+Suite de benchmarks reproducible: estrategias de segmentacion y endpoints
+
+Mide cada estrategia de /process (sentences ... verb_phrase_segment) y los
+endpoints /process, /enhance, /validate y /generate_cloze sobre un corpus
+sintetico fijo (benchmarks/corpus.py): cards cortas, articulos de ~10 KB y
+libros de ~1 MB en es/en/fr. Por caso informa tiempo, tokens/s, pico de RSS
+y tamaño de la respuesta, y guarda un JSON estable para comparar ejecuciones.
+
+Pipelines:
+- blank: spacy.blank + sentencizer, sin descargas (las estrategias que
+  necesitan parser/NER se registran con su error); util en CI
+- sm / lg: modelos *_sm / *_lg instalados
+- --model es=/ruta/modelo para usar cualquier otro pipeline
+
+Modos:
+- direct: llama a las funciones de server.py (analisis y segmentacion por separado)
+- e2e: peticiones HTTP a traves de FastAPI TestClient
+
+Uso:
+    python benchmarks/bench_suite.py --pipeline blank --output base.json
+    python benchmarks/bench_suite.py --pipeline blank --compare base.json --threshold 0.25
+    python benchmarks/bench_suite.py --pipeline lg --langs es --sizes article book --mode e2e
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import corpus  # noqa: E402
+
+STRATEGIES = ["sentences", "entities", "noun_chunks", "semantic_similarity", "chapter_sents",
+              "entity_context", "semantic_blocks", "vocab_extract", "clause_segment", "verb_phrase_segment"]
+ENDPOINTS = ["process", "enhance", "validate", "generate_cloze"]
+SIZES = ["cards", "article", "book"]
+
+SMALL_MODELS = {"es": "es_core_news_sm", "en": "en_core_web_sm", "fr": "fr_core_news_sm"}
+
+
+class RssSampler:
+    """Pico de RSS (MB por encima del valor inicial) muestreado en segundo plano"""
+
+    def __init__(self, interval=0.005):
+        from model_registry import _rss_mb
+        self._rss_mb = _rss_mb
+        self.interval = interval
+        self.peak = 0.0
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._rss_mb()
+            if rss is not None:
+                self.peak = max(self.peak, rss - self.baseline)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = self._rss_mb() or 0.0
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = self._rss_mb()
+        if rss is not None:
+            self.peak = max(self.peak, rss - self.baseline)
+
+
+def setup_pipeline(args):
+    """Configura FLASHGEN_MODEL_<LANG> antes de importar server"""
+    if args.pipeline == "blank":
+        import spacy
+        root = tempfile.mkdtemp(prefix="flashgen-bench-")
+        for lang in args.langs:
+            nlp = spacy.blank(lang)
+            nlp.add_pipe("sentencizer")
+            path = os.path.join(root, f"{lang}_blank")
+            nlp.to_disk(path)
+            os.environ[f"FLASHGEN_MODEL_{lang.upper()}"] = path
+    elif args.pipeline == "sm":
+        for lang in args.langs:
+            os.environ[f"FLASHGEN_MODEL_{lang.upper()}"] = SMALL_MODELS[lang]
+    for override in args.model or []:
+        lang, _, model = override.partition("=")
+        os.environ[f"FLASHGEN_MODEL_{lang.upper()}"] = model
+
+    # Sin cache ni pool: se mide el coste real de cada peticion
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+    os.environ.pop("FLASHGEN_DOC_CACHE_DIR", None)
+    os.environ["FLASHGEN_WORKERS"] = "0"
+    os.environ.setdefault("FLASHGEN_JOB_DB", ":memory:")
+
+
+def build_corpus(args):
+    data = {}
+    for lang in args.langs:
+        data[lang] = {
+            "cards": corpus.make_cards(lang, args.cards, seed=args.seed),
+            "article": corpus.make_article(lang, args.article_kb, seed=args.seed),
+            "book": corpus.make_book(lang, args.book_kb, seed=args.seed)
+        }
+    return data
+
+
+def count_tokens(nlp, size, data):
+    if size == "cards":
+        return sum(len(nlp.make_doc(c["question"])) + len(nlp.make_doc(c["answer"])) for c in data)
+    return len(nlp.make_doc(data))
+
+
+def measure(fn, repeat):
+    """Ejecuta fn `repeat` veces: (ultimo resultado, mejor tiempo, pico de RSS)"""
+    best = None
+    peak = 0.0
+    result = None
+    for _ in range(repeat):
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        peak = max(peak, sampler.peak)
+    return result, best, peak
+
+
+class DirectRunner:
+    """Llama a las funciones de server.py sin pasar por HTTP"""
+
+    def __init__(self, server):
+        self.server = server
+        from encoding import dumps_json
+        self.dumps = dumps_json
+
+    def strategy(self, lang, text, strategy, repeat):
+        server = self.server
+        timings = {}
+
+        def run():
+            start = time.perf_counter()
+            doc = server.get_doc(lang, text, needs=server.process_components(strategy))
+            timings["parse_s"] = time.perf_counter() - start
+            start = time.perf_counter()
+            response = server.process_doc(doc, text, strategy, set())
+            timings["segment_s"] = time.perf_counter() - start
+            return response
+
+        try:
+            response, wall, peak = measure(run, repeat)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        return {"wall_s": wall, "rss_peak_mb": peak, "response_bytes": len(self.dumps(response)), **timings}
+
+    def endpoint(self, name, payload, repeat):
+        handler, payload_model = self.server.POOL_HANDLERS[name]
+        try:
+            response, wall, peak = measure(
+                lambda: handler(payload_model(**payload) if payload_model else payload), repeat
+            )
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        if isinstance(response, dict) and "error" in response:
+            return {"error": response["error"], "wall_s": wall}
+        return {"wall_s": wall, "rss_peak_mb": peak, "response_bytes": len(self.dumps(response))}
+
+
+class EndToEndRunner:
+    """Peticiones HTTP a traves de FastAPI TestClient"""
+
+    def __init__(self, server):
+        from fastapi.testclient import TestClient
+        self.client = TestClient(server.app, raise_server_exceptions=False)
+
+    def _post(self, path, payload, repeat):
+        headers = {"Accept-Encoding": "identity"}
+        response, wall, peak = measure(lambda: self.client.post(path, json=payload, headers=headers), repeat)
+        body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        if response.status_code != 200 or (isinstance(body, dict) and "error" in body):
+            return {"error": body.get("error", f"HTTP {response.status_code}"), "wall_s": wall}
+        return {"wall_s": wall, "rss_peak_mb": peak, "response_bytes": len(response.content)}
+
+    def strategy(self, lang, text, strategy, repeat):
+        return self._post("/process", {"text": text, "lang": lang, "strategy": strategy}, repeat)
+
+    def endpoint(self, name, payload, repeat):
+        return self._post(f"/{name}", payload, repeat)
+
+
+def endpoint_payload(name, lang, size, data):
+    if name in ("validate", "generate_cloze"):
+        return {"cards": data, "lang": lang} if size == "cards" else None
+    if size == "cards":
+        return None
+    payload = {"text": data, "lang": lang}
+    if name == "process":
+        payload["strategy"] = "sentences"
+    return payload
+
+
+def finish_case(case, tokens):
+    case["tokens"] = tokens
+    if "wall_s" in case and "error" not in case:
+        case["tokens_per_s"] = tokens / case["wall_s"] if case["wall_s"] > 0 else None
+    for key, value in list(case.items()):
+        if isinstance(value, float):
+            case[key] = round(value, 4 if key.endswith("_s") else 2)
+    return case
+
+
+def format_case(case_id, case):
+    if "error" in case:
+        return f"{case_id:55s} error: {case['error'][:70]}"
+    extra = ""
+    if "parse_s" in case:
+        extra = f"  (analisis {case['parse_s']:.3f}s + segmentacion {case['segment_s']:.3f}s)"
+    return (f"{case_id:55s} {case['wall_s']:8.3f}s  {case.get('tokens_per_s') or 0:10.0f} tok/s  "
+            f"RSS +{case['rss_peak_mb']:7.1f} MB  {case['response_bytes']:10,d} B{extra}")
+
+
+def compare(results, baseline_path, threshold, min_time=0.0):
+    """
+    Compara tiempos con una ejecucion anterior; devuelve el numero de regresiones.
+    Los casos por debajo de `min_time` segundos se muestran pero no cuentan (ruido).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["cases"]
+    regressions = 0
+    print(f"\nComparacion con {baseline_path} (umbral +{threshold:.0%}):")
+    for case_id, case in sorted(results.items()):
+        old = baseline.get(case_id)
+        if not old or "wall_s" not in old or "wall_s" not in case or "error" in case:
+            continue
+        ratio = case["wall_s"] / old["wall_s"] if old["wall_s"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold and max(case["wall_s"], old["wall_s"]) >= min_time:
+            flag = "  ⚠️ REGRESION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  ✅ mejora"
+        print(f"  {case_id:55s} {old['wall_s']:9.4f}s -> {case['wall_s']:9.4f}s  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", choices=["blank", "sm", "lg"], default="blank")
+    parser.add_argument("--model", action="append", help="Modelo para un idioma: es=/ruta/o/nombre")
+    parser.add_argument("--mode", choices=["direct", "e2e"], default="direct")
+    parser.add_argument("--langs", nargs="+", default=corpus.LANGS, choices=corpus.LANGS)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, choices=SIZES)
+    parser.add_argument("--strategies", nargs="*", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--endpoints", nargs="*", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--article-kb", type=int, default=10)
+    parser.add_argument("--book-kb", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--repeat", type=int, default=1, help="Se guarda el mejor tiempo")
+    parser.add_argument("--output", help="Fichero JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecucion anterior")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regresion relativa tolerada")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Segundos por debajo de los cuales no se marca regresion")
+    args = parser.parse_args()
+
+    setup_pipeline(args)
+    import server
+    import spacy
+
+    data = build_corpus(args)
+    models = {}
+    for lang in args.langs:
+        nlp = server.registry.get(lang)
+        if nlp is None:
+            sys.exit(server.model_error(lang))
+        # Los libros de ~1 MB superan el limite por defecto de spaCy
+        nlp.max_length = max(nlp.max_length, len(data[lang]["book"]) + 1)
+        nlp("calentamiento")
+        models[lang] = {"model": nlp.meta.get("name"), "version": nlp.meta.get("version"), "pipes": nlp.pipe_names}
+
+    runner = DirectRunner(server) if args.mode == "direct" else EndToEndRunner(server)
+    results = {}
+    for lang in args.langs:
+        for size in args.sizes:
+            sample = data[lang][size]
+            tokens = count_tokens(server.registry.get(lang), size, sample)
+            if size != "cards":
+                for strategy in args.strategies:
+                    case_id = f"strategy/{strategy}/{lang}/{size}"
+                    results[case_id] = finish_case(runner.strategy(lang, sample, strategy, args.repeat), tokens)
+                    print(format_case(case_id, results[case_id]), flush=True)
+            for name in args.endpoints:
+                payload = endpoint_payload(name, lang, size, sample)
+                if payload is None:
+                    continue
+                case_id = f"endpoint/{name}/{lang}/{size}"
+                results[case_id] = finish_case(runner.endpoint(name, payload, args.repeat), tokens)
+                print(format_case(case_id, results[case_id]), flush=True)
+
+    report = {
+        "meta": {
+            "pipeline": args.pipeline,
+            "mode": args.mode,
+            "models": models,
+            "corpus": {"cards": args.cards, "article_kb": args.article_kb, "book_kb": args.book_kb, "seed": args.seed},
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "spacy": spacy.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "cases": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold, args.min_time):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: syntax_analysis de /enhance por token frente al formato columnar
+
+Para un texto sintetico (benchmarks/corpus.py) mide el tiempo de construir la
+seccion syntax_analysis en cada formato, el de codificarla en JSON y los bytes
+resultantes. Comprueba ademas que el formato columnar contiene lo mismo:
+reconstruye a partir de las columnas el dict por token de cada oracion
+(text, dep, pos, head, root_verb, root_pos y el texto de la oracion) y lo
+compara con el formato por token.
+
+Uso:
+    python benchmarks/bench_syntax_columns.py
+    python benchmarks/bench_syntax_columns.py --kb 500 --lang en --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def timed(fn, repeat):
+    """Mejor tiempo de `repeat` ejecuciones y el ultimo resultado"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def from_columns(columns):
+    """Formato por token reconstruido a partir de las columnas"""
+    labels = columns["labels"]
+    texts = columns["texts"]
+    sentences = []
+    for s, root in enumerate(columns["roots"]):
+        if root < 0:
+            continue
+        start, end = columns["sentences"][s], columns["sentences"][s + 1]
+        # Como Span.text: sin el espacio que sigue al ultimo token
+        sentence = "".join(texts[i] + (" " if columns["spaces"][i] else "") for i in range(start, end - 1))
+        sentences.append({
+            "sentence": sentence + texts[end - 1],
+            "root_verb": columns["root_lemmas"][s],
+            "root_pos": labels["pos"][columns["pos"][root]],
+            "dependencies": [
+                {
+                    "text": texts[i],
+                    "dep": labels["dep"][columns["deps"][i]],
+                    "pos": labels["pos"][columns["pos"][i]],
+                    "head": texts[columns["heads"][i]]
+                }
+                for i in range(start, end)
+            ]
+        })
+    return sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--kb", type=int, default=100, help="Tamaño del texto")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+
+    import server
+    from corpus import make_text
+    from doc_view import DocView
+    from syntax_extract import syntax_columns
+
+    if server.registry.get(args.lang) is None:
+        print(f"❌ {server.model_error(args.lang)}")
+        return
+    text = make_text(args.lang, args.kb * 1024)
+    doc = server.get_doc(args.lang, text, needs=server.SYNTAX_COMPONENTS)
+    dumps = orjson.dumps if orjson is not None else (lambda value: json.dumps(value).encode("utf-8"))
+
+    rows, rows_time = timed(lambda: server.enrich_syntax(doc), args.repeat)
+    # Vista nueva en cada repeticion: se mide tambien el calculo de oraciones y ROOT
+    columns, columns_time = timed(lambda: syntax_columns(DocView(doc)), args.repeat)
+    rows_json, rows_encode = timed(lambda: dumps(rows), args.repeat)
+    columns_json, columns_encode = timed(lambda: dumps(columns), args.repeat)
+
+    print(f"📄 {len(doc)} tokens, {len(text.encode('utf-8'))} bytes de texto, JSON con "
+          f"{'orjson' if orjson is not None else 'json'}")
+    print(f"{'formato':10s} {'construir':>10s} {'codificar':>10s} {'bytes':>10s}")
+    print(f"{'tokens':10s} {rows_time * 1000:8.1f}ms {rows_encode * 1000:8.1f}ms {len(rows_json):10d}")
+    print(f"{'columnar':10s} {columns_time * 1000:8.1f}ms {columns_encode * 1000:8.1f}ms {len(columns_json):10d}")
+    print(f"✅ mismo contenido: {'si' if from_columns(columns) == rows else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Benchmark y regresion: extraccion sintactica con arrays (syntax_extract.py)
+
+Compara clause_segment, verb_phrase_segment, las verb_phrases de /enhance y
+los sintagmas verbales de cloze con sus implementaciones anteriores (recorridos
+recursivos de token.children / token.subtree) y comprueba que dan la misma
+salida sobre:
+- un texto sintetico analizado con el modelo (benchmarks/corpus.py)
+- arboles sinteticos sin modelo: arboles aleatorios (proyectivos y no
+  proyectivos) y una cadena profunda, donde la implementacion anterior recorre
+  token.subtree una vez por verbo (coste cuadratico) y puede agotar la recursion
+
+Cada funcion se mide sola sobre el Doc (sin la DocView de la anterior), como
+cuando una card o un chunk pasa por una unica etapa. Con
+FLASHGEN_SYNTAX_ARRAYS_MIN_TOKENS=0 (o muy alto) se fuerza la ruta con tablas
+(o sin ellas) para todos los docs.
+
+Uso:
+    python benchmarks/bench_syntax_extract.py
+    python benchmarks/bench_syntax_extract.py --kb 200 --model es_core_news_lg --random-docs 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEPS = ["nsubj", "obj", "obl", "advmod", "amod", "det", "case", "cc", "conj", "aux", "iobj", "nmod"]
+POS_TAGS = ["NOUN", "VERB", "ADJ", "DET", "ADP", "CCONJ", "ADV", "PRON", "AUX"]
+WORDS = ["el", "rey", "firmo", "y", "tratado", "con", "Francia", "pero", "luego", "mas", "paz", "or"]
+
+
+# --- Implementaciones anteriores (referencia) ---
+
+def legacy_extract_clause(verb):
+    clause = [verb]
+
+    def get_subtree(token):
+        for child in token.children:
+            if child.dep_ in ['cc', 'conj'] and child.pos_ == 'CCONJ':
+                continue
+            clause.append(child)
+            get_subtree(child)
+
+    get_subtree(verb)
+    return clause
+
+
+def legacy_split_by_conjunctions(tokens):
+    sub_clauses = []
+    current = []
+    conjunctions = ['y', 'pero', 'mas', 'sino', 'o', 'and', 'but', 'or', 'yet']
+    for token in sorted(tokens, key=lambda x: x.i):
+        if token.text.lower() in conjunctions and len(current) > 5:
+            sub_clauses.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        sub_clauses.append(current)
+    return sub_clauses if len(sub_clauses) > 1 else [tokens]
+
+
+def legacy_segment_clause(doc, max_tokens=15):
+    chunks = []
+    for sent in doc.sents:
+        root_verbs = [token for token in sent if token.dep_ == 'ROOT']
+        if not root_verbs:
+            chunks.append({'text': sent.text.strip(), 'metadata': {'type': 'complete', 'clause_type': 'no_verb'}})
+            continue
+        for verb in root_verbs:
+            clause_tokens = legacy_extract_clause(verb)
+            clause_text = ' '.join(t.text for t in sorted(clause_tokens, key=lambda x: x.i))
+            if len(clause_tokens) > max_tokens:
+                for sub in legacy_split_by_conjunctions(clause_tokens):
+                    sub_text = ' '.join(t.text for t in sorted(sub, key=lambda x: x.i))
+                    chunks.append({'text': sub_text.strip(), 'metadata': {
+                        'type': 'sub_clause', 'verb': verb.lemma_, 'verb_pos': verb.pos_, 'num_tokens': len(sub)}})
+            else:
+                chunks.append({'text': clause_text.strip(), 'metadata': {
+                    'type': 'clause', 'verb': verb.lemma_, 'verb_pos': verb.pos_, 'num_tokens': len(clause_tokens)}})
+    return chunks
+
+
+def legacy_segment_verb_phrase(doc, min_words=3):
+    chunks = []
+    for sent in doc.sents:
+        for token in sent:
+            if token.pos_ != 'VERB':
+                continue
+            vp_tokens = [token]
+            for child in token.children:
+                if child.dep_ in ['obj', 'dobj', 'iobj', 'obl', 'advmod', 'neg', 'aux', 'auxpass']:
+                    vp_tokens.append(child)
+                    vp_tokens.extend(list(child.subtree))
+            vp_text = ' '.join(t.text for t in sorted(set(vp_tokens), key=lambda x: x.i))
+            if len(vp_text.split()) >= min_words:
+                chunks.append({'text': vp_text.strip(), 'metadata': {
+                    'type': 'verb_phrase', 'verb': token.lemma_, 'verb_text': token.text,
+                    'verb_pos': token.pos_, 'num_words': len(vp_text.split())}})
+    return chunks
+
+
+def legacy_enrich_verb_phrases(doc):
+    verb_phrases = []
+    for token in doc:
+        if token.pos_ == "VERB":
+            vp_components = [token]
+            for child in token.children:
+                if child.dep_ in ["obj", "dobj", "iobj", "obl", "advmod"]:
+                    vp_components.extend(list(child.subtree))
+            vp_text = " ".join(t.text for t in sorted(set(vp_components), key=lambda x: x.i))
+            verb_phrases.append({"text": vp_text, "verb": token.lemma_,
+                                 "tense": token.morph.get("Tense"), "mood": token.morph.get("Mood")})
+    return verb_phrases
+
+
+def legacy_cloze_verb_phrases(doc):
+    spans = []
+    for token in doc:
+        if token.pos_ != "VERB":
+            continue
+        objects = [child for child in token.children if child.dep_ in ("obj", "dobj")]
+        if objects:
+            start = min(token.i, min(child.left_edge.i for child in objects))
+            end = max(token.i, max(child.right_edge.i for child in objects)) + 1
+            spans.append((start, end, token.lemma_))
+    return spans
+
+
+# --- Docs sinteticos ---
+
+def random_doc(vocab, rng, n_tokens, projective):
+    """Arbol aleatorio (una raiz por oracion de ~12 tokens); no proyectivo si projective=False"""
+    from spacy.tokens import Doc
+
+    words = [rng.choice(WORDS) for _ in range(n_tokens)]
+    heads, deps, sent_starts = [], [], []
+    for start in range(0, n_tokens, 12):
+        end = min(start + 12, n_tokens)
+        root = rng.randrange(start, end)
+        # Orden aleatorio con la raiz primero: cada token depende de uno anterior en ese orden
+        order = list(range(start, end))
+        rng.shuffle(order)
+        order.remove(root)
+        order.insert(0, root)
+        for i in range(start, end):
+            if i == root:
+                heads.append(i)
+                deps.append("ROOT")
+            else:
+                if projective:
+                    # Padre adyacente en direccion a la raiz: siempre proyectivo
+                    heads.append(i + 1 if i < root else i - 1)
+                else:
+                    # Padre anterior en el orden aleatorio: arbol valido, a menudo no proyectivo
+                    heads.append(order[rng.randrange(0, order.index(i))])
+                deps.append(rng.choice(DEPS))
+            sent_starts.append(i == start)
+    pos = [rng.choice(POS_TAGS) for _ in range(n_tokens)]
+    doc = Doc(vocab, words=words, heads=heads, deps=deps, pos=pos, sent_starts=sent_starts)
+    return doc
+
+
+def deep_doc(vocab, n_tokens):
+    """Una sola oracion en cadena (cada token depende del siguiente): profundidad n_tokens"""
+    from spacy.tokens import Doc
+
+    words = [WORDS[i % len(WORDS)] for i in range(n_tokens)]
+    heads = [i + 1 for i in range(n_tokens - 1)] + [n_tokens - 1]
+    deps = [DEPS[i % len(DEPS)] for i in range(n_tokens - 1)] + ["ROOT"]
+    pos = ["VERB" if i % 5 == 0 else POS_TAGS[i % len(POS_TAGS)] for i in range(n_tokens)]
+    return Doc(vocab, words=words, heads=heads, deps=deps, pos=pos)
+
+
+def compare(doc, results):
+    from cloze import _verb_phrases
+    from doc_view import USER_DATA_KEY
+    from server import enrich_verb_phrases, segment_clause, segment_verb_phrase
+
+    pairs = [
+        ("clause_segment", lambda: segment_clause(doc), lambda: legacy_segment_clause(doc)),
+        ("verb_phrase_segment", lambda: segment_verb_phrase(doc), lambda: legacy_segment_verb_phrase(doc)),
+        ("enhance verb_phrases", lambda: enrich_verb_phrases(doc), lambda: legacy_enrich_verb_phrases(doc)),
+        ("cloze verb_phrases",
+         lambda: [(span.start, span.end, info["verb"]) for span, info in _verb_phrases(doc)],
+         lambda: legacy_cloze_verb_phrases(doc)),
+    ]
+    for name, new, old in pairs:
+        entry = results.setdefault(name, {"new": 0.0, "old": 0.0, "same": True, "legacy_errors": 0})
+        doc.user_data.pop(USER_DATA_KEY, None)
+        start = time.perf_counter()
+        new_result = new()
+        entry["new"] += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            old_result = old()
+        except RecursionError:
+            entry["legacy_errors"] += 1
+            continue
+        entry["old"] += time.perf_counter() - start
+        if new_result != old_result:
+            entry["same"] = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--model", default=None, help="Nombre o ruta del modelo (por defecto el del registro)")
+    parser.add_argument("--kb", type=int, default=100, help="Tamaño del texto analizado con el modelo")
+    parser.add_argument("--random-docs", type=int, default=200)
+    parser.add_argument("--deep-tokens", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ[f"FLASHGEN_MODEL_{args.lang.upper()}"] = args.model
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+
+    import spacy
+    import server
+    from corpus import make_text
+
+    print(f"{'caso':24s} {'funcion':22s} {'actual':>10s} {'anterior':>10s} {'igual':>6s} {'recursion':>9s}")
+
+    def report(case, results):
+        for name, entry in results.items():
+            print(f"{case:24s} {name:22s} {entry['new'] * 1000:8.1f}ms {entry['old'] * 1000:8.1f}ms "
+                  f"{'si' if entry['same'] else 'NO':>6s} {entry['legacy_errors']:9d}")
+
+    nlp = server.registry.get(args.lang)
+    if nlp is not None:
+        doc = server.get_doc(args.lang, make_text(args.lang, args.kb * 1024), needs=server.SYNTAX_COMPONENTS)
+        results = {}
+        compare(doc, results)
+        report(f"modelo ({len(doc)} tok)", results)
+    else:
+        print(f"⚠️ Sin modelo para {args.lang}: solo arboles sinteticos")
+
+    vocab = spacy.blank(args.lang).vocab
+    rng = random.Random(7)
+    for projective in (True, False):
+        results = {}
+        for _ in range(args.random_docs):
+            compare(random_doc(vocab, rng, rng.randrange(1, 120), projective), results)
+        report("aleatorio " + ("proyectivo" if projective else "no proyectivo"), results)
+
+    results = {}
+    compare(deep_doc(vocab, args.deep_tokens), results)
+    report(f"cadena ({args.deep_tokens} tok)", results)
+
+
+if __name__ == "__main__":
+    main()
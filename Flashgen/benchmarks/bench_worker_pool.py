@@ -0,0 +1,99 @@
+"""
+Benchmark: threadpool vs. pool de procesos con clientes concurrentes
+
+Lanza N clientes concurrentes (1, 2, 4, 8) contra /process, /enhance y
+/validate dentro del mismo proceso (httpx + ASGITransport, sin red) y mide
+peticiones/s. Ejecutar una vez sin pool y otra con FLASHGEN_WORKERS para comparar.
+
+Uso:
+    python benchmarks/bench_worker_pool.py --requests 64
+    FLASHGEN_WORKERS=4 python benchmarks/bench_worker_pool.py --requests 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = ("Marie Curie nacio en Varsovia en 1867. Estudio fisica y quimica en la Universidad de Paris. "
+             "Junto a Pierre Curie descubrio el polonio y el radio, y en 1903 recibio el Premio Nobel de Fisica. "
+             "Mas tarde obtuvo tambien el Nobel de Quimica, algo que nadie habia conseguido antes. ")
+
+
+def make_requests(lang, paragraphs):
+    text = "\n\n".join(PARAGRAPH for _ in range(paragraphs))
+    cards = [{"question": "¿Donde nacio Marie Curie?", "answer": "Marie Curie nacio en Varsovia en 1867."}] * 20
+    return {
+        "process": ("/process", {"text": text, "lang": lang, "strategy": "semantic_blocks"}),
+        "enhance": ("/enhance", {"text": text, "lang": lang}),
+        "validate": ("/validate", {"cards": cards, "lang": lang})
+    }
+
+
+async def run_level(client, path, body, concurrency, total):
+    """Lanza `total` peticiones con como maximo `concurrency` en vuelo"""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+
+    async def one(i):
+        # Cada peticion con un texto distinto para que el cache no sirva el resultado
+        payload = dict(body)
+        if "text" in payload:
+            payload["text"] = f"{payload['text']} ({i})"
+        async with semaphore:
+            response = await client.post(path, json=payload)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(1 for s in statuses if s == 200)
+
+
+async def main_async(args):
+    import httpx
+    import server
+
+    transport = httpx.ASGITransport(app=server.app)
+    requests = make_requests(args.lang, args.paragraphs)
+    mode = f"pool de {server.worker_pool.workers} procesos" if server.worker_pool else "threadpool"
+    print(f"Modo: {mode} | {args.requests} peticiones por nivel | {os.cpu_count()} CPUs")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Calentamiento: carga de modelos (tambien en cada proceso del pool)
+        path, body = requests["process"]
+        await run_level(client, path, body, args.levels[-1], args.levels[-1])
+
+        for name in args.endpoints:
+            path, body = requests[name]
+            for concurrency in args.levels:
+                elapsed, ok = await run_level(client, path, body, concurrency, args.requests)
+                print(f"  {path:10s} c={concurrency:<2d}: {elapsed:7.2f}s  {args.requests / elapsed:7.1f} req/s  "
+                      f"({ok}/{args.requests} OK)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32, help="Peticiones por nivel de concurrencia")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--lang", default="es")
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--endpoints", nargs="+", default=["process", "enhance", "validate"],
+                        choices=["process", "enhance", "validate"])
+    args = parser.parse_args()
+
+    # Sin cache y sin limite de cola: se mide el coste real del analisis
+    os.environ["FLASHGEN_DOC_CACHE_MB"] = "0"
+    os.environ.pop("FLASHGEN_DOC_CACHE_DIR", None)
+    workers = int(os.environ.get("FLASHGEN_WORKERS", "0") or 0)
+    if workers and "FLASHGEN_WORKER_QUEUE" not in os.environ:
+        os.environ["FLASHGEN_WORKER_QUEUE"] = str(max(args.levels) * 2)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
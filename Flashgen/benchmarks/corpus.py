@@ -0,0 +1,142 @@
+"""
+Corpus sintetico reproducible para los benchmarks
+
+Genera cards cortas, articulos (~10 KB) y libros (~1 MB, con capitulos) en
+es/en/fr a partir de plantillas y una semilla fija: el mismo tamaño y semilla
+producen siempre el mismo texto, asi que los resultados se pueden comparar
+entre ejecuciones. Las frases incluyen nombres propios, fechas y lugares para
+que NER, sintagmas nominales y verbos tengan material.
+"""
+
+import random
+
+VOCAB = {
+    "es": {
+        "people": ["Marie Curie", "Isaac Newton", "Ada Lovelace", "Simon Bolivar", "Frida Kahlo", "Santiago Ramon y Cajal"],
+        "places": ["Madrid", "Paris", "Londres", "Buenos Aires", "la Universidad de Salamanca", "Mexico"],
+        "subjects": ["La celula", "El imperio romano", "La fotosintesis", "El sistema solar", "La economia de mercado",
+                     "La revolucion industrial", "El ADN", "La teoria de la relatividad"],
+        "verbs": ["explica", "describe", "transformo", "produce", "estudia", "permite", "contiene", "influyo en"],
+        "objects": ["la energia de la luz", "la estructura de la sociedad", "los procesos quimicos",
+                    "la historia de Europa", "las leyes del movimiento", "la informacion genetica",
+                    "el comercio internacional", "los planetas exteriores"],
+        "connectors": ["Ademas", "Sin embargo", "Por otra parte", "En consecuencia", "Mas tarde"],
+        "templates": [
+            "{person} nacio en {place} en {year}.",
+            "{subject} {verb} {object}.",
+            "{connector}, {person} {verb} {object} en {place}.",
+            "En {year}, {subject_l} {verb} {object} y cambio la forma de entender {object2}.",
+            "Segun {person}, {subject_l} {verb} {object} porque {object2} depende de ello."
+        ],
+        "chapter": "Capitulo {n}",
+        "question": "¿Que {verb} {subject_l}?"
+    },
+    "en": {
+        "people": ["Marie Curie", "Isaac Newton", "Ada Lovelace", "Charles Darwin", "Rosalind Franklin", "Alan Turing"],
+        "places": ["London", "Cambridge", "New York", "Paris", "the University of Oxford", "Boston"],
+        "subjects": ["The cell", "The Roman Empire", "Photosynthesis", "The solar system", "The market economy",
+                     "The industrial revolution", "DNA", "The theory of relativity"],
+        "verbs": ["explains", "describes", "transformed", "produces", "studies", "allows", "contains", "influenced"],
+        "objects": ["the energy of light", "the structure of society", "chemical processes", "the history of Europe",
+                    "the laws of motion", "genetic information", "international trade", "the outer planets"],
+        "connectors": ["Moreover", "However", "On the other hand", "As a result", "Later"],
+        "templates": [
+            "{person} was born in {place} in {year}.",
+            "{subject} {verb} {object}.",
+            "{connector}, {person} {verb} {object} in {place}.",
+            "In {year}, {subject_l} {verb} {object} and changed how we understand {object2}.",
+            "According to {person}, {subject_l} {verb} {object} because {object2} depends on it."
+        ],
+        "chapter": "Chapter {n}",
+        "question": "What {verb} {subject_l}?"
+    },
+    "fr": {
+        "people": ["Marie Curie", "Isaac Newton", "Victor Hugo", "Louis Pasteur", "Simone de Beauvoir", "Blaise Pascal"],
+        "places": ["Paris", "Lyon", "Marseille", "Bruxelles", "la Sorbonne", "Geneve"],
+        "subjects": ["La cellule", "L'Empire romain", "La photosynthese", "Le systeme solaire", "L'economie de marche",
+                     "La revolution industrielle", "L'ADN", "La theorie de la relativite"],
+        "verbs": ["explique", "decrit", "a transforme", "produit", "etudie", "permet", "contient", "a influence"],
+        "objects": ["l'energie de la lumiere", "la structure de la societe", "les processus chimiques",
+                    "l'histoire de l'Europe", "les lois du mouvement", "l'information genetique",
+                    "le commerce international", "les planetes exterieures"],
+        "connectors": ["De plus", "Cependant", "D'autre part", "Par consequent", "Plus tard"],
+        "templates": [
+            "{person} est ne a {place} en {year}.",
+            "{subject} {verb} {object}.",
+            "{connector}, {person} {verb} {object} a {place}.",
+            "En {year}, {subject_l} {verb} {object} et a change notre comprehension de {object2}.",
+            "Selon {person}, {subject_l} {verb} {object} parce que {object2} en depend."
+        ],
+        "chapter": "Chapitre {n}",
+        "question": "Qu'est-ce que {subject_l} {verb} ?"
+    }
+}
+
+LANGS = list(VOCAB)
+
+
+def _fill(template, vocab, rng):
+    subject = rng.choice(vocab["subjects"])
+    return template.format(
+        person=rng.choice(vocab["people"]),
+        place=rng.choice(vocab["places"]),
+        year=rng.randint(1500, 2000),
+        subject=subject,
+        subject_l=subject[0].lower() + subject[1:],
+        verb=rng.choice(vocab["verbs"]),
+        object=rng.choice(vocab["objects"]),
+        object2=rng.choice(vocab["objects"]),
+        connector=rng.choice(vocab["connectors"])
+    )
+
+
+def make_sentence(lang, rng):
+    vocab = VOCAB[lang]
+    return _fill(rng.choice(vocab["templates"]), vocab, rng)
+
+
+def make_paragraph(lang, rng, sentences=(3, 7)):
+    return " ".join(make_sentence(lang, rng) for _ in range(rng.randint(*sentences)))
+
+
+def make_text(lang, target_bytes, seed=13, chapters=0):
+    """Texto de ~target_bytes bytes UTF-8, en parrafos y opcionalmente en capitulos"""
+    rng = random.Random(f"{lang}-{target_bytes}-{seed}")
+    per_chapter = target_bytes // chapters if chapters else target_bytes
+    parts = []
+    size = 0
+    chapter = 0
+    chapter_size = per_chapter
+    while size < target_bytes:
+        if chapters and chapter_size >= per_chapter:
+            chapter += 1
+            heading = VOCAB[lang]["chapter"].format(n=chapter)
+            parts.append(heading)
+            size += len(heading.encode("utf-8")) + 2
+            chapter_size = 0
+        paragraph = make_paragraph(lang, rng)
+        parts.append(paragraph)
+        length = len(paragraph.encode("utf-8")) + 2
+        size += length
+        chapter_size += length
+    return "\n\n".join(parts)
+
+
+def make_article(lang, kb=10, seed=13):
+    return make_text(lang, kb * 1024, seed=seed)
+
+
+def make_book(lang, kb=1024, seed=13, chapters=12):
+    return make_text(lang, kb * 1024, seed=seed, chapters=chapters)
+
+
+def make_cards(lang, n_cards=200, seed=13):
+    """Mazo de cards pregunta/respuesta cortas"""
+    rng = random.Random(f"{lang}-cards-{n_cards}-{seed}")
+    vocab = VOCAB[lang]
+    cards = []
+    for _ in range(n_cards):
+        subject = rng.choice(vocab["subjects"])
+        question = vocab["question"].format(verb=rng.choice(vocab["verbs"]), subject_l=subject[0].lower() + subject[1:])
+        cards.append({"question": question, "answer": make_sentence(lang, rng)})
+    return cards
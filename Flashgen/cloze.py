@@ -0,0 +1,207 @@
+"""
+Motor de ejercicios cloze basado en offsets de caracteres
+
+Cada objetivo (entidad, sintagma nominal, sintagma verbal o nucleo sintactico)
+se identifica por sus offsets (start_char, end_char) en la respuesta, asi que
+se borra exactamente esa aparicion, con el espaciado original, y cada variante
+se construye en una sola pasada de cortes y union.
+
+Los objetivos se ordenan por puntuacion: peso del tipo (entidades > sintagmas
+nominales > sintagmas verbales > nucleos), tipo de entidad, numero de palabras
+y frecuencia del lema en la respuesta. El peso del tipo domina, asi que los
+generadores se recorren en ese orden y se paran en cuanto las variantes estan
+completas y ningun generador posterior puede superar a los objetivos elegidos.
+
+Cada variante tiene hasta `deletions` borrados sin solapamiento (c1..cN, en
+orden de aparicion) y hay como maximo `max_variants` variantes por card; un
+mismo objetivo (mismo texto) solo se usa en una variante.
+"""
+
+from collections import Counter
+
+from doc_view import doc_view
+
+DEFAULT_CONFIG = {
+    "noun_phrases": True,
+    "verb_phrases": True,
+    "named_entities": True,
+    "syntactic_heads": False,
+    "max_variants": 3,  # Cards cloze por card
+    "deletions": 1  # Borrados por card cloze (c1..cN)
+}
+
+ENTITY_LABELS = ("PERSON", "ORG", "GPE", "LOC", "DATE", "EVENT")
+OBJECT_DEPS = ("obj", "dobj")
+HEAD_DEPS = ("nsubj", "obj", "dobj")
+
+# Puntuacion = peso del tipo + bonus (tipo de entidad, palabras, frecuencia)
+TYPE_WEIGHTS = {"named_entity": 3.0, "noun_phrase": 2.0, "verb_phrase": 1.0, "syntactic_head": 0.0}
+ENTITY_WEIGHTS = {"PERSON": 0.6, "ORG": 0.5, "EVENT": 0.5, "GPE": 0.4, "LOC": 0.3, "DATE": 0.2}
+WORD_WEIGHT = 0.1
+MAX_WORDS = 4
+FREQUENCY_WEIGHT = 0.1
+MAX_REPEATS = 3
+MAX_BONUS = WORD_WEIGHT * MAX_WORDS + FREQUENCY_WEIGHT * MAX_REPEATS
+
+
+def cloze_config(config=None):
+    """Config por defecto + la de la peticion. Lanza ValueError si no es valida."""
+    if config is not None and not isinstance(config, dict):
+        raise ValueError("La config de cloze debe ser un objeto")
+    merged = dict(DEFAULT_CONFIG, **(config or {}))
+    for key in ("max_variants", "deletions"):
+        value = merged[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"'{key}' debe ser un entero >= 1")
+    return merged
+
+
+def _trim(span):
+    """Span sin puntuacion ni espacios en los extremos (None si queda vacio)"""
+    start, end = span.start, span.end
+    while start < end and (span.doc[start].is_punct or span.doc[start].is_space):
+        start += 1
+    while end > start and (span.doc[end - 1].is_punct or span.doc[end - 1].is_space):
+        end -= 1
+    return span.doc[start:end] if end > start else None
+
+
+def _named_entities(doc):
+    for ent in doc_view(doc).ents:
+        if ent.label_ in ENTITY_LABELS:
+            yield ent, {"entity_type": ent.label_}
+
+
+def _noun_phrases(doc):
+    if not doc.has_annotation("DEP"):
+        return
+    for chunk in doc_view(doc).noun_chunks:
+        # Solo frases de 2+ palabras
+        if len(chunk.text.split()) >= 2:
+            yield chunk, {"root": chunk.root.lemma_}
+
+
+def _verb_phrases(doc):
+    if not doc.has_annotation("DEP"):
+        return
+    arrays = doc_view(doc).arrays
+    for i in arrays.verbs():
+        # Verbo + objeto directo: el span que los cubre, con el espaciado original
+        bounds = arrays.covering_span(i, OBJECT_DEPS)
+        if bounds is not None:
+            yield doc[bounds[0]:bounds[1]], {"verb": doc[i].lemma_}
+
+
+def _syntactic_heads(doc):
+    if not doc.has_annotation("DEP"):
+        return
+    for roots in doc_view(doc).roots:
+        if not roots:
+            continue
+        root = doc[roots[0]]
+        head_tokens = sorted([root] + [child for child in root.children if child.dep_ in HEAD_DEPS], key=lambda t: t.i)
+        # Solo si nucleo y dependientes son contiguos (si no, no forman un texto borrable)
+        if head_tokens[-1].i - head_tokens[0].i + 1 == len(head_tokens):
+            yield doc[head_tokens[0].i:head_tokens[-1].i + 1], {"root": root.lemma_}
+
+
+# (clave de config, tipo, generador) en orden de peso del tipo
+GENERATORS = [
+    ("named_entities", "named_entity", _named_entities),
+    ("noun_phrases", "noun_phrase", _noun_phrases),
+    ("verb_phrases", "verb_phrase", _verb_phrases),
+    ("syntactic_heads", "syntactic_head", _syntactic_heads)
+]
+
+
+def _max_score(kind):
+    bonus = MAX_BONUS + (max(ENTITY_WEIGHTS.values()) if kind == "named_entity" else 0.0)
+    return TYPE_WEIGHTS[kind] + bonus
+
+
+def _allocate(ranked, max_variants, deletions):
+    """Reparte los objetivos (por orden de puntuacion) en variantes sin solapamientos"""
+    variants = [[] for _ in range(max_variants)]
+    used_targets = set()
+    for target in ranked:
+        key = target["target"].lower()
+        if key in used_targets:
+            continue
+        for variant in variants:
+            if len(variant) < deletions and all(
+                target["end"] <= other["start"] or target["start"] >= other["end"] for other in variant
+            ):
+                variant.append(target)
+                used_targets.add(key)
+                break
+    return [variant for variant in variants if variant]
+
+
+def _full(variants, max_variants, deletions):
+    return len(variants) == max_variants and all(len(variant) == deletions for variant in variants)
+
+
+def render(text, targets):
+    """Texto con cada objetivo (no solapados) como {{cN::...}}, numerados por posicion"""
+    parts = []
+    position = 0
+    for number, target in enumerate(sorted(targets, key=lambda t: t["start"]), 1):
+        parts.append(text[position:target["start"]])
+        parts.append(f"{{{{c{number}::{text[target['start']:target['end']]}}}}}")
+        position = target["end"]
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def cloze_variants(doc, config=None):
+    """
+    Variantes cloze del Doc de una respuesta: [{'text', 'type', 'target', 'targets'}],
+    de mayor a menor puntuacion. `type` y `target` son los del objetivo mejor puntuado.
+    """
+    config = cloze_config(config)
+    max_variants, deletions = config["max_variants"], config["deletions"]
+    text = doc.text
+    frequencies = None
+    seen = set()
+    ranked = []
+    variants = []
+    enabled = [(kind, generator) for key, kind, generator in GENERATORS if config.get(key)]
+
+    for position, (kind, generator) in enumerate(enabled):
+        for span, info in generator(doc):
+            span = _trim(span)
+            if span is None or (span.start_char, span.end_char) in seen:
+                continue
+            seen.add((span.start_char, span.end_char))
+            if frequencies is None:
+                frequencies = Counter((token.lemma_ or token.text).lower() for token in doc if not token.is_punct)
+            words = sum(1 for token in span if not token.is_punct)
+            repeats = frequencies[(span.root.lemma_ or span.root.text).lower()] - 1
+            score = (
+                TYPE_WEIGHTS[kind]
+                + ENTITY_WEIGHTS.get(info.get("entity_type"), 0.0)
+                + WORD_WEIGHT * min(words, MAX_WORDS)
+                + FREQUENCY_WEIGHT * min(repeats, MAX_REPEATS)
+            )
+            ranked.append(dict(
+                info, type=kind, target=text[span.start_char:span.end_char],
+                start=span.start_char, end=span.end_char, score=round(score, 3)
+            ))
+        # Los generadores estan en orden de peso: parar si ya no pueden cambiar el resultado
+        ranked.sort(key=lambda target: (-target["score"], target["start"]))
+        variants = _allocate(ranked, max_variants, deletions)
+        later = enabled[position + 1:]
+        if later and _full(variants, max_variants, deletions) and \
+                min(t["score"] for variant in variants for t in variant) >= max(_max_score(k) for k, _ in later):
+            break
+
+    result = []
+    for variant in variants:
+        ordered = sorted(variant, key=lambda t: t["start"])
+        result.append({
+            "text": render(text, ordered),
+            "type": variant[0]["type"],
+            "target": variant[0]["target"],
+            "targets": [dict(target, cloze=f"c{number}") for number, target in enumerate(ordered, 1)]
+        })
+    return result
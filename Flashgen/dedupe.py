@@ -0,0 +1,180 @@
+"""
+Deteccion de chunks y cards casi duplicados en tiempo subcuadratico
+
+Dos metodos, ambos con LSH (locality-sensitive hashing): solo se comparan los
+pares que caen en el mismo cubo de alguna banda, en lugar de todos los pares.
+- "minhash": firmas MinHash de los shingles de palabras (n-gramas) de cada
+  texto; los candidatos se verifican con la similitud de Jaccard exacta
+- "vectors": hiperplanos aleatorios (SimHash) sobre los vectores medios de
+  cada texto; los candidatos se verifican con la similitud coseno
+
+Cada elemento se marca como duplicado del primer elemento anterior con el que
+supera el umbral; los grupos son las componentes conexas de esos pares.
+"""
+
+import re
+import zlib
+
+import numpy
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+VECTOR_BITS = 256
+RECALL = 0.95
+SEED = 1
+
+METHODS = ("minhash", "vectors")
+
+_PRIME = numpy.uint64(4294967311)  # Primo > 2**32
+_WORD = re.compile(r'\w+')
+
+
+def check_threshold(threshold):
+    """Lanza ValueError si el umbral no es un numero entre 0 y 1"""
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+        raise ValueError(f"threshold debe ser un numero entre 0 y 1: {threshold!r}")
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Conjunto de hashes de n-gramas de palabras (palabras sueltas si el texto es corto)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+
+def _lsh_bands(num_perm, threshold, recall=RECALL):
+    """
+    (bandas, filas) con b * r = num_perm: las filas maximas (menos candidatos) con
+    probabilidad >= `recall` de que un par con similitud `threshold` comparta cubo,
+    1 - (1 - threshold^r)^b
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    valid = [(b, r) for b, r in options if 1 - (1 - threshold ** r) ** b >= recall]
+    return max(valid, key=lambda option: option[1]) if valid else (num_perm, 1)
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = numpy.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(numpy.uint64)
+        self.b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(numpy.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return numpy.full(self.num_perm, numpy.iinfo(numpy.uint64).max, dtype=numpy.uint64)
+        values = numpy.fromiter(shingle_set, dtype=numpy.uint64, count=len(shingle_set))
+        hashed = (self.a[:, None] * values[None, :] + self.b[:, None]) % _PRIME
+        return hashed.min(axis=1)
+
+
+def _matching_pairs(band_keys, similarity, threshold):
+    """
+    Pares (i, j, similitud) verificados entre elementos que comparten cubo en
+    alguna banda. band_keys: [n][bandas] claves. Dentro de un cubo cada elemento
+    se compara con los anteriores en orden hasta el primero que supera el umbral,
+    asi que un grupo de m copias cuesta O(m) comparaciones, no O(m^2).
+    """
+    checked = {}
+    n_bands = len(band_keys[0]) if band_keys else 0
+    for band in range(n_bands):
+        buckets = {}
+        for index, keys in enumerate(band_keys):
+            buckets.setdefault(keys[band], []).append(index)
+        for members in buckets.values():
+            for x in range(1, len(members)):
+                j = members[x]
+                for i in members[:x]:
+                    if (i, j) not in checked:
+                        checked[(i, j)] = similarity(i, j)
+                    if checked[(i, j)] >= threshold:
+                        break
+    return [(i, j, value) for (i, j), value in checked.items() if value >= threshold]
+
+
+def minhash_pairs(texts, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE):
+    """Pares (i, j, jaccard) con jaccard >= threshold"""
+    sets = [shingles(text, shingle_size) for text in texts]
+    hasher = MinHasher(num_perm)
+    n_bands, rows = _lsh_bands(num_perm, threshold)
+    band_keys = []
+    for index, shingle_set in enumerate(sets):
+        if not shingle_set:
+            # Sin shingles (texto vacio o sin palabras): Jaccard 0 con todos, asi
+            # que cubo propio en vez de uno compartido por todos (O(m^2) pares)
+            band_keys.append([b"vacio-%d" % index] * n_bands)
+            continue
+        signature = hasher.signature(shingle_set)
+        band_keys.append([signature[band * rows:(band + 1) * rows].tobytes() for band in range(n_bands)])
+
+    def jaccard(i, j):
+        if not sets[i] or not sets[j]:
+            return 0.0
+        return len(sets[i] & sets[j]) / len(sets[i] | sets[j])
+
+    return _matching_pairs(band_keys, jaccard, threshold)
+
+
+def vector_pairs(matrix, threshold=DEFAULT_THRESHOLD, bits=VECTOR_BITS, seed=SEED):
+    """
+    Pares (i, j, coseno) con coseno >= threshold a partir de una matriz (n x dim).
+    Dos vectores con angulo t coinciden en cada bit con probabilidad 1 - t/pi.
+    """
+    matrix = numpy.asarray(matrix, dtype="float32")
+    if len(matrix) < 2 or matrix.shape[1] == 0:
+        return []
+    norms = numpy.linalg.norm(matrix, axis=1)
+    valid = norms > 0
+    unit = numpy.zeros_like(matrix)
+    unit[valid] = matrix[valid] / norms[valid, None]
+    planes = numpy.random.RandomState(seed).standard_normal((matrix.shape[1], bits)).astype("float32")
+    signs = (unit @ planes) > 0
+    bit_agreement = 1 - numpy.arccos(numpy.clip(threshold, -1.0, 1.0)) / numpy.pi
+    n_bands, rows = _lsh_bands(bits, bit_agreement)
+    band_keys = [
+        [row[band * rows:(band + 1) * rows].tobytes() for band in range(n_bands)] if valid[index] else
+        [b"vacio-%d" % index] * n_bands
+        for index, row in enumerate(signs)
+    ]
+    return _matching_pairs(band_keys, lambda i, j: float(unit[i] @ unit[j]), threshold)
+
+
+def duplicate_report(n, pairs):
+    """
+    {'duplicates': [{'index', 'duplicate_of', 'similarity'}], 'groups': [[...]], 'kept': [...]}
+    a partir de los pares verificados
+    """
+    first_match = {}
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, similarity in pairs:
+        if i > j:
+            i, j = j, i
+        current = first_match.get(j)
+        if current is None or i < current[0]:
+            first_match[j] = (i, similarity)
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for index in range(n):
+        groups.setdefault(find(index), []).append(index)
+    return {
+        "duplicates": [
+            {"index": j, "duplicate_of": i, "similarity": round(similarity, 4)}
+            for j, (i, similarity) in sorted(first_match.items())
+        ],
+        "groups": [members for members in groups.values() if len(members) > 1],
+        "kept": [index for index in range(n) if index not in first_match]
+    }
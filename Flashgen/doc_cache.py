@@ -0,0 +1,253 @@
+"""
+Cache compartido de documentos analizados por spaCy
+
+Los handlers de /process, /enhance, /validate y /generate_cloze reciben a menudo
+el mismo texto uno tras otro. Este modulo guarda los Doc serializados
+(Doc.to_bytes) indexados por (idioma, version del modelo, hash del texto), con
+un presupuesto en bytes y eviccion LRU, y un nivel opcional en disco.
+
+Configuracion por variables de entorno:
+- FLASHGEN_DOC_CACHE_MB: presupuesto en memoria (0 desactiva el cache)
+- FLASHGEN_DOC_CACHE_DIR: directorio del nivel en disco (vacio = sin disco)
+- FLASHGEN_DOC_CACHE_DISK_MB: presupuesto del nivel en disco
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from spacy.tokens import Doc
+
+from nlp_pipes import parse_components, pipe_components
+
+
+def model_version(nlp):
+    """Identificador estable del modelo para las claves de cache"""
+    meta = nlp.meta
+    return f"{meta.get('lang', nlp.lang)}_{meta.get('name', 'pipeline')}-{meta.get('version', '0.0.0')}"
+
+
+def make_key(lang, version, text, components=None):
+    """Clave de cache; `components` distingue los Doc analizados parcialmente"""
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    pipes = "*" if components is None else ",".join(components)
+    return hashlib.sha1(f"{lang}|{version}|{pipes}|{digest}".encode("utf-8")).hexdigest()
+
+
+class DocCache:
+    """Cache LRU de Doc serializados con presupuesto en bytes"""
+
+    def __init__(self, max_bytes=0, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> bytes (LRU al inicio)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        max_mb = float(os.environ.get("FLASHGEN_DOC_CACHE_MB", "256") or 0)
+        disk_dir = os.environ.get("FLASHGEN_DOC_CACHE_DIR", "").strip() or None
+        disk_mb = float(os.environ.get("FLASHGEN_DOC_CACHE_DISK_MB", "2048") or 0)
+        return cls(
+            max_bytes=int(max_mb * 1024 * 1024),
+            disk_dir=disk_dir,
+            disk_max_bytes=int(disk_mb * 1024 * 1024)
+        )
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def get(self, key):
+        """Bytes serializados del Doc o None si no esta en cache"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._disk_read(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        # Promocionar al nivel en memoria
+        self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        self._memory_put(key, data)
+        self._disk_write(key, data)
+
+    def _memory_put(self, key, data):
+        size = len(data)
+        if not self.max_bytes or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.spacy")
+
+    def _disk_read(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mtime como marca de uso para el LRU en disco
+            return data
+        except OSError:
+            return None
+
+    def _disk_write(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir en el cache en disco: {e}")
+            return
+        self._disk_prune()
+
+    def _disk_prune(self):
+        """Elimina los ficheros menos usados si el disco supera su presupuesto"""
+        if not self.disk_max_bytes:
+            return
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".spacy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.disk_max_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "disk_dir": self.disk_dir
+            }
+
+
+def serialize_doc(nlp, doc):
+    # Con vectores estaticos el tensor no aporta a la similitud y ocupa mucho.
+    # user_data solo guarda vistas derivadas (doc_view.py), que no se serializan.
+    exclude = ["user_data"] + (["tensor"] if nlp.vocab.vectors.shape[0] else [])
+    return doc.to_bytes(exclude=exclude)
+
+
+def deserialize_doc(nlp, data):
+    return Doc(nlp.vocab).from_bytes(data)
+
+
+def _lookup(cache, lang, version, text, components):
+    """Busca el Doc parcial y, si no esta, uno completo (sirve para cualquier subconjunto)"""
+    data = cache.get(make_key(lang, version, text, components))
+    if data is None and components is not None:
+        data = cache.get(make_key(lang, version, text))
+    return data
+
+
+def cached_parse(nlp, lang, text, cache, components=None):
+    """
+    Devuelve el Doc de `text`, reutilizando el cache cuando es posible.
+    `components` limita los componentes ejecutados (None = pipeline completo).
+    """
+    if cache is None or not cache.enabled:
+        return parse_components(nlp, text, components)
+    version = model_version(nlp)
+    data = _lookup(cache, lang, version, text, components)
+    if data is not None:
+        return deserialize_doc(nlp, data)
+    doc = parse_components(nlp, text, components)
+    cache.put(make_key(lang, version, text, components), serialize_doc(nlp, doc))
+    return doc
+
+
+def cached_parse_many(nlp, lang, texts, cache, batch_size=64, n_process=1, components=None, misses=None):
+    """
+    Devuelve los Doc de `texts` en el mismo orden. Los que no estan en cache se
+    analizan juntos con nlp.pipe (cada texto distinto una sola vez).
+    Si `misses` es una lista, se le añaden los indices de los textos analizados.
+    """
+    use_cache = cache is not None and cache.enabled
+    version = model_version(nlp) if use_cache else None
+    docs = [None] * len(texts)
+    pending = {}  # texto -> indices que lo esperan
+
+    for i, text in enumerate(texts):
+        if use_cache:
+            data = _lookup(cache, lang, version, text, components)
+            if data is not None:
+                docs[i] = deserialize_doc(nlp, data)
+                continue
+        pending.setdefault(text, []).append(i)
+
+    if pending:
+        unique_texts = list(pending)
+        parsed = pipe_components(nlp, unique_texts, components, batch_size=batch_size, n_process=n_process)
+        for text, doc in zip(unique_texts, parsed):
+            for i in pending[text]:
+                docs[i] = doc
+            if misses is not None:
+                misses.extend(pending[text])
+            if use_cache:
+                cache.put(make_key(lang, version, text, components), serialize_doc(nlp, doc))
+
+    return docs
@@ -0,0 +1,153 @@
+"""
+Vistas derivadas de un Doc, calculadas una sola vez por Doc
+
+Las estrategias de segmentacion, los enriquecimientos de /enhance, cloze y el
+indice de terminos recorren las mismas estructuras de un Doc: las oraciones,
+los noun chunks, las entidades y la oracion de cada una, los tokens ROOT, los
+vectores de oracion y el arbol de dependencias en arrays. DocView las calcula
+de forma perezosa la primera vez que se piden y las conserva mientras viva el
+Doc, asi que una peticion que ejecuta varias etapas sobre el mismo Doc
+(/analyze, /process/compare, include de /process) calcula cada vista como
+mucho una vez.
+
+La vista se guarda en doc.user_data; doc_cache excluye user_data al
+serializar, asi que no llega al cache ni a otros procesos. Los Span y listas
+de la vista son compartidos: quien los use no debe modificarlos.
+"""
+
+import threading
+
+import numpy
+from spacy.attrs import DEP
+
+from similarity import SentenceSimilarity
+from syntax_extract import ARRAYS_MIN_TOKENS, DependencyArrays
+
+USER_DATA_KEY = "flashgen_doc_view"
+
+_lock = threading.Lock()
+
+
+class DocView:
+    """Vistas perezosas de un Doc (ver doc_view(doc))"""
+
+    __slots__ = (
+        "doc", "_sents", "_sent_texts", "_sent_starts", "_sent_index", "_noun_chunks",
+        "_ents", "_entity_sents", "_roots", "_similarity", "_arrays"
+    )
+
+    def __init__(self, doc):
+        self.doc = doc
+        self._sents = None
+        self._sent_texts = None
+        self._sent_starts = None
+        self._sent_index = None
+        self._noun_chunks = None
+        self._ents = None
+        self._entity_sents = None
+        self._roots = None
+        self._similarity = None
+        self._arrays = None
+
+    @property
+    def sents(self):
+        """Oraciones (list(doc.sents))"""
+        if self._sents is None:
+            self._sents = list(self.doc.sents)
+        return self._sents
+
+    @property
+    def sent_texts(self):
+        """Texto de cada oracion sin espacios en los extremos"""
+        if self._sent_texts is None:
+            self._sent_texts = [sent.text.strip() for sent in self.sents]
+        return self._sent_texts
+
+    @property
+    def sent_starts(self):
+        """Array con el primer token de cada oracion"""
+        if self._sent_starts is None:
+            self._sent_starts = numpy.array([sent.start for sent in self.sents], dtype=numpy.int64)
+        return self._sent_starts
+
+    @property
+    def sent_index(self):
+        """Array token -> indice de su oracion"""
+        if self._sent_index is None:
+            index = numpy.zeros(len(self.doc), dtype=numpy.int32)
+            if len(self.sents) > 1:
+                index[self.sent_starts[1:]] = 1
+                index = numpy.cumsum(index, dtype=numpy.int32)
+            self._sent_index = index
+        return self._sent_index
+
+    @property
+    def noun_chunks(self):
+        """Sintagmas nominales (list(doc.noun_chunks))"""
+        if self._noun_chunks is None:
+            self._noun_chunks = list(self.doc.noun_chunks)
+        return self._noun_chunks
+
+    @property
+    def ents(self):
+        """Entidades (doc.ents)"""
+        if self._ents is None:
+            self._ents = self.doc.ents
+        return self._ents
+
+    @property
+    def entity_sents(self):
+        """Indice de la oracion de cada entidad (la de su primer token, como ent.sent)"""
+        if self._entity_sents is None:
+            starts = [ent.start for ent in self.ents]
+            self._entity_sents = self.sent_index[starts].tolist() if starts else []
+        return self._entity_sents
+
+    @property
+    def roots(self):
+        """Por oracion, los indices de sus tokens con dependencia ROOT (en orden)"""
+        if self._roots is None:
+            roots = [[] for _ in self.sents]
+            strings = self.doc.vocab.strings
+            if len(self.doc) and "ROOT" in strings:
+                root = strings["ROOT"]
+                if len(self.doc) < ARRAYS_MIN_TOKENS:
+                    # Docs pequeños (cards): recorrer los tokens cuesta menos que to_array
+                    tokens = [token.i for token in self.doc if token.dep == root]
+                else:
+                    tokens = numpy.flatnonzero(self.doc.to_array(DEP) == root).tolist()
+                # Tokens y oraciones estan ordenados: basta un recorrido conjunto
+                # (sin sent_index, que para docs pequeños cuesta mas que el resto)
+                ends = [sent.end for sent in self.sents]
+                sent = 0
+                for i in tokens:
+                    while ends[sent] <= i:
+                        sent += 1
+                    roots[sent].append(i)
+            self._roots = roots
+        return self._roots
+
+    @property
+    def similarity(self):
+        """Vectores de oracion normalizados (SentenceSimilarity de todas las oraciones)"""
+        if self._similarity is None:
+            self._similarity = SentenceSimilarity(self.doc, self.sents)
+        return self._similarity
+
+    @property
+    def arrays(self):
+        """Arbol de dependencias en arrays (DependencyArrays)"""
+        if self._arrays is None:
+            self._arrays = DependencyArrays(self.doc)
+        return self._arrays
+
+
+def doc_view(doc):
+    """DocView de `doc` (se crea la primera vez y se reutiliza despues)"""
+    view = doc.user_data.get(USER_DATA_KEY)
+    if view is None:
+        with _lock:
+            view = doc.user_data.get(USER_DATA_KEY)
+            if view is None:
+                view = doc.user_data[USER_DATA_KEY] = DocView(doc)
+    return view
@@ -0,0 +1,158 @@
+"""
+Codificacion de respuestas: JSON rapido, MessagePack, proyeccion y compresion
+
+- JSON con orjson si esta instalado (json estandar en otro caso)
+- MessagePack si el cliente lo pide en `Accept` (application/msgpack) y el
+  paquete msgpack esta instalado
+- `fields=`: proyeccion de la respuesta a las secciones pedidas
+  ("chunks,stats" o rutas con punto como "enrichment.entities")
+- Compresion brotli (si esta instalado) o gzip segun `Accept-Encoding` cuando
+  el cuerpo supera un umbral
+
+Configuracion por variables de entorno:
+- FLASHGEN_COMPRESS_MIN_BYTES: tamaño minimo para comprimir (0 = nunca, por defecto 4096)
+- FLASHGEN_GZIP_LEVEL / FLASHGEN_BROTLI_QUALITY: nivel de compresion (por defecto 6 / 4)
+"""
+
+import gzip
+import json
+import os
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA = "application/json"
+MSGPACK_MEDIA = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK_MEDIA, "application/x-msgpack", "application/vnd.msgpack")
+
+COMPRESS_MIN_BYTES = int(os.environ.get("FLASHGEN_COMPRESS_MIN_BYTES", "4096"))
+GZIP_LEVEL = int(os.environ.get("FLASHGEN_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("FLASHGEN_BROTLI_QUALITY", "4"))
+
+
+def _default(value):
+    """Tipos que no serializan por si mismos (escalares y arrays NumPy, sets)"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps_json(content):
+    """Serializa a JSON (bytes UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(content):
+    """Serializa a MessagePack (requiere el paquete msgpack)"""
+    return msgpack.packb(content, use_bin_type=True, default=_default)
+
+
+def parse_fields(value):
+    """'chunks, stats' -> ['chunks', 'stats'] (None si no hay proyeccion)"""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    return fields or None
+
+
+def project(content, fields):
+    """
+    Conserva solo las rutas de `fields` ("stats", "enrichment.entities"...).
+    Los errores ({"error": ...}) se devuelven siempre completos.
+    """
+    if not fields or not isinstance(content, dict) or "error" in content:
+        return content
+    result = {}
+    for path in fields:
+        keys = path.split(".")
+        source = content
+        for key in keys:
+            if not isinstance(source, dict) or key not in source:
+                break
+            source = source[key]
+        else:
+            # Los contenedores padre solo se crean si la ruta completa existe
+            target = result
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = source
+    return result
+
+
+def negotiate(accept):
+    """Tipo de contenido de la respuesta segun la cabecera Accept"""
+    accept = (accept or "").lower()
+    if msgpack is not None and any(alias in accept for alias in MSGPACK_ALIASES):
+        return MSGPACK_MEDIA
+    return JSON_MEDIA
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' o None segun Accept-Encoding y los paquetes instalados"""
+    offered = {item.split(";")[0].strip().lower() for item in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encode(content, accept="", accept_encoding="", fields=None, min_bytes=None):
+    """
+    Codifica `content` segun la negociacion. Devuelve (body, media_type, headers).
+    """
+    content = project(content, fields)
+    media_type = negotiate(accept)
+    body = dumps_msgpack(content) if media_type == MSGPACK_MEDIA else dumps_json(content)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    if min_bytes > 0 and len(body) >= min_bytes:
+        encoding = choose_encoding(accept_encoding)
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return body, media_type, headers
+
+
+def make_response(request, content, status_code=200):
+    """Response ya codificada para `content` segun las cabeceras y ?fields= de la peticion"""
+    if isinstance(content, Response):
+        return content
+    body, media_type, headers = encode(
+        content,
+        accept=request.headers.get("accept", ""),
+        accept_encoding=request.headers.get("accept-encoding", ""),
+        fields=parse_fields(request.query_params.get("fields"))
+    )
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson cuando esta disponible"""
+
+    def render(self, content):
+        return dumps_json(content)
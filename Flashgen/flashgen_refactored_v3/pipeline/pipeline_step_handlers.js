@@ -632,14 +632,19 @@ import { ClozeEngine } from '../processing/cloze_engine.js';
             DebugLogger.log('🧠 Enriquecimiento spaCy iniciado (servidor neuronal):', 'info');
             
             try {
-                // Llamar al servidor spaCy para analisis neuronal completo
-                const response = await fetch('http://localhost:8000/enhance', {
+                // Pedir al servidor solo las secciones que usa la configuracion (un solo analisis)
+                const sections = ['noun_phrases', 'verb_phrases'];
+                if (config.entityEnrichment || config.nerValidation) sections.push('entities');
+                if (config.syntacticAnalysis) sections.push('syntax_analysis');
+                if (config.semanticClustering) sections.push('semantic_clusters');
+                
+                const response = await fetch('http://localhost:8000/analyze', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
                         text: processed,
                         lang: 'es',
-                        strategy: 'sentences'
+                        enhance: sections
                     })
                 });
                 
@@ -647,12 +652,14 @@ import { ClozeEngine } from '../processing/cloze_engine.js';
                     throw new Error(`Servidor spaCy no disponible: ${response.status}`);
                 }
                 
-                const enrichment = await response.json();
+                const analysis = await response.json();
                 
-                if (enrichment.error) {
-                    throw new Error(enrichment.error);
+                if (analysis.error) {
+                    throw new Error(analysis.error);
                 }
                 
+                const enrichment = analysis.enrichment || { stats: {} };
+                
                 // Guardar enriquecimiento para uso en generacion
                 State.pipelineRuntime = State.pipelineRuntime || {};
                 State.pipelineRuntime.spacyEnrichment = {
@@ -664,12 +671,16 @@ import { ClozeEngine } from '../processing/cloze_engine.js';
                     config: config
                 };
                 
-                DebugLogger.log(`  ✓ ${enrichment.stats.total_entities} entidades detectadas (NER neuronal)`, 'success');
+                if (enrichment.entities) {
+                    DebugLogger.log(`  ✓ ${enrichment.stats.total_entities} entidades detectadas (NER neuronal)`, 'success');
+                }
                 DebugLogger.log(`  ✓ ${enrichment.stats.total_noun_phrases} noun phrases extraidos`, 'success');
                 DebugLogger.log(`  ✓ ${enrichment.stats.total_verb_phrases} verb phrases identificados`, 'success');
-                DebugLogger.log(`  ✓ ${enrichment.stats.total_sentences} oraciones analizadas sintacticamente`, 'success');
+                if (enrichment.syntax_analysis) {
+                    DebugLogger.log(`  ✓ ${enrichment.stats.total_sentences} oraciones analizadas sintacticamente`, 'success');
+                }
                 
-                if (config.semanticClustering && enrichment.semantic_clusters.length > 0) {
+                if (config.semanticClustering && (enrichment.semantic_clusters || []).length > 0) {
                     DebugLogger.log(`  ✓ ${enrichment.semantic_clusters.length} clusters semanticos encontrados`, 'success');
                 }
                 
@@ -526,7 +526,7 @@ const UI = {
                     const chapters = new Set(chunksMetadata.map(m => m.chapter).filter(c => c));
                     strategyInfo = ` | ${chapters.size} capitulos detectados`;
                 } else if (strategy === 'entity_context') {
-                    strategyInfo = ` | ${result.entities?.length || 0} entidades con contexto`;
+                    strategyInfo = ` | ${chunksMetadata.length} entidades con contexto`;
                 } else if (strategy === 'semantic_blocks') {
                     strategyInfo = ` | Bloques semanticos agrupados`;
                 } else if (strategy === 'vocab_extract') {
@@ -1963,12 +1963,15 @@ const UI = {
                         </div>
                         <div class="stat-item">
                             <span class="stat-label">Modelos</span>
-                            <span class="stat-value" style="font-size: 14px;">${data.models_loaded.join(', ')}</span>
+                            <span class="stat-value" style="font-size: 14px;">${data.models_loaded.join(', ') || 'ninguno'}${data.models_loadable?.length ? ` (bajo demanda: ${data.models_loadable.join(', ')})` : ''}</span>
                         </div>
                     `);
                     UI.toast(`✅ ${data.message}`);
                     DebugLogger.log(`🌐 Servidor spaCy conectado (latencia ${duration}ms)`, 'success');
                     DebugLogger.log(`📦 Modelos cargados: ${data.models_loaded.join(', ')}`, 'info');
+                    if (data.models_loadable?.length) {
+                        DebugLogger.log(`💤 Modelos bajo demanda: ${data.models_loadable.join(', ')}`, 'info');
+                    }
                 } else {
                     throw new Error(data.message || 'Error desconocido');
                 }
@@ -0,0 +1,77 @@
+"""
+Re-analisis incremental por parrafos para /process (payload.incremental)
+
+Al editar un texto largo y volver a segmentarlo, normalmente solo cambian
+algunos parrafos. El texto se divide en parrafos (cada uno con el separador que
+le sigue, para que la concatenacion reproduzca el texto exacto), cada parrafo
+se busca en el cache de Docs por su contenido (ver doc_cache.py) y solo se
+analizan con nlp.pipe los que no estan. Los Doc de los parrafos se unen con
+Doc.from_docs en un unico Doc con el mismo texto que el original.
+
+Cada parrafo informa de su hash SHA-256 (el mismo que ChunkCache.hashText del
+cliente), sus offsets y si se ha vuelto a analizar. Los limites entre parrafos
+son siempre limites de oracion, y el parser no ve el contexto de otros
+parrafos, asi que el resultado puede diferir ligeramente del analisis completo.
+"""
+
+import hashlib
+
+from spacy.tokens import Doc
+
+from doc_cache import cached_parse_many
+from streaming import PARAGRAPH_BREAK
+
+
+def split_paragraphs(text):
+    """
+    Parrafos de `text` como [{'index', 'start', 'end', 'hash'}]; cada uno incluye
+    el separador que le sigue, asi que cubren el texto completo sin huecos.
+    El espacio en blanco inicial se une al primer parrafo.
+    """
+    paragraphs = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        if not text[start:match.start()].strip():
+            continue
+        paragraphs.append((start, match.end()))
+        start = match.end()
+    if start < len(text) or not paragraphs:
+        if paragraphs and not text[start:].strip():
+            paragraphs[-1] = (paragraphs[-1][0], len(text))
+        else:
+            paragraphs.append((start, len(text)))
+    return [
+        {
+            'index': index,
+            'start': start,
+            'end': end,
+            'hash': hashlib.sha256(text[start:end].encode('utf-8')).hexdigest()
+        }
+        for index, (start, end) in enumerate(paragraphs)
+    ]
+
+
+def join_docs(docs):
+    """Doc.from_docs sin espacios añadidos (el tensor solo si todos lo tienen)"""
+    if len(docs) == 1:
+        return docs[0]
+    has_tensor = all(getattr(doc.tensor, "size", 0) and doc.tensor.shape[0] == len(doc) for doc in docs if len(doc))
+    docs = [doc for doc in docs if len(doc)] or docs[:1]
+    return Doc.from_docs(docs, ensure_whitespace=False, exclude=[] if has_tensor else ["tensor"])
+
+
+def parse_incremental(nlp, lang, text, cache, components=None, batch_size=64):
+    """
+    (Doc, parrafos) de `text`: los parrafos que ya estan en `cache` no se
+    vuelven a analizar. Cada parrafo lleva 'recomputed' (True si se analizo).
+    """
+    paragraphs = split_paragraphs(text)
+    misses = []
+    docs = cached_parse_many(
+        nlp, lang, [text[p['start']:p['end']] for p in paragraphs], cache,
+        batch_size=batch_size, components=components, misses=misses
+    )
+    recomputed = set(misses)
+    for paragraph in paragraphs:
+        paragraph['recomputed'] = paragraph['index'] in recomputed
+    return join_docs(docs), paragraphs
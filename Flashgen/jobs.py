@@ -0,0 +1,218 @@
+"""
+Trabajos asincronos para documentos grandes (/jobs)
+
+Un /process de un libro o un /generate_cloze de miles de cards puede tardar
+minutos y agotar el timeout del navegador o del proxy. POST /jobs encola el
+trabajo y devuelve un id; el cliente consulta GET /jobs/{id} (estado y
+progreso) y descarga el resultado con GET /jobs/{id}/result.
+
+Los trabajos se ejecutan en un ThreadPoolExecutor con concurrencia limitada y
+se guardan en SQLite, asi que los resultados terminados sobreviven a un
+reinicio hasta que expira su TTL. Los trabajos que estaban en cola o en curso
+al reiniciar se marcan como error.
+
+Configuracion por variables de entorno:
+- FLASHGEN_JOB_DB: ruta del fichero SQLite (":memory:" = sin persistencia)
+- FLASHGEN_JOB_CONCURRENCY: trabajos ejecutandose a la vez (por defecto 2)
+- FLASHGEN_JOB_TTL: segundos que se conserva un trabajo terminado (por defecto 86400)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flashgen_jobs.db")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    progress_unit TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+)
+"""
+
+
+class JobStore:
+    """Almacen de trabajos en SQLite (una conexion compartida protegida por lock)"""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _update(self, sql, params=()):
+        """Ejecuta un UPDATE/DELETE y devuelve el numero de filas afectadas"""
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def create(self, job_type, payload):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, type, status, payload, created) VALUES (?, ?, ?, ?, ?)",
+            (job_id, job_type, QUEUED, json.dumps(payload, ensure_ascii=False), time.time())
+        )
+        return job_id
+
+    def get(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def mark_running(self, job_id):
+        self._execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+
+    def set_progress(self, job_id, done, total=None, unit=None):
+        self._execute(
+            "UPDATE jobs SET progress_done = ?, progress_total = COALESCE(?, progress_total), "
+            "progress_unit = COALESCE(?, progress_unit) WHERE id = ?",
+            (done, total, unit, job_id)
+        )
+
+    def finish(self, job_id, result=None, error=None):
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (
+                ERROR if error else DONE,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error, time.time(), job_id
+            )
+        )
+
+    def interrupt_unfinished(self):
+        """Marca como error los trabajos que quedaron a medias (reinicio del servidor)"""
+        return self._update(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status IN (?, ?)",
+            (ERROR, "Trabajo interrumpido por un reinicio del servidor", time.time(), QUEUED, RUNNING)
+        )
+
+    def purge(self, ttl):
+        """Borra los trabajos terminados hace mas de `ttl` segundos"""
+        return self._update(
+            "DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+            (time.time() - ttl,)
+        )
+
+    def counts(self):
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+
+class JobManager:
+    """
+    Ejecuta trabajos en segundo plano. `runners` mapea tipo -> funcion
+    runner(payload, progress) que devuelve el resultado (dict); progress(done,
+    total=None, unit=None) actualiza el avance guardado del trabajo.
+    """
+
+    def __init__(self, store, runners, concurrency=2, ttl=86400):
+        self.store = store
+        self.runners = runners
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="flashgen-job")
+        self.interrupted = store.interrupt_unfinished()
+        self.purge()
+
+    @classmethod
+    def from_env(cls, runners):
+        path = os.environ.get("FLASHGEN_JOB_DB", DEFAULT_DB)
+        concurrency = int(os.environ.get("FLASHGEN_JOB_CONCURRENCY", "2") or 2)
+        ttl = float(os.environ.get("FLASHGEN_JOB_TTL", "86400") or 86400)
+        return cls(JobStore(path), runners, concurrency=max(1, concurrency), ttl=ttl)
+
+    def purge(self):
+        return self.store.purge(self.ttl) if self.ttl > 0 else 0
+
+    def submit(self, job_type, payload):
+        """Encola un trabajo y devuelve su id"""
+        self.purge()
+        job_id = self.store.create(job_type, payload)
+        self._executor.submit(self._run, job_id, job_type, payload)
+        return job_id
+
+    def _run(self, job_id, job_type, payload):
+        self.store.mark_running(job_id)
+
+        def progress(done, total=None, unit=None):
+            self.store.set_progress(job_id, done, total, unit)
+
+        try:
+            result = self.runners[job_type](payload, progress)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.finish(job_id, error=f"Error en el trabajo: {str(e)}")
+            return
+        # Los handlers devuelven {"error": ...} en lugar de lanzar excepciones
+        if isinstance(result, dict) and "error" in result and len(result) == 1:
+            self.store.finish(job_id, error=result["error"])
+        else:
+            self.store.finish(job_id, result=result)
+
+    def status(self, job_id):
+        """Estado publico de un trabajo (sin payload ni resultado), None si no existe"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        info = {
+            "id": job["id"],
+            "type": job["type"],
+            "status": job["status"],
+            "progress": {
+                "done": job["progress_done"],
+                "total": job["progress_total"],
+                "unit": job["progress_unit"]
+            },
+            "created": job["created"],
+            "started": job["started"],
+            "finished": job["finished"]
+        }
+        if job["error"]:
+            info["error"] = job["error"]
+        if job["finished"] and self.ttl > 0:
+            info["expires"] = job["finished"] + self.ttl
+        return info
+
+    def result(self, job_id):
+        """(trabajo, resultado deserializado o None)"""
+        job = self.store.get(job_id)
+        if job is None or job["result"] is None:
+            return job, None
+        return job, json.loads(job["result"])
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "ttl": self.ttl,
+            "db": self.store.path,
+            "jobs": self.store.counts()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,243 @@
+"""
+Metricas estilo Prometheus y tiempos por etapa de cada peticion
+
+- Contadores e histogramas con etiquetas, expuestos en formato de texto de
+  Prometheus por GET /metrics (sin dependencias externas)
+- RequestMetrics: tiempos por etapa (parse, segment, enrich, validate, cloze,
+  serialize), tiempo por componente spaCy y tokens de la peticion en curso.
+  Se propaga con contextvars, asi que las funciones que se ejecutan en el
+  threadpool registran en la peticion que las lanzo; en el pool de procesos
+  el hijo devuelve un snapshot y el proceso principal lo fusiona.
+
+Configuracion por variables de entorno:
+- FLASHGEN_SERVER_TIMING=1: cabecera Server-Timing en las respuestas (desactivada por
+  defecto: expone a cualquier cliente los tiempos internos por etapa y componente)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SERVER_TIMING = os.environ.get("FLASHGEN_SERVER_TIMING", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [contadores por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metricas propias mas gauges calculados al exponer (cache, modelos, pool...)"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """collect() -> [(nombre, ayuda, tipo, [(etiquetas dict, valor), ...]), ...]"""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                lines.append(f"# error en collector: {e}")
+                continue
+            for name, help_text, kind, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    label_str = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Tiempos por etapa y por componente y tokens de una peticion"""
+
+    def __init__(self):
+        self.stages = {}
+        self.components = {}
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_component(self, name, seconds):
+        with self._lock:
+            self.components[name] = self.components.get(name, 0.0) + seconds
+
+    def add_tokens(self, count):
+        with self._lock:
+            self.tokens += count
+
+    def snapshot(self):
+        with self._lock:
+            return {"stages": dict(self.stages), "components": dict(self.components), "tokens": self.tokens}
+
+    def merge(self, snapshot):
+        """Fusiona el snapshot devuelto por un proceso del pool"""
+        for name, seconds in snapshot.get("stages", {}).items():
+            self.add_stage(name, seconds)
+        for name, seconds in snapshot.get("components", {}).items():
+            self.add_component(name, seconds)
+        self.add_tokens(snapshot.get("tokens", 0))
+
+    def timings_ms(self):
+        """{etapa: ms} para stats.timings"""
+        with self._lock:
+            timings = {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+            if self.components:
+                timings["components"] = {
+                    name: round(seconds * 1000, 2) for name, seconds in self.components.items()
+                }
+        return timings
+
+    def server_timing(self):
+        """Valor de la cabecera Server-Timing"""
+        with self._lock:
+            parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+            parts.extend(
+                f"pipe-{name};dur={seconds * 1000:.2f}" for name, seconds in self.components.items()
+            )
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("flashgen_request_metrics", default=None)
+
+
+def current():
+    """RequestMetrics de la peticion en curso (None fuera de una peticion)"""
+    return _current.get()
+
+
+@contextmanager
+def collect(request_metrics=None):
+    """
+    Abre un RequestMetrics para el bloque (y lo que se lance desde el con contextvars)
+
+    Con `request_metrics` reactiva uno ya abierto: los streams lo usan en cada
+    paso del generador, que Starlette ejecuta cada vez en un contexto distinto.
+    """
+    if request_metrics is None:
+        request_metrics = RequestMetrics()
+    token = _current.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Mide el bloque como etapa `name` de la peticion en curso"""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.add_stage(name, time.perf_counter() - start)
+
+
+def record_component(name, seconds):
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.add_component(name, seconds)
+
+
+def record_tokens(count):
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.add_tokens(count)
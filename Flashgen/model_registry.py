@@ -0,0 +1,202 @@
+"""
+Registro de modelos spaCy con carga bajo demanda
+
+Cada idioma se carga la primera vez que se solicita (o al arrancar si esta en
+la lista de precarga). Un lock por idioma evita que dos peticiones concurrentes
+carguen el mismo modelo dos veces. Opcionalmente se descargan los modelos menos
+usados recientemente cuando se supera un presupuesto de memoria.
+
+Configuracion por variables de entorno:
+- FLASHGEN_MODEL_<LANG>: nombre o ruta del modelo (p. ej. FLASHGEN_MODEL_ES)
+- FLASHGEN_PRELOAD: idiomas a cargar al arrancar ("es,en", "all" o vacio)
+- FLASHGEN_MODEL_MEMORY_MB: presupuesto de memoria para modelos (0 = sin limite)
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import spacy
+
+DEFAULT_MODEL_NAMES = {
+    "en": "en_core_web_lg",
+    "es": "es_core_news_lg",
+    "fr": "fr_core_news_lg"
+}
+
+
+def _rss_mb():
+    """RSS actual del proceso en MB (None si no se puede medir)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Carga perezosa de modelos spaCy por idioma con eviccion LRU opcional"""
+
+    def __init__(self, model_names=None, preload=None, memory_budget_mb=0):
+        self.model_names = dict(model_names or DEFAULT_MODEL_NAMES)
+        self.preload_langs = list(preload or [])
+        self.memory_budget_mb = memory_budget_mb or 0
+
+        self._models = OrderedDict()  # lang -> nlp, orden de uso (LRU al inicio)
+        self._memory_mb = {}
+        self._loaded_at = {}
+        self._last_used = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._load_locks = {lang: threading.Lock() for lang in self.model_names}
+
+    @classmethod
+    def from_env(cls):
+        """Construye el registro a partir de las variables FLASHGEN_*"""
+        model_names = {
+            lang: os.environ.get(f"FLASHGEN_MODEL_{lang.upper()}", name)
+            for lang, name in DEFAULT_MODEL_NAMES.items()
+        }
+        preload_env = os.environ.get("FLASHGEN_PRELOAD", "").strip()
+        if preload_env.lower() == "all":
+            preload = list(model_names)
+        else:
+            preload = [lang.strip() for lang in preload_env.split(",") if lang.strip()]
+        memory_budget_mb = float(os.environ.get("FLASHGEN_MODEL_MEMORY_MB", "0") or 0)
+        return cls(model_names, preload=preload, memory_budget_mb=memory_budget_mb)
+
+    def available(self):
+        """Idiomas que se pueden cargar"""
+        return list(self.model_names)
+
+    def resident(self):
+        """Idiomas con el modelo cargado en memoria"""
+        with self._lock:
+            return list(self._models)
+
+    def loadable(self):
+        """Idiomas disponibles que aun no estan en memoria"""
+        resident = set(self.resident())
+        return [lang for lang in self.model_names if lang not in resident]
+
+    def is_supported(self, lang):
+        return lang in self.model_names
+
+    def last_error(self, lang):
+        return self._errors.get(lang)
+
+    def get(self, lang):
+        """
+        Devuelve el pipeline del idioma, cargandolo si es necesario.
+        Retorna None si el idioma no esta soportado o la carga fallo.
+        """
+        if lang not in self.model_names:
+            return None
+
+        with self._lock:
+            nlp = self._models.get(lang)
+            if nlp is not None:
+                self._models.move_to_end(lang)
+                self._last_used[lang] = time.time()
+                return nlp
+
+        # Solo un hilo carga cada idioma; el resto espera y reutiliza el resultado
+        with self._load_locks[lang]:
+            with self._lock:
+                nlp = self._models.get(lang)
+                if nlp is not None:
+                    self._models.move_to_end(lang)
+                    self._last_used[lang] = time.time()
+                    return nlp
+            return self._load(lang)
+
+    def _load(self, lang):
+        name = self.model_names[lang]
+        print(f"🔄 Cargando modelo spaCy '{name}' ({lang})...")
+        rss_before = _rss_mb()
+        start = time.time()
+        try:
+            nlp = spacy.load(name)
+        except Exception as e:
+            self._errors[lang] = str(e)
+            print(f"❌ No se pudo cargar '{name}': {e}")
+            return None
+        rss_after = _rss_mb()
+
+        with self._lock:
+            self._models[lang] = nlp
+            self._models.move_to_end(lang)
+            self._memory_mb[lang] = (
+                max(0.0, rss_after - rss_before)
+                if rss_before is not None and rss_after is not None else None
+            )
+            self._loaded_at[lang] = time.time()
+            self._last_used[lang] = self._loaded_at[lang]
+            self._errors.pop(lang, None)
+
+        print(f"✅ Modelo '{name}' cargado en {time.time() - start:.1f}s")
+        self._evict_over_budget(keep=lang)
+        return nlp
+
+    def _evict_over_budget(self, keep=None):
+        """Descarga los modelos menos usados mientras se supere el presupuesto"""
+        if not self.memory_budget_mb:
+            return
+        evicted = []
+        with self._lock:
+            while sum(mb or 0 for mb in self._memory_mb.values()) > self.memory_budget_mb:
+                victim = next((lang for lang in self._models if lang != keep), None)
+                if victim is None:
+                    break
+                self._drop(victim)
+                evicted.append(victim)
+        if evicted:
+            gc.collect()
+            print(f"♻️ Modelos descargados por presupuesto de memoria: {', '.join(evicted)}")
+
+    def _drop(self, lang):
+        self._models.pop(lang, None)
+        self._memory_mb.pop(lang, None)
+        self._loaded_at.pop(lang, None)
+        self._last_used.pop(lang, None)
+
+    def unload(self, lang):
+        """Descarga un modelo de memoria (se volvera a cargar bajo demanda)"""
+        with self._lock:
+            was_resident = lang in self._models
+            self._drop(lang)
+        if was_resident:
+            gc.collect()
+        return was_resident
+
+    def preload(self, langs=None):
+        """Carga de forma anticipada los idiomas indicados (o los configurados)"""
+        for lang in (self.preload_langs if langs is None else langs):
+            if lang in self.model_names:
+                self.get(lang)
+            else:
+                print(f"⚠️ Idioma de precarga desconocido: {lang}")
+
+    def status(self):
+        """Estado por idioma: modelo, residencia, memoria estimada y ultimo uso"""
+        with self._lock:
+            return {
+                lang: {
+                    "model": name,
+                    "resident": lang in self._models,
+                    "memory_mb": round(self._memory_mb[lang], 1)
+                    if self._memory_mb.get(lang) is not None else None,
+                    "loaded_at": self._loaded_at.get(lang),
+                    "last_used": self._last_used.get(lang),
+                    "error": self._errors.get(lang)
+                }
+                for lang, name in self.model_names.items()
+            }
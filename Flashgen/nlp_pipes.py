@@ -0,0 +1,167 @@
+"""
+Ejecucion parcial de pipelines spaCy
+
+Cada estrategia declara los componentes que necesita al registrarse (components
+de Strategy en strategies.py; process_components en server.py les añade los de
+los campos de include) y aqui se traducen a los componentes realmente presentes
+en el modelo cargado. El marcador "senter" significa "limites de oracion": se usa el
+componente `senter` (mas rapido, suele venir deshabilitado en los modelos
+entrenados), si no existe el `parser` y en ultimo caso el `sentencizer`.
+
+Por defecto se analiza con nlp.pipe / nlp() (deshabilitando los componentes
+que no hacen falta). Solo si hay un component_timer registrado (ver
+set_component_timer; en server.py con FLASHGEN_COMPONENT_TIMING=1) el analisis
+se hace componente a componente para informar del tiempo exclusivo de cada uno.
+"""
+
+import time
+
+# Componentes que marcan limites de oracion, por orden de preferencia
+SENTENCE_COMPONENTS = ("senter", "parser", "sentencizer")
+
+# Componentes que suelen escuchar a un tok2vec/transformer compartido
+LISTENER_CANDIDATES = {"tagger", "morphologizer", "parser", "ner", "senter", "lemmatizer"}
+
+
+def _is_listener(proc):
+    """True si el componente depende de un tok2vec compartido"""
+    model = getattr(proc, "model", None)
+    if model is None or not hasattr(model, "walk"):
+        return False
+    return any(node.name.endswith("listener") for node in model.walk())
+
+
+def resolve_components(nlp, needed):
+    """
+    Traduce los componentes requeridos a los nombres del pipeline, en orden de
+    ejecucion. Incluye los tok2vec/transformer compartidos de los que dependan.
+    """
+    available = dict(nlp.components)
+    needed = set(needed)
+    names = set()
+
+    for comp in needed:
+        if comp == "senter":
+            # El parser ya asigna los limites de oracion
+            if "parser" in needed and "parser" in available:
+                continue
+            for candidate in SENTENCE_COMPONENTS:
+                proc = available.get(candidate)
+                if proc is None:
+                    continue
+                # Un senter deshabilitado que escucha al tok2vec no recibiria sus salidas
+                if candidate == "senter" and candidate in nlp.disabled and _is_listener(proc):
+                    continue
+                names.add(candidate)
+                break
+        elif comp in available:
+            names.add(comp)
+
+    for name, proc in nlp.components:
+        listening = getattr(proc, "listening_components", None)
+        if listening is not None:
+            if names & set(listening):
+                names.add(name)
+        elif name in ("tok2vec", "transformer") and names & LISTENER_CANDIDATES:
+            names.add(name)
+
+    return [name for name, _ in nlp.components if name in names]
+
+
+# Callback (nombre_componente, segundos) para medir cada componente; None = sin medir
+component_timer = None
+
+
+def set_component_timer(callback):
+    """Registra el callback que recibe el tiempo de cada componente (None lo desactiva)"""
+    global component_timer
+    component_timer = callback
+
+
+class _TimedStage:
+    """Iterador que acumula el tiempo pasado dentro de next() (incluye las etapas previas)"""
+
+    def __init__(self, iterable):
+        self._it = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._it)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+def _report_stages(docs, stages, timer):
+    """
+    Emite los docs y, al agotarse, informa del tiempo exclusivo de cada etapa:
+    cada next() de una etapa incluye el de la anterior, asi que basta restar.
+    """
+    yield from docs
+    previous = 0.0
+    for name, stage in stages:
+        timer(name, max(stage.elapsed - previous, 0.0))
+        previous = stage.elapsed
+
+
+def _apply(proc, docs):
+    """Aplica un componente sin .pipe (funcion) a cada doc; `proc` queda fijado al llamar"""
+    for doc in docs:
+        yield proc(doc)
+
+
+def run_components(nlp, texts, components, batch_size=64):
+    """Aplica en orden solo `components` (aunque esten deshabilitados) a `texts`"""
+    selected = set(components)
+    timer = component_timer
+    stages = []
+    docs = (nlp.make_doc(text) for text in texts)
+    if timer is not None:
+        docs = _TimedStage(docs)
+        stages.append(("tokenizer", docs))
+    for name, proc in nlp.components:
+        if name not in selected:
+            continue
+        if hasattr(proc, "pipe"):
+            docs = proc.pipe(docs, batch_size=batch_size)
+        else:
+            docs = _apply(proc, docs)
+        if timer is not None:
+            docs = _TimedStage(docs)
+            stages.append((name, docs))
+    if timer is not None:
+        return _report_stages(docs, stages, timer)
+    return docs
+
+
+def pipe_components(nlp, texts, components=None, batch_size=64, n_process=1):
+    """
+    Analiza `texts` ejecutando solo `components` (None = pipeline completo).
+    Usa nlp.pipe con `disable` siempre que los componentes esten habilitados;
+    los deshabilitados (p. ej. senter) se aplican directamente.
+    """
+    if component_timer is not None and n_process == 1:
+        return run_components(nlp, texts, nlp.pipe_names if components is None else components, batch_size)
+    if components is None:
+        return nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+    enabled = nlp.pipe_names
+    if set(components) <= set(enabled):
+        disable = [name for name in enabled if name not in components]
+        return nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+    return run_components(nlp, texts, components, batch_size=batch_size)
+
+
+def parse_components(nlp, text, components=None):
+    """Analiza un solo texto con los componentes indicados"""
+    if component_timer is not None:
+        return list(run_components(nlp, [text], nlp.pipe_names if components is None else components))[0]
+    if components is None:
+        return nlp(text)
+    if set(components) <= set(nlp.pipe_names):
+        disable = [name for name in nlp.pipe_names if name not in components]
+        return nlp(text, disable=disable)
+    return next(iter(run_components(nlp, [text], components)))
@@ -0,0 +1,306 @@
+"""
+Perfilado bajo demanda de una peticion (?profile=1)
+
+- Ejecuta el handler con cProfile (por defecto) o con un muestreador de pila
+  propio (FLASHGEN_PROFILER=sampling, sin dependencias externas)
+- Devuelve un resumen de los N puntos calientes y guarda el perfil completo
+  en pilas colapsadas ("a;b;c 123", el formato de flamegraph.pl), exportable
+  tambien a speedscope (https://www.speedscope.app)
+- Los perfiles se guardan en un buffer circular en memoria (GET /profiles/{id})
+
+Con cProfile las pilas se reconstruyen a partir del grafo llamador -> llamado,
+repartiendo el tiempo de cada funcion entre sus llamados en proporcion al tiempo
+de cada arista (aproximado si una funcion se llama desde varios sitios). El
+muestreador da pilas exactas, pero solo ve el hilo que ejecuta el handler.
+Solo puede haber un cProfile activo por proceso (en Python 3.12+ enable() falla
+si hay otro): una peticion perfilada que se solapa con otra, o con otra
+herramienta que use sys.monitoring, se perfila con el muestreador.
+
+Configuracion por variables de entorno:
+- FLASHGEN_PROFILING: permite ?profile=1 (0 por defecto)
+- FLASHGEN_PROFILE_TOKEN: token de administracion; si esta definido habilita el
+  perfilado y se exige en la cabecera X-Flashgen-Admin-Token
+- FLASHGEN_PROFILER: "cprofile" (por defecto) o "sampling"
+- FLASHGEN_PROFILE_INTERVAL_MS: intervalo del muestreador (por defecto 1 ms)
+- FLASHGEN_PROFILE_BUFFER: perfiles guardados (por defecto 20)
+- FLASHGEN_PROFILE_TOP: puntos calientes en el resumen (por defecto 15)
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+PROFILING = os.environ.get("FLASHGEN_PROFILING", "0") == "1"
+PROFILE_TOKEN = os.environ.get("FLASHGEN_PROFILE_TOKEN") or None
+PROFILER = os.environ.get("FLASHGEN_PROFILER", "cprofile")
+PROFILE_INTERVAL = float(os.environ.get("FLASHGEN_PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_BUFFER = int(os.environ.get("FLASHGEN_PROFILE_BUFFER", "20"))
+PROFILE_TOP = int(os.environ.get("FLASHGEN_PROFILE_TOP", "15"))
+
+TOKEN_HEADER = "x-flashgen-admin-token"
+
+# Ramas por debajo de esta fraccion del total se acumulan en su padre
+MIN_BRANCH_FRACTION = 0.001
+MAX_DEPTH = 128
+
+
+def enabled():
+    return PROFILING or PROFILE_TOKEN is not None
+
+
+def authorized(headers):
+    """True si la peticion puede perfilar o leer perfiles"""
+    if not enabled():
+        return False
+    if PROFILE_TOKEN is None:
+        return True
+    return hmac.compare_digest(headers.get(TOKEN_HEADER, ""), PROFILE_TOKEN)
+
+
+def requested(query_params):
+    return query_params.get("profile") in ("1", "true")
+
+
+def _frame_label(filename, line, name):
+    label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+    # ';' separa los marcos en las pilas colapsadas
+    return label.replace(";", ",")
+
+
+# --- cProfile ---
+
+def _cprofile_report(profiler, top):
+    stats = pstats.Stats(profiler).stats  # func -> (cc, nc, tt, ct, callers)
+    stats = {func: entry for func, entry in stats.items() if "_lsprof.Profiler" not in func[2]}
+
+    hotspots = [
+        {
+            "function": _frame_label(*func),
+            "calls": nc,
+            "self_ms": round(tt * 1000, 3),
+            "total_ms": round(ct * 1000, 3)
+        }
+        for func, (cc, nc, tt, ct, callers) in sorted(stats.items(), key=lambda item: -item[1][2])[:top]
+    ]
+
+    children = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            if caller in stats:
+                children.setdefault(caller, {})[func] = edge[3]
+    roots = [func for func, entry in stats.items() if not any(caller in stats for caller in entry[4])]
+    total = sum(stats[func][3] for func in roots)
+    min_branch = total * MIN_BRANCH_FRACTION
+    folded = Counter()
+
+    def walk(func, path, on_path, inclusive):
+        _, _, tt, _, _ = stats[func]
+        path = path + (_frame_label(*func),)
+        edges = children.get(func, {})
+        # Con recursion las aristas pueden sumar mas que ct: se normaliza
+        weight = tt + sum(edges.values())
+        own = inclusive * tt / weight if weight else inclusive
+        for child, edge_ct in edges.items():
+            share = inclusive * edge_ct / weight
+            if child in on_path or share < min_branch or len(path) >= MAX_DEPTH:
+                own += share
+                continue
+            walk(child, path, on_path | {child}, share)
+        folded[path] += own
+
+    for root in roots:
+        walk(root, (), {root}, stats[root][3])
+
+    stacks = {";".join(path): round(seconds * 1e6) for path, seconds in folded.items()}
+    return hotspots, {path: micros for path, micros in stacks.items() if micros > 0}, "microseconds"
+
+
+# Un cProfile activo a la vez (ver _start_cprofile)
+_cprofile_lock = threading.Lock()
+
+
+def _start_cprofile():
+    """cProfile.Profile ya activado, o None si hay otro perfilador activo"""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # "Another profiling tool is already active" (depurador, coverage...)
+        _cprofile_lock.release()
+        return None
+    return prof
+
+
+def _stop_cprofile(prof):
+    prof.disable()
+    _cprofile_lock.release()
+
+
+# --- Muestreador ---
+
+class StackSampler(threading.Thread):
+    """Muestrea la pila de un hilo cada `interval` segundos"""
+
+    def __init__(self, thread_id, interval, root_code=None):
+        super().__init__(daemon=True)
+        self.root_code = root_code
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            # Solo las pilas por debajo de run_profiled, y no la parada del propio muestreador
+            if frame is None or not stack or stack[-1] == self.stop_label:
+                continue
+            self.samples[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    stop_label = _frame_label(stop.__code__.co_filename, stop.__code__.co_firstlineno, "stop")
+
+
+def _sampling_report(samples, elapsed, top):
+    # El muestreador necesita el GIL, asi que el intervalo real puede ser mayor
+    # que el configurado: cada muestra vale la fraccion correspondiente del tiempo total
+    interval = elapsed / max(sum(samples.values()), 1)
+    self_samples = Counter()
+    total_samples = Counter()
+    for stack, count in samples.items():
+        self_samples[stack[-1]] += count
+        for label in set(stack):
+            total_samples[label] += count
+    hotspots = [
+        {
+            "function": label,
+            "samples": count,
+            "self_ms": round(count * interval * 1000, 3),
+            "total_ms": round(total_samples[label] * interval * 1000, 3)
+        }
+        for label, count in self_samples.most_common(top)
+    ]
+    return hotspots, {";".join(stack): count for stack, count in samples.items()}, "samples"
+
+
+def run_profiled(fn, *args, profiler=None, top=None):
+    """
+    Ejecuta fn(*args) bajo el perfilador. Devuelve (resultado, perfil), donde el
+    perfil es serializable (se puede devolver desde un proceso del pool).
+    Si cProfile esta ocupado se usa el muestreador (perfil["profiler"] lo indica).
+    """
+    profiler = profiler or PROFILER
+    top = top or PROFILE_TOP
+    start = time.perf_counter()
+    prof = None
+    if profiler != "sampling":
+        prof = _start_cprofile()
+        if prof is None:
+            profiler = "sampling"
+    if profiler == "sampling":
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL, run_profiled.__code__)
+        sampler.start()
+        try:
+            result = fn(*args)
+        finally:
+            sampler.stop()
+        hotspots, stacks, unit = _sampling_report(sampler.samples, time.perf_counter() - start, top)
+    else:
+        profiler = "cprofile"
+        try:
+            result = fn(*args)
+        finally:
+            _stop_cprofile(prof)
+        hotspots, stacks, unit = _cprofile_report(prof, top)
+    return result, {
+        "profiler": profiler,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        "unit": unit,
+        "hotspots": hotspots,
+        "stacks": stacks
+    }
+
+
+# --- Formatos de salida ---
+
+def to_collapsed(profile):
+    """Pilas colapsadas para flamegraph.pl / inferno / speedscope"""
+    return "".join(f"{stack} {value}\n" for stack, value in sorted(profile["stacks"].items()))
+
+
+def to_speedscope(profile):
+    """Perfil en el formato de fichero de speedscope (tipo sampled con pesos)"""
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for stack, value in sorted(profile["stacks"].items()):
+        indices = []
+        for label in stack.split(";"):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(value)
+    unit = "microseconds" if profile["unit"] == "microseconds" else "none"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "flashgen",
+        "name": f"{profile.get('kind', '')} {profile.get('id', '')}".strip(),
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": profile.get("kind", "flashgen"),
+            "unit": unit,
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }]
+    }
+
+
+class ProfileStore:
+    """Buffer circular de perfiles (los mas antiguos se descartan)"""
+
+    def __init__(self, max_profiles=None):
+        self.max_profiles = PROFILE_BUFFER if max_profiles is None else max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, kind, profile):
+        profile = dict(profile, id=uuid.uuid4().hex[:12], kind=kind, created=time.time())
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > max(self.max_profiles, 0):
+                self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self):
+        with self._lock:
+            return [
+                {key: profile[key] for key in ("id", "kind", "profiler", "created", "duration_ms")}
+                for profile in reversed(self._profiles.values())
+            ]
@@ -1,16 +1,102 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+import asyncio
+import atexit
+import re
+import time
+import numpy
 import spacy
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from itertools import tee
+from typing import Dict, List, Optional, Union
 import os
 
+import dedupe
+from cloze import cloze_config, cloze_variants
+from doc_cache import DocCache, cached_parse, cached_parse_many
+from doc_view import doc_view
+from encoding import FastJSONResponse, make_response
+from incremental import parse_incremental
+from jobs import JobManager
+from model_registry import ModelRegistry
+import metrics
+import profiling
+from nlp_pipes import pipe_components, resolve_components, set_component_timer
+from similarity import SentenceSimilarity, token_vectors
+from strategies import StrategyError, StrategyRegistry
+from syntax_extract import split_by_conjunctions, syntax_columns
+from term_index import KINDS as TERM_KINDS, TermIndex, extract_terms
+from streaming import MEDIA_TYPES, format_event, iter_segments
+from worker_pool import WorkerPool, WorkerPoolFull, in_worker
+
 class TextPayload(BaseModel):
     text: str
     lang: str  # "en", "es" o "fr"
     strategy: Optional[str] = "sentences"  # "sentences", "entities", "noun_chunks", "semantic_similarity"
+    include: Optional[List[str]] = None  # Campos extra de /process: "sentences", "entities", "noun_chunks"
+    chapter_patterns: Optional[List[str]] = None  # Regex de titulos de capitulo (chapter_sents, /process/stream)
+    params: Optional[dict] = None  # Parametros de la estrategia (ver GET /strategies)
+    dedupe: Optional[Union[bool, dict]] = None  # Marcar/eliminar chunks casi duplicados (ver /dedupe)
+    incremental: Optional[bool] = False  # Solo /process: reanalizar solo los parrafos nuevos o cambiados
+    syntax_format: Optional[str] = "tokens"  # Solo /enhance: syntax_analysis "tokens" (por token) o "columnar"
+
+class AnalyzePayload(BaseModel):
+    lang: str
+    text: Optional[str] = None
+    strategy: Optional[str] = None  # Segmentacion como /process (None = sin segmentacion)
+    include: Optional[List[str]] = None  # Campos extra de la segmentacion
+    chapter_patterns: Optional[List[str]] = None  # Regex de titulos de capitulo (chapter_sents)
+    params: Optional[dict] = None  # Parametros de la estrategia de segmentacion
+    enhance: Optional[List[str]] = None  # Secciones de /enhance (["all"] = todas)
+    syntax_format: Optional[str] = "tokens"  # Formato de syntax_analysis: "tokens" o "columnar"
+    cards: Optional[List[dict]] = None
+    validation: Optional[bool] = False  # Validar las cards como /validate
+    cloze: Optional[dict] = None  # Config de /generate_cloze ({} = config por defecto)
+
+class DedupePayload(BaseModel):
+    lang: Optional[str] = "es"
+    texts: Optional[List[str]] = None
+    cards: Optional[List[dict]] = None  # Se compara pregunta + respuesta
+    method: Optional[str] = "minhash"  # "minhash" (shingles) o "vectors" (vectores del modelo)
+    threshold: Optional[float] = Field(None, ge=0, le=1)  # Jaccard o coseno minimo (por defecto FLASHGEN_DEDUPE_THRESHOLD)
+    collapse: Optional[bool] = False  # Devolver solo los elementos no duplicados
+
+class CorpusDocumentPayload(BaseModel):
+    text: str
+    lang: str
+    doc_id: Optional[str] = None  # Id del documento (si ya existe se reemplaza)
+
+class StreamPayload(TextPayload):
+    format: Optional[str] = "ndjson"  # "ndjson" o "sse"
+    segment_chars: Optional[int] = Field(None, ge=1)  # Tamaño maximo de segmento (caracteres)
+
+class BatchPayload(BaseModel):
+    documents: List[dict]  # Payloads de /process (text, lang, strategy...; "id" opcional)
+    # Valores por defecto para los documentos que no los indican
+    lang: Optional[str] = None
+    strategy: Optional[str] = None
+    include: Optional[List[str]] = None
+    chapter_patterns: Optional[List[str]] = None
+    params: Optional[dict] = None
+    dedupe: Optional[Union[bool, dict]] = None
+    stream: Optional[bool] = False  # Emitir cada resultado al terminar (NDJSON/SSE)
+    format: Optional[str] = "ndjson"  # "ndjson" o "sse" (con stream)
+
+class ComparePayload(BaseModel):
+    text: str
+    lang: str
+    strategies: Optional[List[str]] = None  # Estrategias a comparar (None = todas las registradas)
+    params: Optional[Dict[str, dict]] = None  # Parametros por estrategia: {"clause_segment": {"max_tokens": 20}}
+    chapter_patterns: Optional[List[str]] = None  # Regex de titulos de capitulo (chapter_sents)
+    parallel: Optional[bool] = False  # Ejecutar las estrategias en hilos sobre el mismo Doc
+    chunks: Optional[bool] = True  # Devolver los chunks de cada estrategia (false = solo estadisticas)
 
-app = FastAPI()
+# Respuestas JSON con orjson (ver encoding.py)
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configurar CORS para permitir peticiones desde el navegador
 app.add_middleware(
@@ -21,18 +107,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Cargar modelos LG con vectores word2vec
-print("🔄 Cargando modelos spaCy...")
-models = {
-    "en": spacy.load("en_core_web_lg"),
-    "es": spacy.load("es_core_news_lg"),
-    "fr": spacy.load("fr_core_news_lg")
+# Los procesos del pool (ver worker_pool.py) importan este modulo (con "spawn"
+# tambien como __mp_main__). Ahi no se precarga ni se crean pools anidados.
+IS_POOL_CHILD = in_worker()
+
+# Modelos LG con vectores word2vec, cargados bajo demanda (ver model_registry.py)
+registry = ModelRegistry.from_env()
+if not IS_POOL_CHILD:
+    registry.preload()
+
+def model_error(lang):
+    """Mensaje de error cuando no hay modelo disponible para el idioma"""
+    if registry.is_supported(lang):
+        return f"No se pudo cargar el modelo para {lang}: {registry.last_error(lang)}"
+    return f"Idioma no soportado: {lang}. Disponibles: {registry.available()}"
+
+# Cache compartido de Docs analizados (ver doc_cache.py)
+doc_cache = DocCache.from_env()
+
+# Tiempo por componente spaCy en las metricas (ver metrics.py y nlp_pipes.py).
+# Opcional (FLASHGEN_COMPONENT_TIMING=1): para medir cada componente el analisis
+# se hace componente a componente en lugar de con nlp.pipe / nlp().
+if os.environ.get("FLASHGEN_COMPONENT_TIMING", "0") == "1":
+    set_component_timer(metrics.record_component)
+
+def get_doc(lang, text, needs=None):
+    """
+    Analiza `text` con el modelo de `lang` pasando por el cache compartido.
+    `needs` limita los componentes ejecutados (None = pipeline completo).
+    """
+    nlp = registry.get(lang)
+    if nlp is None:
+        return None
+    components = resolve_components(nlp, needs) if needs is not None else None
+    with metrics.stage("parse"):
+        doc = cached_parse(nlp, lang, text, doc_cache, components)
+    metrics.record_tokens(len(doc))
+    return doc
+
+def get_doc_incremental(lang, text, needs=None):
+    """
+    Como get_doc, pero por parrafos: solo se analizan los que no estan en el
+    cache (ver incremental.py). Devuelve (Doc, parrafos) o (None, None).
+    """
+    nlp = registry.get(lang)
+    if nlp is None:
+        return None, None
+    components = resolve_components(nlp, needs) if needs is not None else None
+    with metrics.stage("parse"):
+        doc, paragraphs = parse_incremental(nlp, lang, text, doc_cache, components, batch_size=PIPE_BATCH_SIZE)
+    metrics.record_tokens(len(doc))
+    return doc, paragraphs
+
+# Parametros de nlp.pipe para los endpoints que analizan muchos textos
+PIPE_BATCH_SIZE = int(os.environ.get("FLASHGEN_BATCH_SIZE", "64"))
+PIPE_N_PROCESS = int(os.environ.get("FLASHGEN_N_PROCESS", "1"))
+
+def get_docs(lang, texts, batch_size=None, n_process=None, needs=None):
+    """Analiza una lista de textos en lote (nlp.pipe) pasando por el cache compartido"""
+    nlp = registry.get(lang)
+    if nlp is None:
+        return None
+    components = resolve_components(nlp, needs) if needs is not None else None
+    # Los procesos del pool son daemon y no pueden lanzar los de nlp.pipe
+    n_process = 1 if IS_POOL_CHILD else (n_process or PIPE_N_PROCESS)
+    with metrics.stage("parse"):
+        docs = cached_parse_many(
+            nlp, lang, texts, doc_cache,
+            batch_size=batch_size or PIPE_BATCH_SIZE,
+            n_process=n_process,
+            components=components
+        )
+    metrics.record_tokens(sum(len(doc) for doc in docs))
+    return docs
+
+# Componentes spaCy ("senter" = limites de oracion, resuelto a senter/parser/
+# sentencizer segun el modelo; ver nlp_pipes.py). Los de cada estrategia se
+# declaran al registrarla (ver strategy_registry).
+# (con parser, "senter" no añade nada; sin parser aporta los limites de oracion)
+SYNTAX_COMPONENTS = ["tagger", "morphologizer", "attribute_ruler", "lemmatizer", "parser", "senter"]
+NOUN_CHUNK_COMPONENTS = ["tagger", "morphologizer", "attribute_ruler", "parser"]
+
+# Componentes de los campos opcionales de /process (payload.include)
+INCLUDE_COMPONENTS = {
+    "sentences": ["senter"],
+    "entities": ["ner"],
+    "noun_chunks": NOUN_CHUNK_COMPONENTS
 }
-print("✅ Modelos cargados correctamente")
+
+# /validate solo usa entidades, POS y vectores: no necesita el parser
+VALIDATE_COMPONENTS = ["ner", "tagger", "morphologizer", "attribute_ruler"]
+
+# Cloze usa entidades, sintagmas nominales y dependencias
+CLOZE_COMPONENTS = SYNTAX_COMPONENTS + ["ner"]
+
+def process_components(strategy, include=None):
+    """Union de los componentes de la estrategia y de los campos opcionales pedidos"""
+    needs = list(strategy_registry.get(strategy).components)
+    for field in include or []:
+        needs.extend(INCLUDE_COMPONENTS.get(field, []))
+    return needs
 
 def segment_by_sentences(doc):
     """Segmentacion por oraciones (doc.sents)"""
-    return [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+    return [text for text in doc_view(doc).sent_texts if text]
 
 def segment_by_entities(doc):
     """Segmentacion agrupando por entidades nombradas"""
@@ -53,7 +231,7 @@ def segment_by_entities(doc):
 def segment_by_noun_chunks(doc):
     """Segmentacion por sintagmas nominales (noun chunks)"""
     chunks = []
-    for nc in doc.noun_chunks:
+    for nc in doc_view(doc).noun_chunks:
         # Agregar contexto: noun chunk + verbo siguiente si existe
         start = nc.start
         end = min(nc.end + 3, len(doc))  # +3 tokens de contexto
@@ -62,179 +240,347 @@ def segment_by_noun_chunks(doc):
     
     return [c for c in chunks if c]
 
+class AdjacentSimilarity:
+    """
+    Similitud de cada oracion con la anterior, calculada en bloque por Doc con
+    SentenceSimilarity. Conserva el vector de la ultima oracion entre llamadas
+    para comparar la primera oracion del siguiente segmento.
+    """
+    def __init__(self):
+        self.prev_unit = None
+        self.prev_has_vector = False
+    
+    def compute(self, sentences, engine=None):
+        """
+        Lista de (oracion, similitud con la anterior o None si alguna no tiene vector).
+        `engine`: SentenceSimilarity ya calculado para exactamente esas oraciones.
+        """
+        if not sentences:
+            return []
+        if engine is None:
+            engine = SentenceSimilarity(sentences[0].doc, sentences)
+        sims = numpy.empty(len(sentences), dtype="float32")
+        sims[1:] = engine.adjacent()
+        sims[0] = engine.unit[0] @ self.prev_unit if self.prev_unit is not None else 0.0
+        prev_has_vector = numpy.concatenate([[self.prev_has_vector], engine.has_vector[:-1]])
+        valid = prev_has_vector & engine.has_vector
+        
+        self.prev_unit = engine.unit[-1]
+        self.prev_has_vector = bool(engine.has_vector[-1])
+        return [
+            (sent, float(sim) if ok else None)
+            for sent, sim, ok in zip(sentences, sims, valid)
+        ]
+    
+    def reset(self):
+        self.prev_unit = None
+        self.prev_has_vector = False
+
+class SemanticSimilarityGrouper:
+    """
+    Agrupa oraciones consecutivas con similitud >= threshold.
+    Conserva el chunk abierto entre llamadas a feed() para procesar texto por segmentos.
+    """
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.adjacent = AdjacentSimilarity()
+        self.current_chunk = []
+    
+    def feed(self, sentences, engine=None):
+        chunks = []
+        for sent, similarity in self.adjacent.compute(list(sentences), engine):
+            if not self.current_chunk:
+                self.current_chunk = [sent.text]
+                continue
+            
+            # Similitud coseno con la oracion anterior (None si falta algun vector)
+            if similarity is not None:
+                if similarity >= self.threshold:
+                    # Alta similitud -> agregar a chunk actual
+                    self.current_chunk.append(sent.text)
+                else:
+                    # Baja similitud -> crear nuevo chunk
+                    chunks.append(" ".join(self.current_chunk))
+                    self.current_chunk = [sent.text]
+            else:
+                # Sin vectores, agrupar por defecto
+                self.current_chunk.append(sent.text)
+        return chunks
+    
+    def flush(self):
+        chunks = []
+        if self.current_chunk:
+            chunks.append(" ".join(self.current_chunk))
+        self.current_chunk = []
+        self.adjacent.reset()
+        return chunks
+
 def segment_by_semantic_similarity(doc, threshold=0.7):
     """Segmentacion usando similitud semantica con vectores"""
     if not doc.has_vector:
         # Fallback a oraciones si no hay vectores
         return segment_by_sentences(doc)
     
-    sentences = list(doc.sents)
+    view = doc_view(doc)
+    sentences = view.sents
     if len(sentences) <= 1:
         return [s.text for s in sentences]
     
-    chunks = []
-    current_chunk = [sentences[0]]
-    
-    for i in range(1, len(sentences)):
-        prev_sent = current_chunk[-1]
-        curr_sent = sentences[i]
-        
-        # Calcular similitud coseno entre vectores de oraciones
-        if prev_sent.has_vector and curr_sent.has_vector:
-            similarity = prev_sent.similarity(curr_sent)
-            
-            if similarity >= threshold:
-                # Alta similitud -> agregar a chunk actual
-                current_chunk.append(curr_sent)
-            else:
-                # Baja similitud -> crear nuevo chunk
-                chunks.append(" ".join([s.text for s in current_chunk]))
-                current_chunk = [curr_sent]
-        else:
-            # Sin vectores, agrupar por defecto
-            current_chunk.append(curr_sent)
-    
-    # Agregar ultimo chunk
-    if current_chunk:
-        chunks.append(" ".join([s.text for s in current_chunk]))
+    grouper = SemanticSimilarityGrouper(threshold)
+    chunks = grouper.feed(sentences, view.similarity) + grouper.flush()
     
     return [c.strip() for c in chunks if c.strip()]
 
-def detect_chapters(text):
-    """Detecta capitulos en el texto usando patrones comunes"""
-    import re
+# Titulos de capitulo (multiidioma), al inicio de linea
+CHAPTER_PATTERNS = [
+    r'(Chapter|CHAPTER|Capitulo|CAPiTULO|Chapitre|CHAPITRE)[^\S\n]+(\d+|[IVXLCDM]+)',
+    r'(\d+)\.[^\S\n]+[A-Z]',  # "1. Introduccion"
+    r'[IVXLCDM]+\.[^\S\n]+[A-Z]'  # "I. Introduction"
+]
+NON_SPACE = re.compile(r'\S')
+
+@lru_cache(maxsize=64)
+def compile_chapter_patterns(patterns):
+    """
+    Una sola regex para todos los patrones: cada uno se prueba al inicio de una
+    linea (ignorando la sangria) y el titulo es la linea completa.
+    """
+    alternatives = '|'.join(f'(?:{pattern.lstrip("^")})' for pattern in patterns)
+    return re.compile(rf'^[^\S\n]*(?:{alternatives}).*$', re.MULTILINE)
+
+def chapter_patterns_error(patterns):
+    """Mensaje de error si algun patron de capitulo no compila (None si son validos)"""
+    if patterns is not None and not isinstance(patterns, (list, tuple)):
+        return "chapter_patterns debe ser una lista de expresiones regulares"
+    for pattern in patterns or []:
+        if not isinstance(pattern, str):
+            return f"Patron de capitulo invalido: {pattern!r}"
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return f"Patron de capitulo invalido {pattern!r}: {e}"
+    return None
+
+def detect_chapters(text, patterns=None):
+    """
+    Detecta capitulos en el texto usando patrones comunes (o `patterns`).
+    Devuelve [{'title', 'start', 'end'}] con offsets de caracteres en `text`;
+    el titulo queda fuera del capitulo salvo si aun no habia texto antes.
+    Lanza re.error si un patron propio no es valido.
+    """
+    heading_re = compile_chapter_patterns(tuple(patterns or CHAPTER_PATTERNS))
     chapters = []
+    current = {'title': 'Inicio', 'start': 0}
     
-    # Patrones para detectar capitulos (multiidioma)
-    patterns = [
-        r'^(Chapter|CHAPTER|Capitulo|CAPiTULO|Chapitre|CHAPITRE)\s+(\d+|[IVXLCDM]+)',
-        r'^(\d+)\.\s+[A-Z]',  # "1. Introduccion"
-        r'^[IVXLCDM]+\.\s+[A-Z]'  # "I. Introduction"
-    ]
-    
-    lines = text.split('\n')
-    current_chapter = {'title': 'Inicio', 'start': 0, 'text': ''}
-    
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        if not line_stripped:
+    for match in heading_re.finditer(text):
+        # Un titulo sin texto previo en el capitulo forma parte de su texto
+        if not NON_SPACE.search(text, current['start'], match.start()):
             continue
-            
-        # Verificar si es un titulo de capitulo
-        is_chapter = False
-        for pattern in patterns:
-            if re.match(pattern, line_stripped):
-                is_chapter = True
-                break
-        
-        if is_chapter and current_chapter['text']:
-            # Guardar capitulo anterior
-            chapters.append(current_chapter)
-            # Iniciar nuevo capitulo
-            current_chapter = {'title': line_stripped, 'start': i, 'text': ''}
-        else:
-            current_chapter['text'] += line + '\n'
+        current['end'] = match.start()
+        chapters.append(current)
+        current = {'title': match.group().strip(), 'start': match.end()}
     
     # Agregar ultimo capitulo
-    if current_chapter['text']:
-        chapters.append(current_chapter)
+    current['end'] = len(text)
+    if NON_SPACE.search(text, current['start']):
+        chapters.append(current)
     
-    return chapters if len(chapters) > 1 else [{'title': 'Documento completo', 'text': text, 'start': 0}]
+    return chapters if len(chapters) > 1 else [{'title': 'Documento completo', 'start': 0, 'end': len(text)}]
 
-def segment_chapter_sents(text, doc, chunk_size=500, lang='es'):
+def chapter_sentences(doc, chapters):
     """
-    CHAPTER_SENTS: Para libros tecnicos/estudio
-    Respeta estructura de capitulos + segmentacion fina por oraciones
+    Asigna las oraciones de `doc` a cada capitulo (offsets de detect_chapters) en
+    una sola pasada. Las oraciones que cruzan el limite de un capitulo se recortan.
+    Genera (capitulo, [Span]).
     """
-    chapters = detect_chapters(text)
-    chunks = []
-    
+    sentences = iter(doc_view(doc).sents)
+    sent = next(sentences, None)
     for chapter in chapters:
-        # Procesar texto del capitulo con spaCy usando el idioma especificado
-        chapter_doc = models.get(lang, models.get('es'))(chapter['text'])
-        
-        # Agrupar oraciones hasta chunk_size
-        current_chunk = []
-        current_size = 0
+        span = doc.char_span(chapter['start'], chapter['end'], alignment_mode='contract')
+        if span is None:
+            continue
+        spans = []
+        while sent is not None and sent.start < span.end:
+            if sent.end > span.start:
+                spans.append(doc[max(sent.start, span.start):min(sent.end, span.end)])
+            if sent.end > span.end:
+                break
+            sent = next(sentences, None)
+        yield chapter, spans
+
+class ChapterSentsGrouper:
+    """
+    Agrupa oraciones hasta chunk_size caracteres sin mezclar capitulos.
+    Conserva el chunk abierto entre llamadas a feed() para procesar texto por segmentos.
+    """
+    def __init__(self, chunk_size=500):
+        self.chunk_size = chunk_size
+        self.chapter = None
+        self.current_chunk = []
+        self.current_size = 0
+    
+    def _close(self):
+        chunk = {
+            'text': ' '.join(self.current_chunk),
+            'metadata': {'chapter': self.chapter, 'type': 'chapter_sents'}
+        }
+        self.current_chunk = []
+        self.current_size = 0
+        return chunk
+    
+    def feed(self, chapter, sentences):
+        chunks = []
+        if chapter != self.chapter:
+            if self.current_chunk:
+                chunks.append(self._close())
+            self.chapter = chapter
         
-        for sent in chapter_doc.sents:
+        for sent in sentences:
             sent_text = sent.text.strip()
             if not sent_text:
                 continue
                 
             sent_size = len(sent_text)
             
-            if current_size + sent_size > chunk_size and current_chunk:
-                chunks.append({
-                    'text': ' '.join(current_chunk),
-                    'metadata': {'chapter': chapter['title'], 'type': 'chapter_sents'}
-                })
-                current_chunk = [sent_text]
-                current_size = sent_size
-            else:
-                current_chunk.append(sent_text)
-                current_size += sent_size
-        
-        if current_chunk:
-            chunks.append({
-                'text': ' '.join(current_chunk),
-                'metadata': {'chapter': chapter['title'], 'type': 'chapter_sents'}
-            })
+            if self.current_size + sent_size > self.chunk_size and self.current_chunk:
+                chunks.append(self._close())
+            self.current_chunk.append(sent_text)
+            self.current_size += sent_size
+        return chunks
+    
+    def flush(self):
+        return [self._close()] if self.current_chunk else []
+
+def segment_chapter_sents(text, doc, chunk_size=500, patterns=None):
+    """
+    CHAPTER_SENTS: Para libros tecnicos/estudio
+    Respeta estructura de capitulos + segmentacion fina por oraciones.
+    Los capitulos se proyectan sobre `doc`, asi que el libro se analiza una sola vez.
+    """
+    grouper = ChapterSentsGrouper(chunk_size)
+    chunks = []
+    
+    for chapter, sentences in chapter_sentences(doc, detect_chapters(text, patterns)):
+        # Agrupar oraciones hasta chunk_size
+        chunks.extend(grouper.feed(chapter['title'], sentences))
+        chunks.extend(grouper.flush())
     
     return chunks
 
+ENTITY_CONTEXT_LABELS = frozenset(['PERSON', 'ORG', 'GPE', 'LOC', 'DATE', 'EVENT', 'NORP'])
+
 def segment_entity_context(doc, context_window=1):
     """
     ENTITY_CONTEXT: Para biografias/historia/noticias
     Segmenta por entidades + contexto (oraciones vecinas)
+
+    Las entidades llegan en orden, asi que las ventanas ya emitidas forman un
+    intervalo que solo crece: una entidad cuya oracion cae antes de su final
+    ya esta cubierta. Coste lineal en tokens + entidades.
     """
     chunks = []
-    processed_sents = set()
-    sentences = list(doc.sents)
+    view = doc_view(doc)
+    sentences = view.sents
+    if not sentences:
+        return chunks
+    sent_texts = view.sent_texts
+    covered_end = 0  # Fin (exclusivo) de las oraciones ya procesadas
     
-    for ent in doc.ents:
+    # Oracion de cada entidad (la de su primer token, como ent.sent)
+    for ent, sent_idx in zip(view.ents, view.entity_sents):
         # Filtrar solo entidades relevantes
-        if ent.label_ not in ['PERSON', 'ORG', 'GPE', 'LOC', 'DATE', 'EVENT', 'NORP']:
+        if ent.label_ not in ENTITY_CONTEXT_LABELS:
             continue
         
-        # Encontrar indice de la oracion de la entidad
-        sent = ent.sent
-        try:
-            sent_idx = sentences.index(sent)
-        except ValueError:
-            continue
-        
-        if sent_idx in processed_sents:
+        if sent_idx < covered_end:
             continue
         
         # Contexto: oracion anterior + actual + siguiente
         start = max(0, sent_idx - context_window)
         end = min(len(sentences), sent_idx + context_window + 1)
         
-        context_sents = sentences[start:end]
-        chunk_text = ' '.join(s.text.strip() for s in context_sents)
-        
         chunks.append({
-            'text': chunk_text,
+            'text': ' '.join(sent_texts[start:end]),
             'metadata': {
                 'entity': ent.text,
                 'entity_type': ent.label_,
-                'main_sentence': sent.text.strip(),
+                'main_sentence': sent_texts[sent_idx],
                 'type': 'entity_context'
             }
         })
         
-        # Marcar oraciones como procesadas
-        processed_sents.update(range(start, end))
+        covered_end = end
     
     return chunks
 
+class SemanticBlocksGrouper:
+    """
+    Corta bloques en cambios de tema (baja similitud) o al superar 600 caracteres.
+    Conserva el bloque abierto entre llamadas a feed() para procesar texto por segmentos.
+    """
+    def __init__(self, similarity_threshold=0.3):
+        self.similarity_threshold = similarity_threshold
+        self.adjacent = AdjacentSimilarity()
+        self.current_block = []
+        self.current_length = 0
+        self.block_sims = []  # similitudes entre oraciones consecutivas del bloque
+    
+    def feed(self, sentences, engine=None):
+        chunks = []
+        for sent, similarity in self.adjacent.compute(list(sentences), engine):
+            if not self.current_block:
+                self.current_block = [sent.text]
+                self.current_length = len(sent.text)
+                continue
+            
+            # Similitud semantica con la oracion anterior
+            has_vectors = similarity is not None
+            if not has_vectors:
+                similarity = 1.0  # Asumir alta similitud si no hay vectores
+            
+            # Cortar si: baja similitud O chunk muy largo (>600 chars)
+            if similarity < self.similarity_threshold or self.current_length > 600:
+                # Similitud promedio del bloque
+                avg_sim = sum(self.block_sims) / len(self.block_sims) if self.block_sims else 0.0
+                
+                chunks.append({
+                    'text': ' '.join(text.strip() for text in self.current_block),
+                    'metadata': {
+                        'avg_similarity': round(avg_sim, 3),
+                        'num_sentences': len(self.current_block),
+                        'type': 'semantic_blocks'
+                    }
+                })
+                self.current_block = [sent.text]
+                self.current_length = len(sent.text)
+                self.block_sims = []
+            else:
+                self.current_block.append(sent.text)
+                self.current_length += len(sent.text)
+                if has_vectors:
+                    self.block_sims.append(similarity)
+        return chunks
+    
+    def flush(self):
+        chunks = []
+        if self.current_block:
+            chunks.append({
+                'text': ' '.join(text.strip() for text in self.current_block),
+                'metadata': {'type': 'semantic_blocks'}
+            })
+        self.adjacent.reset()
+        self.current_block = []
+        self.current_length = 0
+        self.block_sims = []
+        return chunks
+
 def segment_semantic_blocks(doc, similarity_threshold=0.3):
     """
     SEMANTIC_BLOCKS: Para filosofia/ensayos densos
     Segmentacion semantica real con vectores (corta en cambios de tema)
     """
-    sentences = list(doc.sents)
+    view = doc_view(doc)
+    sentences = view.sents
     if len(sentences) < 2:
         return [{'text': doc.text, 'metadata': {'type': 'semantic_blocks'}}]
     
@@ -242,161 +588,96 @@ def segment_semantic_blocks(doc, similarity_threshold=0.3):
         # Fallback a oraciones si no hay vectores
         return [{'text': s.text, 'metadata': {'type': 'semantic_blocks'}} for s in sentences]
     
-    chunks = []
-    current_block = [sentences[0]]
+    grouper = SemanticBlocksGrouper(similarity_threshold)
+    return grouper.feed(sentences, view.similarity) + grouper.flush()
+
+class VocabCollector:
+    """
+    Acumula terminos (noun chunks de 2+ palabras) y verbos clave de uno o varios Doc.
+    Solo guarda la frecuencia y los 3 primeros ejemplos de cada termino.
+    """
+    def __init__(self, min_freq=2, max_verbs=20):
+        self.min_freq = min_freq
+        self.max_verbs = max_verbs
+        self.vocab_terms = {}
+        self.verb_chunks = {}
     
-    for i in range(1, len(sentences)):
-        prev_sent = sentences[i-1]
-        curr_sent = sentences[i]
+    def add(self, doc):
+        view = doc_view(doc)
+        # 1. Extraer noun_chunks como terminos clave
+        for chunk in view.noun_chunks:
+            term = chunk.text.lower().strip()
+            # Solo frases de 2+ palabras
+            if len(term.split()) >= 2:
+                entry = self.vocab_terms.setdefault(term, {'frequency': 0, 'examples': []})
+                entry['frequency'] += 1
+                if len(entry['examples']) < 3:
+                    entry['examples'].append(view.sent_texts[view.sent_index[chunk.start]])
         
-        # Calcular similitud semantica
-        if prev_sent.has_vector and curr_sent.has_vector:
-            similarity = prev_sent.similarity(curr_sent)
-        else:
-            similarity = 1.0  # Asumir alta similitud si no hay vectores
+        # 2. Extraer verbos importantes (primera oracion de cada lema)
+        for token in doc:
+            if len(self.verb_chunks) >= self.max_verbs:
+                break
+            if token.pos_ == 'VERB' and not token.is_stop and len(token.text) > 4:
+                if token.lemma_ not in self.verb_chunks:
+                    self.verb_chunks[token.lemma_] = view.sent_texts[view.sent_index[token.i]]
+    
+    def chunks(self):
+        chunks = []
         
-        current_length = sum(len(s.text) for s in current_block)
+        # Chunks de vocabulario (terminos repetidos)
+        for term, entry in self.vocab_terms.items():
+            if entry['frequency'] >= self.min_freq:
+                chunks.append({
+                    'text': entry['examples'][0],  # Primera aparicion
+                    'metadata': {
+                        'term': term,
+                        'vocab_type': 'noun_phrase',
+                        'frequency': entry['frequency'],
+                        'examples': entry['examples'],
+                        'type': 'vocab_extract'
+                    }
+                })
         
-        # Cortar si: baja similitud O chunk muy largo (>600 chars)
-        if similarity < similarity_threshold or current_length > 600:
-            # Calcular similitud promedio del bloque
-            avg_sim = 0.0
-            if len(current_block) > 1:
-                sims = []
-                for j in range(len(current_block) - 1):
-                    if current_block[j].has_vector and current_block[j+1].has_vector:
-                        sims.append(current_block[j].similarity(current_block[j+1]))
-                avg_sim = sum(sims) / len(sims) if sims else 0.0
-            
+        # Chunks de verbos (acciones clave) - Top 20
+        for lemma, sent_text in self.verb_chunks.items():
             chunks.append({
-                'text': ' '.join(s.text.strip() for s in current_block),
+                'text': sent_text,
                 'metadata': {
-                    'avg_similarity': round(avg_sim, 3),
-                    'num_sentences': len(current_block),
-                    'type': 'semantic_blocks'
+                    'term': lemma,
+                    'vocab_type': 'verb',
+                    'type': 'vocab_extract'
                 }
             })
-            current_block = [curr_sent]
-        else:
-            current_block.append(curr_sent)
-    
-    # Agregar ultimo bloque
-    if current_block:
-        chunks.append({
-            'text': ' '.join(s.text.strip() for s in current_block),
-            'metadata': {'type': 'semantic_blocks'}
-        })
-    
-    return chunks
+        
+        return chunks
 
 def segment_vocab_extract(doc, min_freq=2):
     """
     VOCAB_EXTRACT: Para aprendizaje de idiomas
     Extrae vocabulario clave (noun chunks + verbos) + contexto
     """
-    chunks = []
-    
-    # 1. Extraer noun_chunks como terminos clave
-    vocab_terms = {}
-    for chunk in doc.noun_chunks:
-        term = chunk.text.lower().strip()
-        # Solo frases de 2+ palabras
-        if len(term.split()) >= 2:
-            if term not in vocab_terms:
-                vocab_terms[term] = []
-            vocab_terms[term].append(chunk.sent.text.strip())
-    
-    # 2. Extraer verbos importantes
-    important_verbs = [token for token in doc 
-                      if token.pos_ == 'VERB' 
-                      and not token.is_stop
-                      and len(token.text) > 4]
-    
-    # Chunks de vocabulario (terminos repetidos)
-    for term, contexts in vocab_terms.items():
-        if len(contexts) >= min_freq:
-            chunks.append({
-                'text': contexts[0],  # Primera aparicion
-                'metadata': {
-                    'term': term,
-                    'vocab_type': 'noun_phrase',
-                    'frequency': len(contexts),
-                    'examples': contexts[:3],
-                    'type': 'vocab_extract'
-                }
-            })
-    
-    # Chunks de verbos (acciones clave) - Top 20
-    verb_chunks = {}
-    for verb in important_verbs:
-        lemma = verb.lemma_
-        if lemma not in verb_chunks:
-            verb_chunks[lemma] = verb.sent.text.strip()
-    
-    for lemma, sent_text in list(verb_chunks.items())[:20]:
-        chunks.append({
-            'text': sent_text,
-            'metadata': {
-                'term': lemma,
-                'vocab_type': 'verb',
-                'type': 'vocab_extract'
-            }
-        })
-    
-    return chunks
-
-def extract_clause(verb):
-    """
-    Extrae todos los tokens que dependen del verbo (clausula completa)
-    Recorre el subarbol de dependencias excluyendo conjunciones coordinantes
-    """
-    clause = [verb]
-    
-    def get_subtree(token):
-        for child in token.children:
-            # Excluir conjunciones coordinantes que inician nueva clausula
-            if child.dep_ in ['cc', 'conj'] and child.pos_ == 'CCONJ':
-                continue
-            clause.append(child)
-            get_subtree(child)
-    
-    get_subtree(verb)
-    return clause
+    collector = VocabCollector(min_freq)
+    collector.add(doc)
+    return collector.chunks()
 
-def split_by_conjunctions(tokens):
-    """
-    Si una clausula es muy larga, dividir por conjunciones coordinantes
-    Busca: 'y', 'pero', 'mas', 'sino', 'o' (español) y 'and', 'but', 'or' (ingles)
-    """
-    sub_clauses = []
-    current = []
-    
-    conjunctions = ['y', 'pero', 'mas', 'sino', 'o', 'and', 'but', 'or', 'yet']
-    
-    for token in sorted(tokens, key=lambda x: x.i):
-        if token.text.lower() in conjunctions and len(current) > 5:
-            sub_clauses.append(current)
-            current = []
-        else:
-            current.append(token)
-    
-    if current:
-        sub_clauses.append(current)
-    
-    return sub_clauses if len(sub_clauses) > 1 else [tokens]
+# Dependencias que forman parte del sintagma verbal (verbo + sus subarboles)
+VERB_PHRASE_DEPS = ('obj', 'dobj', 'iobj', 'obl', 'advmod', 'neg', 'aux', 'auxpass')
+ENHANCE_VERB_PHRASE_DEPS = ('obj', 'dobj', 'iobj', 'obl', 'advmod')
 
 def segment_clause(doc, max_tokens=15):
     """
     CLAUSE_SEGMENT: Para analisis sintactico profundo
     Segmenta en clausulas sintacticas (cada una con verbo principal)
     Usa el arbol de dependencias para extraer clausulas completas
+    (subarbol del ROOT sin conjunciones coordinantes, ver syntax_extract.py)
     """
     chunks = []
+    view = doc_view(doc)
+    arrays = view.arrays
     
-    for sent in doc.sents:
-        # Encontrar verbos principales (ROOT del arbol de dependencias)
-        root_verbs = [token for token in sent if token.dep_ == 'ROOT']
-        
+    # Verbos principales de cada oracion (ROOT del arbol de dependencias)
+    for sent, root_verbs in zip(view.sents, view.roots):
         if not root_verbs:
             # Sin verbo principal, chunk completo
             chunks.append({
@@ -409,17 +690,15 @@ def segment_clause(doc, max_tokens=15):
             continue
         
         # Para cada verbo principal, extraer su clausula
-        for verb in root_verbs:
-            clause_tokens = extract_clause(verb)
-            clause_text = ' '.join(t.text for t in sorted(clause_tokens, key=lambda x: x.i))
+        for i in root_verbs:
+            verb = doc[i]
+            clause = arrays.clause(i)
             
             # Si la clausula es muy larga, subdividir por conjunciones
-            if len(clause_tokens) > max_tokens:
-                sub_clauses = split_by_conjunctions(clause_tokens)
-                for sub in sub_clauses:
-                    sub_text = ' '.join(t.text for t in sorted(sub, key=lambda x: x.i))
+            if len(clause) > max_tokens:
+                for sub in split_by_conjunctions(arrays, clause):
                     chunks.append({
-                        'text': sub_text.strip(),
+                        'text': arrays.join(sub).strip(),
                         'metadata': {
                             'type': 'sub_clause',
                             'verb': verb.lemma_,
@@ -429,12 +708,12 @@ def segment_clause(doc, max_tokens=15):
                     })
             else:
                 chunks.append({
-                    'text': clause_text.strip(),
+                    'text': arrays.join(clause).strip(),
                     'metadata': {
                         'type': 'clause',
                         'verb': verb.lemma_,
                         'verb_pos': verb.pos_,
-                        'num_tokens': len(clause_tokens)
+                        'num_tokens': len(clause)
                     }
                 })
     
@@ -447,81 +726,347 @@ def segment_verb_phrase(doc, min_words=3):
     Ideal para flashcards de acciones especificas
     """
     chunks = []
-    processed_verbs = set()
+    arrays = doc_view(doc).arrays
     
-    for sent in doc.sents:
-        for token in sent:
-            # Solo procesar verbos
-            if token.pos_ != 'VERB':
-                continue
-            
-            # Evitar duplicados
-            verb_key = (token.i, token.text)
-            if verb_key in processed_verbs:
-                continue
-            processed_verbs.add(verb_key)
-            
-            # Verbo + sus dependencias directas
-            vp_tokens = [token]
-            
-            for child in token.children:
-                # Objeto directo, indirecto, complementos, adverbios, negacion
-                if child.dep_ in ['obj', 'dobj', 'iobj', 'obl', 'advmod', 'neg', 'aux', 'auxpass']:
-                    vp_tokens.append(child)
-                    # Añadir dependencias del objeto (articulos, adjetivos, etc.)
-                    vp_tokens.extend(list(child.subtree))
-            
-            # Ordenar por posicion en el texto
-            vp_tokens_unique = sorted(set(vp_tokens), key=lambda x: x.i)
-            vp_text = ' '.join(t.text for t in vp_tokens_unique)
-            
-            # Filtrar por longitud minima
-            if len(vp_text.split()) >= min_words:
-                chunks.append({
-                    'text': vp_text.strip(),
-                    'metadata': {
-                        'type': 'verb_phrase',
-                        'verb': token.lemma_,
-                        'verb_text': token.text,
-                        'verb_pos': token.pos_,
-                        'num_words': len(vp_text.split())
-                    }
-                })
+    for i in arrays.verbs():
+        # Verbo + sus dependencias directas (objetos, complementos, adverbios,
+        # negacion, auxiliares) con sus subarboles, en orden del texto
+        vp_text = arrays.join(arrays.phrase(i, VERB_PHRASE_DEPS))
+        num_words = len(vp_text.split())
+        
+        # Filtrar por longitud minima
+        if num_words >= min_words:
+            token = doc[i]
+            chunks.append({
+                'text': vp_text.strip(),
+                'metadata': {
+                    'type': 'verb_phrase',
+                    'verb': token.lemma_,
+                    'verb_text': token.text,
+                    'verb_pos': token.pos_,
+                    'num_words': num_words
+                }
+            })
     
     return chunks
 
+def normalize_chunks(chunks_data):
+    """Separa texto y metadata de los chunks (listas de strings o de dicts)"""
+    if chunks_data and isinstance(chunks_data[0], dict):
+        # Estrategias avanzadas: extraer texto y metadata
+        chunks = [c['text'] for c in chunks_data]
+        chunks_metadata = [c.get('metadata', {}) for c in chunks_data]
+    else:
+        # Estrategias basicas: solo texto
+        chunks = chunks_data
+        chunks_metadata = [{}] * len(chunks)
+    return chunks, chunks_metadata
+
+def include_fields(doc, include):
+    """Campos opcionales de /process: sentences, entities, noun_chunks"""
+    fields = {}
+    view = doc_view(doc)
+    if "sentences" in include:
+        fields["sentences"] = [text for text in view.sent_texts if text]
+    if "entities" in include:
+        fields["entities"] = [(e.text, e.label_) for e in view.ents]
+    if "noun_chunks" in include:
+        fields["noun_chunks"] = [nc.text for nc in view.noun_chunks]
+    return fields
+
+def resolve_strategy_params(strategy, params=None, chapter_patterns=None):
+    """
+    Parametros de la estrategia: sus valores por defecto + los de la peticion.
+    chapter_patterns del payload se usa si la estrategia lo admite y no viene en params.
+    Lanza StrategyError si algun parametro no es valido.
+    """
+    resolved = strategy_registry.get(strategy).resolve_params(params)
+    if "chapter_patterns" in resolved:
+        if resolved["chapter_patterns"] is None:
+            resolved["chapter_patterns"] = chapter_patterns
+        error = chapter_patterns_error(resolved["chapter_patterns"])
+        if error:
+            raise StrategyError(error)
+    return resolved
+
+def segment_doc(doc, text, strategy, params=None):
+    """
+    Aplica la estrategia de segmentacion de /process a un Doc ya analizado
+    (las desconocidas usan sentences). `params`: de resolve_strategy_params.
+    """
+    if params is None:
+        params = resolve_strategy_params(strategy)
+    return strategy_registry.get(strategy).run(doc, text, params)
+
+def process_doc(doc, text, strategy, include, params=None):
+    """Respuesta de /process para un Doc ya analizado"""
+    with metrics.stage("segment"):
+        chunks, chunks_metadata = normalize_chunks(segment_doc(doc, text, strategy, params))
+    
+    response = {
+        "chunks": chunks,
+        "chunks_metadata": chunks_metadata,
+        "stats": {
+            "total_chunks": len(chunks),
+            "total_tokens": len(doc),
+            "has_vectors": doc.has_vector,
+            "strategy_used": strategy
+        }
+    }
+    
+    # Informacion base (solo los campos pedidos en include)
+    response.update(include_fields(doc, include))
+    if "sentences" in response:
+        response["stats"]["total_sentences"] = len(response["sentences"])
+    if "entities" in response:
+        response["stats"]["total_entities"] = len(response["entities"])
+    return response
+
+class StatelessStream:
+    """Adaptador de una estrategia por Doc al procesamiento por segmentos"""
+    def __init__(self, segment_fn):
+        self.segment_fn = segment_fn
+    
+    def feed(self, segment, doc):
+        return self.segment_fn(doc)
+    
+    def flush(self):
+        return []
+
+class SentenceGrouperStream:
+    """Alimenta un *Grouper con las oraciones de cada segmento"""
+    def __init__(self, grouper, strip=False):
+        self.grouper = grouper
+        self.strip = strip
+    
+    def _clean(self, chunks):
+        return [c.strip() for c in chunks if c.strip()] if self.strip else chunks
+    
+    def feed(self, segment, doc):
+        view = doc_view(doc)
+        return self._clean(self.grouper.feed(view.sents, view.similarity))
+    
+    def flush(self):
+        return self._clean(self.grouper.flush())
+
+class ChapterSentsStream:
+    def __init__(self, chunk_size=500):
+        self.grouper = ChapterSentsGrouper(chunk_size)
+    
+    def feed(self, segment, doc):
+        return self.grouper.feed(segment['chapter'], doc_view(doc).sents)
+    
+    def flush(self):
+        return self.grouper.flush()
+
+class VocabStream:
+    """Las frecuencias son globales: los chunks se emiten al final"""
+    def __init__(self, min_freq=2):
+        self.collector = VocabCollector(min_freq)
+    
+    def feed(self, segment, doc):
+        self.collector.add(doc)
+        return []
+    
+    def flush(self):
+        return self.collector.chunks()
+
+# Estrategias de /process: funcion, parametros, componentes y formato de salida.
+# Los plugins se registran con el entry point "flashgen.strategies" (ver strategies.py).
+strategy_registry = StrategyRegistry(default="sentences")
+strategy_registry.register(
+    "sentences", lambda doc, text: segment_by_sentences(doc),
+    components=["senter"], output="strings",
+    description="Segmentacion por oraciones (doc.sents)"
+)
+strategy_registry.register(
+    "entities", lambda doc, text: segment_by_entities(doc),
+    components=["ner"], output="strings",
+    description="Agrupacion por entidades nombradas"
+)
+strategy_registry.register(
+    "noun_chunks", lambda doc, text: segment_by_noun_chunks(doc),
+    components=NOUN_CHUNK_COMPONENTS, output="strings",
+    description="Segmentacion por sintagmas nominales"
+)
+strategy_registry.register(
+    "semantic_similarity",
+    lambda doc, text, threshold: segment_by_semantic_similarity(doc, threshold=threshold),
+    params={"threshold": 0.7}, components=["senter"], output="strings",
+    description="Similitud semantica con vectores word2vec",
+    stream=lambda threshold: SentenceGrouperStream(SemanticSimilarityGrouper(threshold), strip=True)
+)
+strategy_registry.register(
+    "chapter_sents",
+    lambda doc, text, chunk_size, chapter_patterns: segment_chapter_sents(
+        text, doc, chunk_size=chunk_size, patterns=chapter_patterns
+    ),
+    params={"chunk_size": 500, "chapter_patterns": None}, components=["senter"],
+    description="Capitulos + oraciones (libros tecnicos/estudio)",
+    # En streaming los capitulos ya vienen en cada segmento (ver iter_segments)
+    stream=lambda chunk_size, chapter_patterns: ChapterSentsStream(chunk_size)
+)
+strategy_registry.register(
+    "entity_context",
+    lambda doc, text, context_window: segment_entity_context(doc, context_window=context_window),
+    params={"context_window": 1}, components=["ner", "senter"],
+    description="Entidades + contexto (biografias/historia/noticias)"
+)
+strategy_registry.register(
+    "semantic_blocks",
+    lambda doc, text, similarity_threshold: segment_semantic_blocks(doc, similarity_threshold),
+    params={"similarity_threshold": 0.3}, components=["senter"],
+    description="Bloques semanticos con vectores (filosofia/ensayos densos)",
+    stream=lambda similarity_threshold: SentenceGrouperStream(SemanticBlocksGrouper(similarity_threshold))
+)
+strategy_registry.register(
+    "vocab_extract", lambda doc, text, min_freq: segment_vocab_extract(doc, min_freq=min_freq),
+    params={"min_freq": 2}, components=SYNTAX_COMPONENTS,
+    description="Extraccion de vocabulario (aprendizaje de idiomas)",
+    stream=lambda min_freq: VocabStream(min_freq)
+)
+strategy_registry.register(
+    "clause_segment", lambda doc, text, max_tokens: segment_clause(doc, max_tokens=max_tokens),
+    params={"max_tokens": 15}, components=SYNTAX_COMPONENTS,
+    description="Clausulas sintacticas con arbol de dependencias"
+)
+strategy_registry.register(
+    "verb_phrase_segment", lambda doc, text, min_words: segment_verb_phrase(doc, min_words=min_words),
+    params={"min_words": 3}, components=SYNTAX_COMPONENTS,
+    description="Sintagmas verbales con analisis sintactico profundo"
+)
+strategy_registry.load_entry_points()
+
+BASIC_STRATEGIES = ["sentences", "entities", "noun_chunks", "semantic_similarity"]
+ADVANCED_STRATEGIES = ["chapter_sents", "entity_context", "semantic_blocks", "vocab_extract", "clause_segment", "verb_phrase_segment"]
+
+def make_stream_segmenter(strategy, params=None):
+    """Segmentador por segmentos; las estrategias con contexto conservan estado"""
+    if params is None:
+        params = resolve_strategy_params(strategy)
+    selected = strategy_registry.get(strategy)
+    segmenter = selected.make_stream(params)
+    if segmenter is None:
+        segmenter = StatelessStream(lambda doc: selected.run(doc, doc.text, params))
+    return segmenter
+
+# Tamaño maximo de segmento (caracteres) y lote de nlp.pipe en /process/stream
+STREAM_SEGMENT_CHARS = int(os.environ.get("FLASHGEN_STREAM_SEGMENT_CHARS", "20000"))
+STREAM_BATCH_SIZE = int(os.environ.get("FLASHGEN_STREAM_BATCH_SIZE", "2"))
+
+def stream_params_error(payload):
+    """Mensaje de error si chapter_patterns o params de un StreamPayload no son validos"""
+    error = chapter_patterns_error(payload.chapter_patterns)
+    if error is None:
+        try:
+            resolve_strategy_params(payload.strategy or "sentences", payload.params, payload.chapter_patterns)
+        except StrategyError as e:
+            error = str(e)
+    return error
+
+def iter_process_events(nlp, payload, params=None):
+    """
+    Eventos de /process/stream: uno por segmento analizado con los chunks ya
+    cerrados y uno final 'done'. Solo hay STREAM_BATCH_SIZE Doc vivos a la vez.
+    `params` son los de resolve_strategy_params si el llamador ya los resolvio.
+    """
+    strategy = payload.strategy or "sentences"
+    include = set(payload.include or [])
+    try:
+        if params is None:
+            params = resolve_strategy_params(strategy, payload.params, payload.chapter_patterns)
+        chapters = detect_chapters(payload.text, params.get("chapter_patterns", payload.chapter_patterns))
+    except (StrategyError, re.error) as e:
+        yield {"type": "error", "error": str(e)}
+        return
+    components = resolve_components(nlp, process_components(strategy, include))
+    max_chars = min(payload.segment_chars or STREAM_SEGMENT_CHARS, nlp.max_length - 1)
+    
+    segments_meta, segments_text = tee(iter_segments(payload.text, chapters, max_chars))
+    docs = pipe_components(
+        nlp, (segment['text'] for segment in segments_text), components,
+        batch_size=STREAM_BATCH_SIZE
+    )
+    segmenter = make_stream_segmenter(strategy, params)
+    total_chunks = 0
+    total_tokens = 0
+    total_segments = 0
+    
+    try:
+        # docs primero: al agotarse informa del tiempo por componente (nlp_pipes)
+        for doc, segment in zip(docs, segments_meta):
+            chunks, chunks_metadata = normalize_chunks(segmenter.feed(segment, doc))
+            total_chunks += len(chunks)
+            total_tokens += len(doc)
+            total_segments += 1
+            metrics.record_tokens(len(doc))
+            event = {
+                "type": "segment",
+                "segment": segment['index'],
+                "chapter": segment['chapter'],
+                "chunks": chunks,
+                "chunks_metadata": chunks_metadata,
+                "tokens": len(doc)
+            }
+            event.update(include_fields(doc, include))
+            yield event
+        
+        chunks, chunks_metadata = normalize_chunks(segmenter.flush())
+        total_chunks += len(chunks)
+        yield {
+            "type": "done",
+            "chunks": chunks,
+            "chunks_metadata": chunks_metadata,
+            "stats": {
+                "total_chunks": total_chunks,
+                "total_segments": total_segments,
+                "total_tokens": total_tokens,
+                "strategy_used": strategy
+            }
+        }
+    except Exception as e:
+        yield {"type": "error", "error": f"Error al procesar texto: {str(e)}"}
+
 @app.get("/")
 def read_root():
     return {
         "service": "Flashgen spaCy NLP Server",
         "version": "3.0.0",
-        "models": list(models.keys()),
+        "models": registry.available(),
+        "models_resident": registry.resident(),
+        "models_loadable": registry.loadable(),
         "model_details": {
-            "en": "en_core_web_lg (transformer-based, 560MB)",
-            "es": "es_core_news_lg (transformer-based, 560MB)",
-            "fr": "fr_core_news_lg (transformer-based, 560MB)"
+            lang: f"{info['model']} ({'cargado' if info['resident'] else 'carga bajo demanda'})"
+            for lang, info in registry.status().items()
         },
         "endpoints": {
             "process": "Segmentacion avanzada con multiples estrategias",
             "enhance": "Enriquecimiento lingüistico neuronal (NER, sintaxis, semantica)",
             "validate": "Validacion de flashcards con analisis neuronal",
-            "generate_cloze": "Generacion de ejercicios cloze con analisis sintactico"
+            "process/stream": "Segmentacion en streaming (NDJSON/SSE) para textos muy largos",
+            "process/batch": "Varios documentos de /process en una peticion (nlp.pipe por idioma, stream opcional)",
+            "process/compare": "Varias estrategias de segmentacion sobre un solo analisis del texto (tiempos y tamaños)",
+            "generate_cloze": "Generacion de ejercicios cloze con analisis sintactico",
+            "analyze": "Segmentacion + enriquecimiento + validacion + cloze con un solo analisis por texto",
+            "cache/stats": "Estadisticas del cache compartido de documentos analizados",
+            "workers/stats": "Estado del pool de procesos (FLASHGEN_WORKERS)",
+            "metrics": "Metricas Prometheus: peticiones, latencias, etapas, componentes, cache y modelos",
+            "profiles": "Perfiles de ?profile=1 (FLASHGEN_PROFILING): GET /profiles/{id}?format=collapsed|speedscope",
+            "jobs": "Trabajos en segundo plano: POST /jobs, GET /jobs/{id}, GET /jobs/{id}/result",
+            "strategies": "Estrategias de segmentacion con sus parametros (payload.params) y componentes",
+            "dedupe": "Deteccion de chunks/cards casi duplicados (MinHash LSH o vectores); flag dedupe en /process y /validate",
+            "corpus": "Indice de terminos por corpus: POST /corpus/{corpus}/documents, GET /corpus/{corpus}/terms (TF-IDF)"
         },
         "strategies": {
-            "basic": ["sentences", "entities", "noun_chunks", "semantic_similarity"],
-            "advanced": ["chapter_sents", "entity_context", "semantic_blocks", "vocab_extract", "clause_segment", "verb_phrase_segment"]
+            "basic": BASIC_STRATEGIES,
+            "advanced": ADVANCED_STRATEGIES,
+            "plugins": [
+                name for name in strategy_registry.names()
+                if name not in BASIC_STRATEGIES and name not in ADVANCED_STRATEGIES
+            ]
         },
         "descriptions": {
-            "sentences": "Segmentacion por oraciones (doc.sents)",
-            "entities": "Agrupacion por entidades nombradas",
-            "noun_chunks": "Segmentacion por sintagmas nominales",
-            "semantic_similarity": "Similitud semantica con vectores word2vec",
-            "chapter_sents": "Capitulos + oraciones (libros tecnicos/estudio)",
-            "entity_context": "Entidades + contexto (biografias/historia/noticias)",
-            "semantic_blocks": "Bloques semanticos con vectores (filosofia/ensayos densos)",
-            "vocab_extract": "Extraccion de vocabulario (aprendizaje de idiomas)",
-            "clause_segment": "Clausulas sintacticas con arbol de dependencias",
-            "verb_phrase_segment": "Sintagmas verbales con analisis sintactico profundo"
+            name: info["description"] for name, info in strategy_registry.describe().items()
         },
         "neural_features": {
             "ner": "Named Entity Recognition con redes neuronales",
@@ -532,6 +1077,14 @@ def read_root():
         }
     }
 
+@app.get("/strategies")
+def list_strategies():
+    """
+    Estrategias de /process: parametros (con su valor por defecto), componentes
+    spaCy, formato de salida ("strings" o "chunks") y soporte de streaming
+    """
+    return {"default": strategy_registry.default, "strategies": strategy_registry.describe()}
+
 @app.get("/test-connection")
 def test_connection():
     """
@@ -541,11 +1094,47 @@ def test_connection():
         "success": True,
         "message": "Conexion exitosa con el servidor spaCy",
         "version": "3.0.0",
-        "models_loaded": list(models.keys()),
+        "models_loaded": registry.resident(),
+        "models_available": registry.available(),
+        "models_loadable": registry.loadable(),
         "status": "online"
     }
 
-@app.post("/process")
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Estadisticas del cache de Docs: aciertos, fallos, evicciones y ocupacion
+    """
+    return doc_cache.stats()
+
+@app.post("/cache/clear")
+def cache_clear():
+    """
+    Vacia el nivel en memoria del cache de Docs
+    """
+    doc_cache.clear()
+    return {"success": True, "stats": doc_cache.stats()}
+
+def process_options(payload):
+    """
+    Estrategia, include, parametros resueltos y config de dedupe de un TextPayload.
+    Lanza StrategyError o ValueError si no son validos.
+    """
+    strategy = payload.strategy or "sentences"
+    return {
+        "strategy": strategy,
+        "include": set(payload.include or []),
+        "params": resolve_strategy_params(strategy, payload.params, payload.chapter_patterns),
+        "dedupe": dedupe_config(payload.dedupe)
+    }
+
+def process_response(doc, payload, options):
+    """Respuesta de /process para el Doc ya analizado de `payload`"""
+    response = process_doc(doc, payload.text, options["strategy"], options["include"], options["params"])
+    if options["dedupe"] is not None:
+        dedupe_chunks(response, payload.lang, options["dedupe"])
+    return response
+
 def process_text(payload: TextPayload):
     """
     Procesa texto con spaCy usando diferentes estrategias de segmentacion
@@ -563,395 +1152,1381 @@ def process_text(payload: TextPayload):
     - vocab_extract: Extraccion de vocabulario (idiomas)
     - clause_segment: Clausulas sintacticas (analisis gramatical profundo)
     - verb_phrase_segment: Sintagmas verbales (acciones especificas)
+    
+    Campos opcionales (payload.include): sentences, entities, noun_chunks.
+    chapter_patterns: regex propias de titulos de capitulo para chapter_sents.
+    params: parametros de la estrategia, p. ej. {"max_tokens": 20} para
+    clause_segment (ver GET /strategies).
+    dedupe: true o {"method", "threshold", "collapse"} para marcar (o quitar)
+    los chunks casi duplicados (ver /dedupe).
+    incremental: analiza el texto por parrafos y reutiliza los ya analizados
+    (cache por contenido); "paragraphs" indica hash, offsets y si cada parrafo
+    se ha vuelto a analizar ("recomputed"), para invalidar el cache del cliente.
+    Solo se ejecutan los componentes spaCy que necesitan la estrategia y esos campos.
     """
-    nlp = models.get(payload.lang)
+    nlp = registry.get(payload.lang)
     if not nlp:
-        return {"error": f"Idioma no soportado: {payload.lang}. Disponibles: {list(models.keys())}"}
+        return {"error": model_error(payload.lang)}
+    try:
+        options = process_options(payload)
+    except (StrategyError, ValueError) as e:
+        return {"error": str(e)}
     
     try:
-        # Procesar texto con spaCy
-        doc = nlp(payload.text)
-        
-        # Extraer informacion base
-        sentences = [s.text.strip() for s in doc.sents if s.text.strip()]
-        entities = [(e.text, e.label_) for e in doc.ents]
-        noun_chunks_list = [nc.text for nc in doc.noun_chunks]
+        # Procesar texto con spaCy ejecutando solo los componentes necesarios
+        needs = process_components(options["strategy"], options["include"])
+        if not payload.incremental:
+            return process_response(get_doc(payload.lang, payload.text, needs=needs), payload, options)
         
-        # Aplicar estrategia de segmentacion
-        strategy = payload.strategy or "sentences"
-        chunks_data = []
-        
-        # Estrategias basicas (retornan lista de strings)
-        if strategy == "sentences":
-            chunks_data = segment_by_sentences(doc)
-        elif strategy == "entities":
-            chunks_data = segment_by_entities(doc)
-        elif strategy == "noun_chunks":
-            chunks_data = segment_by_noun_chunks(doc)
-        elif strategy == "semantic_similarity":
-            chunks_data = segment_by_semantic_similarity(doc, threshold=0.7)
-        
-        # Estrategias avanzadas (retornan lista de dicts con text + metadata)
-        elif strategy == "chapter_sents":
-            chunks_data = segment_chapter_sents(payload.text, doc, chunk_size=500)
-        elif strategy == "entity_context":
-            chunks_data = segment_entity_context(doc, context_window=1)
-        elif strategy == "semantic_blocks":
-            chunks_data = segment_semantic_blocks(doc, similarity_threshold=0.3)
-        elif strategy == "vocab_extract":
-            chunks_data = segment_vocab_extract(doc, min_freq=2)
-        elif strategy == "clause_segment":
-            chunks_data = segment_clause(doc, max_tokens=15)
-        elif strategy == "verb_phrase_segment":
-            chunks_data = segment_verb_phrase(doc, min_words=3)
-        else:
-            chunks_data = segment_by_sentences(doc)  # Fallback
-        
-        # Normalizar formato de chunks
-        if chunks_data and isinstance(chunks_data[0], dict):
-            # Estrategias avanzadas: extraer texto y metadata
-            chunks = [c['text'] for c in chunks_data]
-            chunks_metadata = [c.get('metadata', {}) for c in chunks_data]
-        else:
-            # Estrategias basicas: solo texto
-            chunks = chunks_data
-            chunks_metadata = [{}] * len(chunks)
-        
-        return {
-            "chunks": chunks,
-            "chunks_metadata": chunks_metadata,
-            "sentences": sentences,
-            "entities": entities,
-            "noun_chunks": noun_chunks_list,
-            "stats": {
-                "total_chunks": len(chunks),
-                "total_sentences": len(sentences),
-                "total_entities": len(entities),
-                "total_tokens": len(doc),
-                "has_vectors": doc.has_vector,
-                "strategy_used": strategy
-            }
+        doc, paragraphs = get_doc_incremental(payload.lang, payload.text, needs=needs)
+        response = process_response(doc, payload, options)
+        response["paragraphs"] = paragraphs
+        response["stats"]["total_paragraphs"] = len(paragraphs)
+        response["stats"]["recomputed_paragraphs"] = sum(1 for p in paragraphs if p["recomputed"])
+        return response
+    
+    except Exception as e:
+        return {"error": f"Error al procesar texto: {str(e)}"}
+
+def process_text_stream(payload: StreamPayload):
+    """
+    Version en streaming de /process para textos muy largos (libros)
+    
+    El texto se divide en segmentos (capitulos y parrafos, maximo segment_chars
+    caracteres), se analiza con nlp.pipe y se emite un evento por segmento en
+    cuanto termina, como NDJSON (por defecto) o Server-Sent Events (format="sse").
+    semantic_similarity, semantic_blocks y chapter_sents conservan el chunk
+    abierto entre segmentos; vocab_extract emite su vocabulario en el evento final.
+    dedupe no esta disponible (necesita todos los chunks): usar POST /jobs con
+    type "process", que reensambla el resultado y aplica dedupe.
+    """
+    nlp = registry.get(payload.lang)
+    if not nlp:
+        return {"error": model_error(payload.lang)}
+    if payload.dedupe:
+        return JSONResponse(
+            status_code=422,
+            content={"error": "dedupe no esta disponible en /process/stream; usar POST /jobs con type \"process\""}
+        )
+    error = stream_params_error(payload)
+    if error:
+        return JSONResponse(status_code=422, content={"error": error})
+    
+    fmt = payload.format if payload.format in MEDIA_TYPES else "ndjson"
+    events = metered_events("process_stream", payload, iter_process_events(nlp, payload), fmt)
+    return StreamingResponse(events, media_type=MEDIA_TYPES[fmt])
+
+# Maximo de documentos por peticion de /process/batch
+BATCH_MAX_DOCUMENTS = int(os.environ.get("FLASHGEN_BATCH_MAX_DOCUMENTS", "1000"))
+BATCH_DEFAULTS = ("lang", "strategy", "include", "chapter_patterns", "params", "dedupe")
+
+def batch_document(payload, item):
+    """TextPayload de un documento del lote con los valores por defecto del lote"""
+    if not isinstance(item, dict):
+        raise ValueError("Cada documento debe ser un objeto")
+    values = {key: getattr(payload, key) for key in BATCH_DEFAULTS if getattr(payload, key) is not None}
+    values.update({key: value for key, value in item.items() if key != "id"})
+    return TextPayload(**values)
+
+def parse_batch(lang, texts, needs):
+    """
+    Docs de `texts` en un solo nlp.pipe. Si el lote falla se analiza cada texto
+    por separado: los que fallen se devuelven como la excepcion.
+    """
+    try:
+        return get_docs(lang, texts, needs=needs)
+    except Exception:
+        if len(texts) == 1:
+            raise
+    docs = []
+    for text in texts:
+        try:
+            docs.append(get_doc(lang, text, needs=needs))
+        except Exception as e:
+            docs.append(e)
+    return docs
+
+def iter_process_batch(payload):
+    """
+    Resultados de /process/batch como (indice, resultado) segun terminan.
+    Los documentos se agrupan por idioma (y componentes necesarios, para dar el
+    mismo resultado que /process) y cada grupo se analiza con nlp.pipe en lotes
+    de FLASHGEN_BATCH_SIZE. Un documento con error no afecta al resto.
+    """
+    groups = {}  # (idioma, componentes) -> [(indice, payload, opciones)]
+    for index, item in enumerate(payload.documents):
+        try:
+            document = batch_document(payload, item)
+            nlp = registry.get(document.lang)
+            if nlp is None:
+                yield index, {"error": model_error(document.lang)}
+                continue
+            options = process_options(document)
+        except ValidationError as e:
+            yield index, {"error": f"Documento no valido: {e.errors()[0]['loc'][0]}: {e.errors()[0]['msg']}"}
+            continue
+        except (StrategyError, ValueError) as e:
+            yield index, {"error": str(e)}
+            continue
+        components = tuple(resolve_components(nlp, process_components(options["strategy"], options["include"])))
+        groups.setdefault((document.lang, components), []).append((index, document, options))
+    
+    for (lang, components), items in groups.items():
+        for start in range(0, len(items), PIPE_BATCH_SIZE):
+            batch = items[start:start + PIPE_BATCH_SIZE]
+            try:
+                docs = parse_batch(lang, [document.text for _, document, _ in batch], list(components))
+            except Exception as e:
+                docs = [e] * len(batch)
+            for (index, document, options), doc in zip(batch, docs):
+                if isinstance(doc, Exception):
+                    yield index, {"error": f"Error al procesar texto: {str(doc)}"}
+                    continue
+                try:
+                    yield index, process_response(doc, document, options)
+                except Exception as e:
+                    yield index, {"error": f"Error al procesar texto: {str(e)}"}
+
+def batch_result(payload, index, result):
+    """Resultado de un documento del lote con su "id" si lo tenia"""
+    item = payload.documents[index]
+    if isinstance(item, dict) and item.get("id") is not None:
+        result = dict(result, id=item["id"])
+    return result
+
+def batch_stats(results):
+    ok = [result for result in results if "error" not in result]
+    return {
+        "total_documents": len(results),
+        "processed": len(ok),
+        "errors": len(results) - len(ok),
+        "total_chunks": sum(result["stats"]["total_chunks"] for result in ok),
+        "total_tokens": sum(result["stats"]["total_tokens"] for result in ok)
+    }
+
+def process_batch(payload: BatchPayload):
+    """
+    Procesa varios documentos (payloads de /process) en una sola peticion
+    
+    Los documentos se agrupan por idioma y se analizan juntos con nlp.pipe;
+    "results" sigue el orden de entrada. lang, strategy, include, params,
+    chapter_patterns y dedupe del lote se aplican a los documentos que no los
+    indican. Un documento con error devuelve {"error": ...} sin afectar al resto.
+    Con stream=true cada resultado se emite (NDJSON o SSE) en cuanto termina.
+    """
+    results = [None] * len(payload.documents)
+    for index, result in iter_process_batch(payload):
+        results[index] = batch_result(payload, index, result)
+    return {"results": results, "stats": batch_stats(results)}
+
+def iter_batch_events(payload):
+    """Eventos de /process/batch con stream: uno por documento y uno final 'done'"""
+    results = []
+    for index, result in iter_process_batch(payload):
+        result = batch_result(payload, index, result)
+        results.append(result)
+        yield {"type": "document", "index": index, "result": result}
+    yield {"type": "done", "stats": batch_stats(results)}
+
+# Hilos de /process/compare con parallel=true
+COMPARE_THREADS = max(1, int(os.environ.get("FLASHGEN_COMPARE_THREADS", "4")))
+
+def chunk_length_stats(chunks):
+    """Numero de chunks y longitud (caracteres) media y p95"""
+    if not chunks:
+        return {"total_chunks": 0, "mean_chars": 0.0, "p95_chars": 0.0}
+    lengths = numpy.fromiter((len(chunk) for chunk in chunks), dtype=numpy.int64, count=len(chunks))
+    return {
+        "total_chunks": len(chunks),
+        "mean_chars": round(float(lengths.mean()), 1),
+        "p95_chars": round(float(numpy.percentile(lengths, 95)), 1)
+    }
+
+def compare_strategy(doc, text, strategy, params, include_chunks):
+    """Resultado de una estrategia de /process/compare (con su tiempo) sobre el Doc compartido"""
+    start = time.perf_counter()
+    try:
+        chunks, chunks_metadata = normalize_chunks(segment_doc(doc, text, strategy, params))
+    except Exception as e:
+        return {"error": f"Error en la estrategia {strategy}: {str(e)}"}
+    stats = chunk_length_stats(chunks)
+    stats["time_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    result = {"stats": stats}
+    if include_chunks:
+        result["chunks"] = chunks
+        result["chunks_metadata"] = chunks_metadata
+    return result
+
+def compare_strategies(payload: ComparePayload):
+    """
+    Compara estrategias de segmentacion sobre un solo analisis del texto
+    
+    El texto se analiza una vez con la union de los componentes de las
+    estrategias pedidas (todas las registradas si no se indican) y cada
+    estrategia se ejecuta sobre ese mismo Doc; con parallel=true en hilos
+    (FLASHGEN_COMPARE_THREADS). Si alguna estrategia usa el parser, los limites
+    de oracion de todas salen del parser. params: parametros por estrategia.
+    Por estrategia devuelve chunks (omitidos con chunks=false) y estadisticas:
+    total_chunks, longitud media y p95 en caracteres y time_ms. Una estrategia
+    que falla devuelve {"error": ...} sin afectar al resto.
+    """
+    nlp = registry.get(payload.lang)
+    if not nlp:
+        return {"error": model_error(payload.lang)}
+    names = payload.strategies if payload.strategies is not None else strategy_registry.names()
+    unknown = [name for name in names if name not in strategy_registry]
+    if unknown or not names:
+        return {"error": f"Estrategias no validas: {unknown}. Disponibles: {strategy_registry.names()}"}
+    names = list(dict.fromkeys(names))
+    try:
+        params = {
+            name: resolve_strategy_params(name, (payload.params or {}).get(name), payload.chapter_patterns)
+            for name in names
         }
+    except StrategyError as e:
+        return {"error": str(e)}
     
+    try:
+        needs = []
+        for name in names:
+            needs.extend(process_components(name))
+        start = time.perf_counter()
+        doc = get_doc(payload.lang, payload.text, needs=needs)
+        parse_time = time.perf_counter() - start
+        
+        def run(name):
+            return compare_strategy(doc, payload.text, name, params[name], payload.chunks)
+        
+        start = time.perf_counter()
+        with metrics.stage("segment"):
+            if payload.parallel and len(names) > 1:
+                with ThreadPoolExecutor(max_workers=min(COMPARE_THREADS, len(names))) as executor:
+                    results = dict(zip(names, executor.map(run, names)))
+            else:
+                results = {name: run(name) for name in names}
+        segment_time = time.perf_counter() - start
     except Exception as e:
         return {"error": f"Error al procesar texto: {str(e)}"}
+    
+    return {
+        "results": results,
+        "stats": {
+            "total_strategies": len(names),
+            "total_tokens": len(doc),
+            "has_vectors": doc.has_vector,
+            "parallel": bool(payload.parallel),
+            "parse_ms": round(parse_time * 1000, 2),
+            "segment_ms": round(segment_time * 1000, 2)
+        }
+    }
+
+# Maximo de oraciones relacionadas por oracion en /enhance (0 = todas)
+CLUSTER_TOP_K = int(os.environ.get("FLASHGEN_CLUSTER_TOP_K", "0")) or None
+
+def enrich_entities(doc):
+    """Entidades (NER neuronal) con descripcion y norma del vector"""
+    entities_enriched = []
+    for ent in doc_view(doc).ents:
+        entities_enriched.append({
+            "text": ent.text,
+            "label": ent.label_,
+            "start": ent.start_char,
+            "end": ent.end_char,
+            "description": spacy.explain(ent.label_),
+            "vector_norm": float(ent.vector_norm) if ent.has_vector else 0.0
+        })
+    return entities_enriched
+
+def enrich_syntax(doc):
+    """Analisis sintactico (dependencias neuronales) por oracion"""
+    syntax_analysis = []
+    view = doc_view(doc)
+    for sent, roots in zip(view.sents, view.roots):
+        if roots:
+            root_token = doc[roots[0]]
+            syntax_analysis.append({
+                "sentence": sent.text,
+                "root_verb": root_token.lemma_,
+                "root_pos": root_token.pos_,
+                "dependencies": [
+                    {
+                        "text": token.text,
+                        "dep": token.dep_,
+                        "pos": token.pos_,
+                        "head": token.head.text
+                    }
+                    for token in sent
+                ]
+            })
+    return syntax_analysis
+
+def enrich_noun_phrases(doc):
+    """Sintagmas nominales con su nucleo"""
+    noun_phrases = []
+    for chunk in doc_view(doc).noun_chunks:
+        noun_phrases.append({
+            "text": chunk.text,
+            "root": chunk.root.text,
+            "root_pos": chunk.root.pos_,
+            "root_dep": chunk.root.dep_,
+            "lemma": chunk.root.lemma_
+        })
+    return noun_phrases
+
+def enrich_verb_phrases(doc):
+    """Acciones con complementos: verbo + objeto directo + complementos"""
+    verb_phrases = []
+    arrays = doc_view(doc).arrays
+    for i in arrays.verbs():
+        token = doc[i]
+        verb_phrases.append({
+            "text": arrays.join(arrays.phrase(i, ENHANCE_VERB_PHRASE_DEPS)),
+            "verb": token.lemma_,
+            "tense": token.morph.get("Tense"),
+            "mood": token.morph.get("Mood")
+        })
+    return verb_phrases
+
+def enrich_semantic_clusters(doc):
+    """Oraciones muy similares entre si (matriz de similitud por bloques)"""
+    semantic_clusters = []
+    view = doc_view(doc)
+    sentences = view.sents
+    if len(sentences) > 1 and doc.has_vector:
+        engine = view.similarity
+        related = engine.pairs_above(0.5, top_k=CLUSTER_TOP_K)  # Alta similitud
+        for i, pairs in sorted(related.items()):
+            semantic_clusters.append({
+                "sentence": sentences[i].text,
+                "sentence_idx": i,
+                "related_sentences": [
+                    {"sentence_idx": j, "similarity": round(sim, 3)} for j, sim in pairs
+                ]
+            })
+    return semantic_clusters
+
+# Secciones de /enhance: nombre -> (funcion, clave en stats, componentes spaCy)
+ENHANCE_SECTIONS = {
+    "entities": (enrich_entities, "total_entities", ["ner"]),
+    "syntax_analysis": (enrich_syntax, "total_sentences", SYNTAX_COMPONENTS),
+    "noun_phrases": (enrich_noun_phrases, "total_noun_phrases", SYNTAX_COMPONENTS),
+    "verb_phrases": (enrich_verb_phrases, "total_verb_phrases", SYNTAX_COMPONENTS),
+    "semantic_clusters": (enrich_semantic_clusters, None, ["senter"])
+}
+
+# Formatos de syntax_analysis: "tokens" (lista de oraciones con un dict por token,
+# por defecto) o "columnar" (arrays paralelos del documento, ver syntax_columns)
+SYNTAX_FORMATS = ("tokens", "columnar")
+
+def syntax_format_error(syntax_format):
+    if syntax_format not in SYNTAX_FORMATS:
+        return f"syntax_format desconocido: {syntax_format}. Disponibles: {list(SYNTAX_FORMATS)}"
+    return None
+
+def enhance_doc(doc, sections=None, syntax_format="tokens"):
+    """Respuesta de /enhance para un Doc ya analizado, solo con `sections` (None = todas)"""
+    response = {}
+    stats = {}
+    with metrics.stage("enrich"):
+        for name, (enrich, stat_key, _) in ENHANCE_SECTIONS.items():
+            if sections is not None and name not in sections:
+                continue
+            if name == "syntax_analysis" and syntax_format == "columnar":
+                columns = syntax_columns(doc_view(doc))
+                response[name] = columns
+                # Mismo recuento que el formato por token: oraciones con ROOT
+                stats[stat_key] = sum(1 for root in columns["roots"] if root >= 0)
+                continue
+            response[name] = enrich(doc)
+            if stat_key:
+                stats[stat_key] = len(response[name])
+    stats["has_vectors"] = doc.has_vector
+    response["stats"] = stats
+    return response
 
-@app.post("/enhance")
 def enhance_text(payload: TextPayload):
     """
     Enriquecimiento lingüistico avanzado usando analisis neuronal de spaCy
     Extrae entidades, relaciones sintacticas, analisis morfologico y semantico
+
+    Con syntax_format="columnar", syntax_analysis es un objeto con arrays
+    paralelos del documento (texts, spaces, deps, pos, heads, sentences, roots)
+    y un diccionario de etiquetas (labels), en lugar de un dict por token.
     """
-    nlp = models.get(payload.lang)
+    nlp = registry.get(payload.lang)
     if not nlp:
-        return {"error": f"Idioma no soportado: {payload.lang}"}
+        return {"error": model_error(payload.lang)}
+    error = syntax_format_error(payload.syntax_format)
+    if error:
+        return {"error": error}
     
     try:
-        doc = nlp(payload.text)
-        
-        # 1. ANaLISIS DE ENTIDADES (NER neuronal)
-        entities_enriched = []
-        for ent in doc.ents:
-            entities_enriched.append({
-                "text": ent.text,
-                "label": ent.label_,
-                "start": ent.start_char,
-                "end": ent.end_char,
-                "description": spacy.explain(ent.label_),
-                "vector_norm": float(ent.vector_norm) if ent.has_vector else 0.0
-            })
-        
-        # 2. ANaLISIS SINTaCTICO (dependencias neuronales)
-        syntax_analysis = []
-        for sent in doc.sents:
-            root = [token for token in sent if token.dep_ == "ROOT"]
-            if root:
-                root_token = root[0]
-                syntax_analysis.append({
-                    "sentence": sent.text,
-                    "root_verb": root_token.lemma_,
-                    "root_pos": root_token.pos_,
-                    "dependencies": [
-                        {
-                            "text": token.text,
-                            "dep": token.dep_,
-                            "pos": token.pos_,
-                            "head": token.head.text
-                        }
-                        for token in sent
-                    ]
-                })
-        
-        # 3. NOUN PHRASES (sintagmas nominales con analisis)
-        noun_phrases = []
-        for chunk in doc.noun_chunks:
-            noun_phrases.append({
-                "text": chunk.text,
-                "root": chunk.root.text,
-                "root_pos": chunk.root.pos_,
-                "root_dep": chunk.root.dep_,
-                "lemma": chunk.root.lemma_
-            })
-        
-        # 4. VERB PHRASES (acciones con complementos)
-        verb_phrases = []
-        for token in doc:
-            if token.pos_ == "VERB":
-                # Extraer verbo + objeto directo + complementos
-                vp_components = [token]
-                for child in token.children:
-                    if child.dep_ in ["obj", "dobj", "iobj", "obl", "advmod"]:
-                        vp_components.extend(list(child.subtree))
-                
-                vp_text = " ".join(t.text for t in sorted(set(vp_components), key=lambda x: x.i))
-                verb_phrases.append({
-                    "text": vp_text,
-                    "verb": token.lemma_,
-                    "tense": token.morph.get("Tense"),
-                    "mood": token.morph.get("Mood")
-                })
-        
-        # 5. ANaLISIS SEMaNTICO (similitud entre oraciones)
-        semantic_clusters = []
-        sentences = list(doc.sents)
-        if len(sentences) > 1 and doc.has_vector:
-            for i, sent in enumerate(sentences):
-                if sent.has_vector:
-                    similarities = []
-                    for j, other_sent in enumerate(sentences):
-                        if i != j and other_sent.has_vector:
-                            sim = sent.similarity(other_sent)
-                            if sim > 0.5:  # Alta similitud
-                                similarities.append({"sentence_idx": j, "similarity": round(float(sim), 3)})
-                    
-                    if similarities:
-                        semantic_clusters.append({
-                            "sentence": sent.text,
-                            "sentence_idx": i,
-                            "related_sentences": similarities
-                        })
-        
-        return {
-            "entities": entities_enriched,
-            "syntax_analysis": syntax_analysis,
-            "noun_phrases": noun_phrases,
-            "verb_phrases": verb_phrases,
-            "semantic_clusters": semantic_clusters,
-            "stats": {
-                "total_entities": len(entities_enriched),
-                "total_sentences": len(syntax_analysis),
-                "total_noun_phrases": len(noun_phrases),
-                "total_verb_phrases": len(verb_phrases),
-                "has_vectors": doc.has_vector
-            }
-        }
+        doc = get_doc(payload.lang, payload.text)
+        return enhance_doc(doc, syntax_format=payload.syntax_format)
     
     except Exception as e:
         return {"error": f"Error en enriquecimiento: {str(e)}"}
 
-@app.post("/validate")
+def validate_card(card, question, answer, q_doc, a_doc):
+    """Validacion de una card a partir de sus Docs ya analizados"""
+    issues = []
+    
+    # 1. VALIDACIoN GRAMATICAL
+    # Verificar que preguntas terminen con signos de interrogacion
+    if question and not question.strip().endswith(("?", "¿")):
+        issues.append({"type": "grammar", "message": "Pregunta sin signo de interrogacion"})
+    
+    # Verificar longitud minima de respuesta
+    if len(answer.split()) < 3:
+        issues.append({"type": "coherence", "message": "Respuesta demasiado corta"})
+    
+    # 2. CONSISTENCIA DE ENTIDADES
+    q_entities = {ent.text.lower(): ent.label_ for ent in q_doc.ents}
+    a_entities = {ent.text.lower(): ent.label_ for ent in a_doc.ents}
+    
+    # Verificar que entidades en pregunta aparezcan en respuesta
+    for ent_text, ent_label in q_entities.items():
+        if ent_text not in a_entities and ent_text not in answer.lower():
+            issues.append({
+                "type": "entity_consistency",
+                "message": f"Entidad '{ent_text}' en pregunta no aparece en respuesta"
+            })
+    
+    # 3. COHERENCIA SEMaNTICA (si hay vectores)
+    semantic_coherence = 0.0
+    if q_doc.has_vector and a_doc.has_vector:
+        semantic_coherence = float(q_doc.similarity(a_doc))
+        if semantic_coherence < 0.3:
+            issues.append({
+                "type": "semantic_coherence",
+                "message": f"Baja coherencia semantica ({semantic_coherence:.2f})"
+            })
+    
+    # 4. ANaLISIS SINTaCTICO
+    # Verificar que respuesta tenga estructura completa (sujeto + verbo)
+    has_verb = any(token.pos_ == "VERB" for token in a_doc)
+    if not has_verb and len(answer.split()) > 5:
+        issues.append({"type": "syntax", "message": "Respuesta sin verbo principal"})
+    
+    return {
+        **card,
+        "validation": {
+            "is_valid": len(issues) == 0,
+            "issues": issues,
+            "semantic_coherence": round(semantic_coherence, 3),
+            "question_entities": list(q_entities.keys()),
+            "answer_entities": list(a_entities.keys())
+        }
+    }
+
+def validate_stats(cards, validated_cards):
+    return {
+        "total_cards": len(validated_cards),
+        "valid_cards": sum(1 for c in validated_cards if c["validation"]["is_valid"]),
+        "cards_with_issues": sum(1 for c in validated_cards if not c["validation"]["is_valid"])
+    }
+
 def validate_flashcards(payload: dict):
     """
     Validacion lingüistica de flashcards usando analisis neuronal de spaCy
     Verifica gramatica, coherencia semantica, consistencia de entidades
+    Con "dedupe" (true o {"method", "threshold", "collapse"}) marca o quita
+    las cards casi duplicadas (ver /dedupe).
     """
     cards = payload.get("cards", [])
     lang = payload.get("lang", "es")
     
-    nlp = models.get(lang)
+    nlp = registry.get(lang)
     if not nlp:
-        return {"error": f"Idioma no soportado: {lang}"}
+        return {"error": model_error(lang)}
+    try:
+        dedupe_settings = dedupe_config(payload.get("dedupe"))
+    except ValueError as e:
+        return {"error": str(e)}
     
-    validated_cards = []
+    # Analizar todas las preguntas y respuestas en un solo lote
+    questions = [card.get("question", "") for card in cards]
+    answers = [card.get("answer", "") for card in cards]
+    docs = get_docs(
+        lang, questions + answers, payload.get("batch_size"), payload.get("n_process"),
+        needs=VALIDATE_COMPONENTS
+    )
+    q_docs, a_docs = docs[:len(cards)], docs[len(cards):]
     
-    for card in cards:
-        question = card.get("question", "")
-        answer = card.get("answer", "")
-        
-        issues = []
-        
-        # Procesar con spaCy
-        q_doc = nlp(question)
-        a_doc = nlp(answer)
-        
-        # 1. VALIDACIoN GRAMATICAL
-        # Verificar que preguntas terminen con signos de interrogacion
-        if question and not question.strip().endswith(("?", "¿")):
-            issues.append({"type": "grammar", "message": "Pregunta sin signo de interrogacion"})
-        
-        # Verificar longitud minima de respuesta
-        if len(answer.split()) < 3:
-            issues.append({"type": "coherence", "message": "Respuesta demasiado corta"})
-        
-        # 2. CONSISTENCIA DE ENTIDADES
-        q_entities = {ent.text.lower(): ent.label_ for ent in q_doc.ents}
-        a_entities = {ent.text.lower(): ent.label_ for ent in a_doc.ents}
-        
-        # Verificar que entidades en pregunta aparezcan en respuesta
-        for ent_text, ent_label in q_entities.items():
-            if ent_text not in a_entities and ent_text not in answer.lower():
-                issues.append({
-                    "type": "entity_consistency",
-                    "message": f"Entidad '{ent_text}' en pregunta no aparece en respuesta"
-                })
-        
-        # 3. COHERENCIA SEMaNTICA (si hay vectores)
-        semantic_coherence = 0.0
-        if q_doc.has_vector and a_doc.has_vector:
-            semantic_coherence = float(q_doc.similarity(a_doc))
-            if semantic_coherence < 0.3:
-                issues.append({
-                    "type": "semantic_coherence",
-                    "message": f"Baja coherencia semantica ({semantic_coherence:.2f})"
-                })
-        
-        # 4. ANaLISIS SINTaCTICO
-        # Verificar que respuesta tenga estructura completa (sujeto + verbo)
-        has_verb = any(token.pos_ == "VERB" for token in a_doc)
-        if not has_verb and len(answer.split()) > 5:
-            issues.append({"type": "syntax", "message": "Respuesta sin verbo principal"})
-        
-        validated_cards.append({
-            **card,
-            "validation": {
-                "is_valid": len(issues) == 0,
-                "issues": issues,
-                "semantic_coherence": round(semantic_coherence, 3),
-                "question_entities": list(q_entities.keys()),
-                "answer_entities": list(a_entities.keys())
-            }
-        })
+    with metrics.stage("validate"):
+        validated_cards = [
+            validate_card(card, question, answer, q_doc, a_doc)
+            for card, question, answer, q_doc, a_doc in zip(cards, questions, answers, q_docs, a_docs)
+        ]
     
-    return {
+    response = {
         "validated_cards": validated_cards,
-        "stats": {
-            "total_cards": len(validated_cards),
-            "valid_cards": sum(1 for c in validated_cards if c["validation"]["is_valid"]),
-            "cards_with_issues": sum(1 for c in validated_cards if not c["validation"]["is_valid"])
+        "stats": validate_stats(cards, validated_cards)
+    }
+    if dedupe_settings is not None:
+        dedupe_cards(response, lang, dedupe_settings)
+    return response
+
+def cloze_cards_for(card, doc, config):
+    """Cards cloze (maximo config["max_variants"]) de una card a partir del Doc de su respuesta"""
+    variants = cloze_variants(doc, config)
+    
+    # Crear cards cloze
+    return [
+        {
+            "question": card.get("question", "") + f" (Cloze - {variant['type']})",
+            "answer": variant["text"],
+            "type": "cloze",
+            "metadata": {
+                "original_card": card,
+                "cloze_type": variant["type"],
+                "target": variant["target"],
+                "targets": variant["targets"],
+                "generated_by": "spacy_neural"
+            }
         }
+        for variant in variants
+    ]
+
+def cloze_stats(cards, cloze_cards):
+    return {
+        "original_cards": len(cards),
+        "generated_cloze": len(cloze_cards),
+        "variants_per_card": round(len(cloze_cards) / len(cards), 2) if cards else 0
     }
 
-@app.post("/generate_cloze")
 def generate_cloze(payload: dict):
     """
     Generacion de ejercicios cloze usando analisis sintactico neuronal de spaCy
     Identifica noun phrases, verb phrases, entidades y nucleos sintacticos
+    config: tipos de objetivo, max_variants (cards cloze por card, 3 por
+    defecto) y deletions (borrados c1..cN por card cloze, 1 por defecto).
+    Los objetivos se eligen por puntuacion y se borran por offsets (ver cloze.py).
     """
     cards = payload.get("cards", [])
     lang = payload.get("lang", "es")
-    config = payload.get("config", {
-        "noun_phrases": True,
-        "verb_phrases": True,
-        "named_entities": True,
-        "syntactic_heads": False
-    })
-    
-    nlp = models.get(lang)
+    
+    nlp = registry.get(lang)
     if not nlp:
-        return {"error": f"Idioma no soportado: {lang}"}
+        return {"error": model_error(lang)}
+    try:
+        config = cloze_config(payload.get("config"))
+    except ValueError as e:
+        return {"error": str(e)}
     
     cloze_cards = []
     
-    for card in cards:
-        answer = card.get("answer", "")
-        if not answer:
-            continue
-        
-        doc = nlp(answer)
-        variants = []
-        
-        # 1. NAMED ENTITIES (entidades nombradas)
-        if config.get("named_entities", True):
-            for ent in doc.ents:
-                if ent.label_ in ["PERSON", "ORG", "GPE", "LOC", "DATE", "EVENT"]:
-                    cloze_text = answer.replace(ent.text, "{{c1::" + ent.text + "}}", 1)
-                    variants.append({
-                        "text": cloze_text,
-                        "type": "named_entity",
-                        "target": ent.text,
-                        "entity_type": ent.label_
-                    })
-        
-        # 2. NOUN PHRASES (sintagmas nominales)
-        if config.get("noun_phrases", True):
-            for chunk in doc.noun_chunks:
-                # Solo frases de 2+ palabras
-                if len(chunk.text.split()) >= 2:
-                    cloze_text = answer.replace(chunk.text, "{{c1::" + chunk.text + "}}", 1)
-                    variants.append({
-                        "text": cloze_text,
-                        "type": "noun_phrase",
-                        "target": chunk.text,
-                        "root": chunk.root.lemma_
-                    })
-        
-        # 3. VERB PHRASES (sintagmas verbales)
-        if config.get("verb_phrases", True):
-            for token in doc:
-                if token.pos_ == "VERB":
-                    # Extraer verbo + objeto directo
-                    vp_tokens = [token]
-                    for child in token.children:
-                        if child.dep_ in ["obj", "dobj"]:
-                            vp_tokens.extend(list(child.subtree))
-                    
-                    if len(vp_tokens) > 1:
-                        vp_text = " ".join(t.text for t in sorted(set(vp_tokens), key=lambda x: x.i))
-                        cloze_text = answer.replace(vp_text, "{{c1::" + vp_text + "}}", 1)
-                        variants.append({
-                            "text": cloze_text,
-                            "type": "verb_phrase",
-                            "target": vp_text,
-                            "verb": token.lemma_
-                        })
+    # Analizar todas las respuestas en un solo lote
+    cards_with_answer = [card for card in cards if card.get("answer", "")]
+    docs = get_docs(
+        lang, [card["answer"] for card in cards_with_answer],
+        payload.get("batch_size"), payload.get("n_process")
+    )
+    
+    with metrics.stage("cloze"):
+        for card, doc in zip(cards_with_answer, docs):
+            cloze_cards.extend(cloze_cards_for(card, doc, config))
+    
+    return {
+        "cloze_cards": cloze_cards,
+        "stats": cloze_stats(cards, cloze_cards)
+    }
+
+def analyze(payload: AnalyzePayload):
+    """
+    Segmentacion, enriquecimiento, validacion y cloze en una sola peticion
+    
+    Cada texto se analiza una sola vez con la union de los componentes que
+    necesitan las etapas pedidas y solo se calculan esas etapas:
+    - strategy (+ include): segmentacion como /process -> "segmentation"
+    - enhance: secciones de /enhance (entities, syntax_analysis, noun_phrases,
+      verb_phrases, semantic_clusters o "all") -> "enrichment" (syntax_format
+      como en /enhance)
+    - cards + validation: validacion como /validate -> "validation"
+    - cards + cloze (config): ejercicios como /generate_cloze -> "cloze"
+    Las preguntas solo se analizan si se pide validacion. Si una etapa activa el
+    parser, los limites de oracion de la segmentacion salen del parser.
+    """
+    nlp = registry.get(payload.lang)
+    if not nlp:
+        return {"error": model_error(payload.lang)}
+    params = None
+    try:
+        if payload.text and payload.strategy:
+            params = resolve_strategy_params(payload.strategy, payload.params, payload.chapter_patterns)
+        config = cloze_config(payload.cloze) if payload.cloze is not None else None
+    except (StrategyError, ValueError) as e:
+        return {"error": str(e)}
+    error = syntax_format_error(payload.syntax_format)
+    if error:
+        return {"error": error}
+    
+    try:
+        response = {}
+        parsed_texts = 0
         
-        # 4. SYNTACTIC HEADS (nucleos sintacticos)
-        if config.get("syntactic_heads", False):
-            for sent in doc.sents:
-                root = [token for token in sent if token.dep_ == "ROOT"]
-                if root:
-                    root_token = root[0]
-                    # Extraer nucleo + dependencias principales
-                    head_tokens = [root_token]
-                    for child in root_token.children:
-                        if child.dep_ in ["nsubj", "obj", "dobj"]:
-                            head_tokens.append(child)
-                    
-                    head_text = " ".join(t.text for t in sorted(head_tokens, key=lambda x: x.i))
-                    cloze_text = answer.replace(head_text, "{{c1::" + head_text + "}}", 1)
-                    variants.append({
-                        "text": cloze_text,
-                        "type": "syntactic_head",
-                        "target": head_text,
-                        "root": root_token.lemma_
-                    })
+        # Texto: un solo analisis para segmentacion + enriquecimiento
+        sections = None
+        if payload.enhance:
+            sections = list(ENHANCE_SECTIONS) if "all" in payload.enhance else [
+                name for name in ENHANCE_SECTIONS if name in payload.enhance
+            ]
+        if payload.text and (payload.strategy or sections):
+            include = set(payload.include or [])
+            needs = process_components(payload.strategy, include) if payload.strategy else []
+            for name in sections or []:
+                needs.extend(ENHANCE_SECTIONS[name][2])
+            doc = get_doc(payload.lang, payload.text, needs=needs)
+            parsed_texts += 1
+            if payload.strategy:
+                response["segmentation"] = process_doc(doc, payload.text, payload.strategy, include, params)
+            if sections:
+                response["enrichment"] = enhance_doc(doc, sections, payload.syntax_format)
         
-        # Limitar a 3 variantes por card
-        variants = variants[:3]
+        # Cards: cada respuesta se analiza una vez para validacion + cloze
+        cards = payload.cards or []
+        if cards and (payload.validation or payload.cloze is not None):
+            answers = [card.get("answer", "") for card in cards]
+            needs = []
+            if payload.validation:
+                needs.extend(VALIDATE_COMPONENTS)
+            if payload.cloze is not None:
+                needs.extend(CLOZE_COMPONENTS)
+            a_docs = get_docs(payload.lang, answers, needs=needs)
+            parsed_texts += len(answers)
+            
+            if payload.validation:
+                questions = [card.get("question", "") for card in cards]
+                q_docs = get_docs(payload.lang, questions, needs=VALIDATE_COMPONENTS)
+                parsed_texts += len(questions)
+                with metrics.stage("validate"):
+                    validated_cards = [
+                        validate_card(card, question, answer, q_doc, a_doc)
+                        for card, question, answer, q_doc, a_doc in zip(cards, questions, answers, q_docs, a_docs)
+                    ]
+                response["validation"] = {
+                    "validated_cards": validated_cards,
+                    "stats": validate_stats(cards, validated_cards)
+                }
+            
+            if payload.cloze is not None:
+                cloze_cards = []
+                with metrics.stage("cloze"):
+                    for card, answer, a_doc in zip(cards, answers, a_docs):
+                        if answer:
+                            cloze_cards.extend(cloze_cards_for(card, a_doc, config))
+                response["cloze"] = {
+                    "cloze_cards": cloze_cards,
+                    "stats": cloze_stats(cards, cloze_cards)
+                }
         
-        # Crear cards cloze
-        for variant in variants:
-            cloze_cards.append({
-                "question": card.get("question", "") + f" (Cloze - {variant['type']})",
-                "answer": variant["text"],
-                "type": "cloze",
-                "metadata": {
-                    "original_card": card,
-                    "cloze_type": variant["type"],
-                    "target": variant["target"],
-                    "generated_by": "spacy_neural"
+        response["stats"] = {
+            "stages": [stage for stage in ("segmentation", "enrichment", "validation", "cloze") if stage in response],
+            "parsed_texts": parsed_texts
+        }
+        return response
+    
+    except Exception as e:
+        return {"error": f"Error en analisis: {str(e)}"}
+
+# Deteccion de casi duplicados (ver dedupe.py)
+DEDUPE_THRESHOLD = float(os.environ.get("FLASHGEN_DEDUPE_THRESHOLD", str(dedupe.DEFAULT_THRESHOLD)))
+
+def dedupe_config(value):
+    """Config de dedupe de /process y /validate (None = desactivado). Lanza ValueError si no es valida."""
+    if not value:
+        return None
+    config = {"method": "minhash", "threshold": DEDUPE_THRESHOLD, "collapse": False}
+    if isinstance(value, dict):
+        unknown = set(value) - set(config)
+        if unknown:
+            raise ValueError(f"Opciones de dedupe desconocidas: {sorted(unknown)}")
+        config.update({key: val for key, val in value.items() if val is not None})
+    if config["method"] not in dedupe.METHODS:
+        raise ValueError(f"Metodo de dedupe no valido: {config['method']}. Disponibles: {list(dedupe.METHODS)}")
+    dedupe.check_threshold(config["threshold"])
+    return config
+
+def text_vectors(lang, texts):
+    """Vector medio de cada texto (solo tokenizador + tabla de vectores del modelo)"""
+    nlp = registry.get(lang)
+    if nlp is None:
+        raise ValueError(model_error(lang))
+    if nlp.vocab.vectors.size == 0:
+        raise ValueError(f"El modelo de '{lang}' no tiene vectores: usar method=minhash")
+    rows = []
+    for doc in nlp.tokenizer.pipe(texts):
+        matrix, mask = token_vectors(doc)
+        rows.append(matrix[mask].mean(axis=0) if mask.any() else numpy.zeros(matrix.shape[1], dtype="float32"))
+    return numpy.vstack(rows) if rows else numpy.zeros((0, 0), dtype="float32")
+
+def find_duplicates(texts, lang, method="minhash", threshold=None):
+    """Informe de dedupe.duplicate_report para `texts`"""
+    threshold = DEDUPE_THRESHOLD if threshold is None else threshold
+    with metrics.stage("dedupe"):
+        if method == "vectors":
+            pairs = dedupe.vector_pairs(text_vectors(lang, texts), threshold)
+        else:
+            pairs = dedupe.minhash_pairs(texts, threshold)
+        return dedupe.duplicate_report(len(texts), pairs)
+
+def card_text(card):
+    return f"{card.get('question', '')}\n{card.get('answer', '')}"
+
+def dedupe_chunks(response, lang, config):
+    """Marca (o quita, con collapse) los chunks casi duplicados de una respuesta de /process"""
+    report = find_duplicates(response["chunks"], lang, config["method"], config["threshold"])
+    response["duplicates"] = report["duplicates"]
+    response["stats"]["duplicate_chunks"] = len(report["duplicates"])
+    if config["collapse"] and report["duplicates"]:
+        response["chunks"] = [response["chunks"][i] for i in report["kept"]]
+        response["chunks_metadata"] = [response["chunks_metadata"][i] for i in report["kept"]]
+        response["stats"]["total_chunks"] = len(response["chunks"])
+
+def dedupe_cards(response, lang, config):
+    """Marca (o quita, con collapse) las cards casi duplicadas de una respuesta de /validate"""
+    cards = response["validated_cards"]
+    report = find_duplicates([card_text(card) for card in cards], lang, config["method"], config["threshold"])
+    response["duplicates"] = report["duplicates"]
+    if config["collapse"] and report["duplicates"]:
+        response["validated_cards"] = [cards[i] for i in report["kept"]]
+        response["stats"] = validate_stats(response["validated_cards"], response["validated_cards"])
+    response["stats"]["duplicate_cards"] = len(report["duplicates"])
+
+def dedupe_texts(payload: DedupePayload):
+    """
+    Detecta textos o cards casi duplicados sin comparar todos los pares
+    
+    - method="minhash": MinHash LSH sobre shingles de 3 palabras (Jaccard)
+    - method="vectors": LSH de hiperplanos sobre los vectores del modelo (coseno)
+    Devuelve los duplicados (indice, duplicado_de, similitud), los grupos y los
+    indices conservados; con collapse=true tambien los textos/cards conservados.
+    """
+    if payload.method not in dedupe.METHODS:
+        return {"error": f"Metodo no valido: {payload.method}. Disponibles: {list(dedupe.METHODS)}"}
+    use_cards = payload.texts is None
+    items = [card_text(card) for card in payload.cards or []] if use_cards else payload.texts
+    try:
+        report = find_duplicates(items, payload.lang, payload.method, payload.threshold)
+    except ValueError as e:
+        return {"error": str(e)}
+    response = dict(report)
+    response["stats"] = {
+        "total": len(items),
+        "duplicates": len(report["duplicates"]),
+        "groups": len(report["groups"]),
+        "method": payload.method,
+        "threshold": DEDUPE_THRESHOLD if payload.threshold is None else payload.threshold
+    }
+    if payload.collapse:
+        source = payload.cards if use_cards else payload.texts
+        response["cards" if use_cards else "texts"] = [source[i] for i in report["kept"]]
+    return response
+
+# Handlers que pueden ejecutarse en el pool de procesos: tipo -> (funcion, modelo del payload)
+POOL_HANDLERS = {
+    "process": (process_text, TextPayload),
+    "enhance": (enhance_text, TextPayload),
+    "validate": (validate_flashcards, None),
+    "generate_cloze": (generate_cloze, None),
+    "analyze": (analyze, AnalyzePayload),
+    "dedupe": (dedupe_texts, DedupePayload),
+    "process_batch": (process_batch, BatchPayload),
+    "process_compare": (compare_strategies, ComparePayload)
+}
+
+def payload_dict(payload):
+    """Payload serializable (dict) para enviarlo a otro proceso"""
+    if isinstance(payload, BaseModel):
+        return payload.model_dump() if hasattr(payload, "model_dump") else payload.dict()
+    return payload
+
+def run_handler(kind, payload):
+    """Ejecuta un handler sincrono a partir de un payload serializable"""
+    handler, payload_model = POOL_HANDLERS[kind]
+    return handler(payload_model(**payload) if payload_model else payload)
+
+def run_pool_job(kind, payload, profile=False):
+    """run_handler en un proceso del pool: devuelve el resultado, sus metricas y su perfil"""
+    profile_data = None
+    with metrics.collect() as request_metrics:
+        if profile:
+            result, profile_data = profiling.run_profiled(run_handler, kind, payload)
+        else:
+            result = run_handler(kind, payload)
+    return {"result": result, "metrics": request_metrics.snapshot(), "profile": profile_data}
+
+# Pool de procesos opcional (FLASHGEN_WORKERS > 0)
+worker_pool = None if IS_POOL_CHILD else WorkerPool.from_env(preload=registry.preload_langs)
+if worker_pool is not None:
+    atexit.register(worker_pool.shutdown)
+
+async def dispatch(kind, payload, profile=False):
+    """
+    Ejecuta el handler en el pool de procesos si esta activo, o en el threadpool.
+    Devuelve (resultado, perfil); el perfil es None salvo con profile=True.
+    """
+    handler, _ = POOL_HANDLERS[kind]
+    if worker_pool is None:
+        if profile:
+            return await run_in_threadpool(profiling.run_profiled, handler, payload)
+        return await run_in_threadpool(handler, payload), None
+    try:
+        job = await worker_pool.run(kind, payload_dict(payload), profile)
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            request_metrics.merge(job["metrics"])
+        return job["result"], job["profile"]
+    except WorkerPoolFull as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}), None
+    except asyncio.TimeoutError:
+        return JSONResponse(
+            status_code=504,
+            content={"error": f"Tiempo de espera agotado ({worker_pool.timeout}s)"}
+        ), None
+
+# Perfiles de ?profile=1 (GET /profiles/{id})
+profile_store = profiling.ProfileStore()
+
+# Metricas de las peticiones (GET /metrics)
+metrics_registry = metrics.MetricsRegistry()
+REQUESTS = metrics_registry.counter(
+    "flashgen_requests_total", "Peticiones atendidas", ("endpoint", "strategy", "lang", "status")
+)
+REQUEST_SECONDS = metrics_registry.histogram(
+    "flashgen_request_seconds", "Latencia de las peticiones", ("endpoint", "strategy", "lang")
+)
+STAGE_SECONDS = metrics_registry.histogram(
+    "flashgen_stage_seconds", "Tiempo por etapa (parse, segment, enrich, validate, cloze, serialize)",
+    ("endpoint", "stage")
+)
+COMPONENT_SECONDS = metrics_registry.histogram(
+    "flashgen_component_seconds", "Tiempo por componente spaCy y peticion", ("endpoint", "component")
+)
+TOKENS = metrics_registry.counter("flashgen_tokens_total", "Tokens analizados", ("endpoint", "lang"))
+
+def collect_server_metrics():
+    """Gauges del cache, los modelos, el pool de procesos y los trabajos"""
+    cache = doc_cache.stats()
+    models = registry.status()
+    families = [
+        ("flashgen_doc_cache_hits_total", "Aciertos del cache de Docs", "counter",
+         [({"level": "memory"}, cache["hits"]), ({"level": "disk"}, cache["disk_hits"])]),
+        ("flashgen_doc_cache_misses_total", "Fallos del cache de Docs", "counter", [({}, cache["misses"])]),
+        ("flashgen_doc_cache_evictions_total", "Evicciones del cache de Docs", "counter", [({}, cache["evictions"])]),
+        ("flashgen_doc_cache_hit_ratio", "Tasa de aciertos del cache de Docs", "gauge", [({}, cache["hit_rate"])]),
+        ("flashgen_doc_cache_bytes", "Bytes en el cache de Docs en memoria", "gauge", [({}, cache["bytes"])]),
+        ("flashgen_model_resident", "Modelo cargado en memoria (1/0)", "gauge",
+         [({"lang": lang, "model": info["model"]}, int(info["resident"])) for lang, info in models.items()]),
+        ("flashgen_model_memory_mb", "Memoria estimada de cada modelo cargado (MB)", "gauge",
+         [({"lang": lang}, info["memory_mb"]) for lang, info in models.items() if info["resident"]])
+    ]
+    if worker_pool is not None:
+        pool = worker_pool.stats()
+        families.append(("flashgen_worker_jobs_in_flight", "Trabajos en el pool de procesos", "gauge",
+                         [({}, pool["in_flight"])]))
+        families.append(("flashgen_worker_rejected_total", "Trabajos rechazados por cola llena", "counter",
+                         [({}, pool["rejected"])]))
+    if job_manager is not None:
+        families.append(("flashgen_jobs", "Trabajos en segundo plano por estado", "gauge",
+                         [({"status": status}, count) for status, count in job_manager.store.counts().items()]))
+    return families
+
+metrics_registry.add_collector(collect_server_metrics)
+
+def request_labels(kind, payload):
+    """Etiquetas acotadas (idiomas y estrategias conocidos) para las metricas"""
+    if payload is None:
+        return {"endpoint": kind, "strategy": "", "lang": ""}
+    if isinstance(payload, BaseModel):
+        lang, strategy = payload.lang, getattr(payload, "strategy", None)
+    else:
+        lang, strategy = payload.get("lang", "es"), None
+    # Solo /process (y su stream) y /analyze usan la estrategia
+    if kind in ("process", "process_stream"):
+        strategy = strategy or "sentences"
+    elif kind != "analyze":
+        strategy = None
+    return {
+        "endpoint": kind,
+        "strategy": (strategy if strategy in strategy_registry else "other") if strategy else "",
+        "lang": lang if registry.is_supported(lang) else "other"
+    }
+
+def response_status(result):
+    if isinstance(result, Response):
+        return "ok" if result.status_code < 400 else str(result.status_code)
+    return "error" if isinstance(result, dict) and "error" in result else "ok"
+
+def observe_request(labels, request_metrics, status, elapsed):
+    REQUESTS.inc(status=status, **labels)
+    REQUEST_SECONDS.observe(elapsed, **labels)
+    for stage_name, seconds in request_metrics.stages.items():
+        STAGE_SECONDS.observe(seconds, endpoint=labels["endpoint"], stage=stage_name)
+    for component, seconds in request_metrics.components.items():
+        COMPONENT_SECONDS.observe(seconds, endpoint=labels["endpoint"], component=component)
+    if request_metrics.tokens:
+        TOKENS.inc(request_metrics.tokens, endpoint=labels["endpoint"], lang=labels["lang"])
+
+def metered_events(kind, payload, events, fmt):
+    """
+    Eventos de un stream codificados en `fmt`, registrando las metricas de la
+    peticion (como respond()) cuando el stream termina o el cliente lo corta
+    """
+    request_metrics = metrics.RequestMetrics()
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        while True:
+            # Cada paso se ejecuta en un hilo y contexto nuevos: reactivar las metricas
+            with metrics.collect(request_metrics):
+                event = next(events, None)
+                if event is None:
+                    return
+                if event["type"] == "error":
+                    status = "error"
+                with metrics.stage("serialize"):
+                    line = format_event(event, fmt)
+            yield line
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        observe_request(request_labels(kind, payload), request_metrics, status, time.perf_counter() - start)
+
+def metered(kind):
+    """
+    Registra las metricas de peticion de una ruta sincrona que no pasa por
+    respond(); si devuelve un StreamingResponse, las registra metered_events
+    """
+    def decorator(route):
+        @wraps(route)
+        def wrapper(*args, **kwargs):
+            labels = request_labels(kind, kwargs.get("payload"))
+            start = time.perf_counter()
+            with metrics.collect() as request_metrics:
+                try:
+                    result = route(*args, **kwargs)
+                except Exception:
+                    observe_request(labels, request_metrics, "error", time.perf_counter() - start)
+                    raise
+            if not isinstance(result, StreamingResponse):
+                observe_request(labels, request_metrics, response_status(result), time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+async def respond(request, kind, payload):
+    """
+    Ejecuta el handler y codifica la respuesta fuera del event loop segun
+    Accept (JSON/MessagePack), Accept-Encoding (gzip/brotli) y ?fields= (ver encoding.py).
+    Registra las metricas de la peticion; con ?timings=1 añade stats.timings (ms por
+    etapa y componente) y, con FLASHGEN_SERVER_TIMING=1, la cabecera Server-Timing.
+    Con ?profile=1 (ver profiling.py) perfila el handler, guarda el perfil y
+    añade "profile" con su id y los puntos calientes.
+    """
+    profile = profiling.requested(request.query_params)
+    if profile and not profiling.authorized(request.headers):
+        return JSONResponse(status_code=403, content={"error": "Perfilado no permitido"})
+    start = time.perf_counter()
+    with metrics.collect() as request_metrics:
+        result, profile_data = await dispatch(kind, payload, profile)
+        if profile_data is not None:
+            stored = profile_store.add(kind, profile_data)
+            if isinstance(result, dict):
+                result["profile"] = {
+                    "id": stored["id"],
+                    "url": f"/profiles/{stored['id']}",
+                    "profiler": stored["profiler"],
+                    "duration_ms": stored["duration_ms"],
+                    "hotspots": stored["hotspots"]
                 }
-            })
+        if request.query_params.get("timings") in ("1", "true") and isinstance(result, dict) \
+                and isinstance(result.get("stats"), dict):
+            result["stats"]["timings"] = request_metrics.timings_ms()
+        with metrics.stage("serialize"):
+            response = await run_in_threadpool(make_response, request, result)
+    elapsed = time.perf_counter() - start
+    if metrics.SERVER_TIMING:
+        timing = request_metrics.server_timing()
+        response.headers["Server-Timing"] = f"{timing}, total;dur={elapsed * 1000:.2f}" if timing \
+            else f"total;dur={elapsed * 1000:.2f}"
+    if profile_data is not None:
+        response.headers["X-Flashgen-Profile-Id"] = stored["id"]
+    observe_request(request_labels(kind, payload), request_metrics, response_status(result), elapsed)
+    return response
+
+@app.post("/process", description=process_text.__doc__)
+async def process_route(payload: TextPayload, request: Request):
+    return await respond(request, "process", payload)
+
+@app.post("/process/stream", description=process_text_stream.__doc__)
+@metered("process_stream")
+def process_stream_route(payload: StreamPayload):
+    return process_text_stream(payload)
+
+@app.post("/process/batch", description=process_batch.__doc__)
+async def process_batch_route(payload: BatchPayload, request: Request):
+    if len(payload.documents) > BATCH_MAX_DOCUMENTS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Demasiados documentos: {len(payload.documents)} (maximo {BATCH_MAX_DOCUMENTS})"}
+        )
+    if payload.stream:
+        fmt = payload.format if payload.format in MEDIA_TYPES else "ndjson"
+        events = metered_events("process_batch", payload, iter_batch_events(payload), fmt)
+        return StreamingResponse(events, media_type=MEDIA_TYPES[fmt])
+    return await respond(request, "process_batch", payload)
+
+@app.post("/process/compare", description=compare_strategies.__doc__)
+async def process_compare_route(payload: ComparePayload, request: Request):
+    return await respond(request, "process_compare", payload)
+
+@app.post("/enhance", description=enhance_text.__doc__)
+async def enhance_route(payload: TextPayload, request: Request):
+    return await respond(request, "enhance", payload)
+
+@app.post("/validate", description=validate_flashcards.__doc__)
+async def validate_route(payload: dict, request: Request):
+    return await respond(request, "validate", payload)
+
+@app.post("/generate_cloze", description=generate_cloze.__doc__)
+async def generate_cloze_route(payload: dict, request: Request):
+    return await respond(request, "generate_cloze", payload)
+
+@app.post("/dedupe", description=dedupe_texts.__doc__)
+async def dedupe_route(payload: DedupePayload, request: Request):
+    return await respond(request, "dedupe", payload)
+
+@app.post("/analyze", description=analyze.__doc__)
+async def analyze_route(payload: AnalyzePayload, request: Request):
+    return await respond(request, "analyze", payload)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Metricas en formato de texto de Prometheus: peticiones, latencias por
+    endpoint/estrategia/idioma, tiempos por etapa y componente, tokens, cache y modelos
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles")
+def list_profiles(request: Request):
+    """
+    Perfiles guardados (el mas reciente primero)
+    """
+    if not profiling.authorized(request.headers):
+        return JSONResponse(status_code=403, content={"error": "Perfilado no permitido"})
+    return {"max_profiles": profile_store.max_profiles, "profiles": profile_store.list()}
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request, format: str = "json"):
+    """
+    Perfil guardado: format=json (resumen y pilas), collapsed (texto para
+    flamegraph.pl/inferno) o speedscope (fichero para speedscope.app)
+    """
+    if not profiling.authorized(request.headers):
+        return JSONResponse(status_code=403, content={"error": "Perfilado no permitido"})
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        return JSONResponse(status_code=404, content={"error": f"Perfil no encontrado: {profile_id}"})
+    if format == "collapsed":
+        return PlainTextResponse(profiling.to_collapsed(profile))
+    if format == "speedscope":
+        return profiling.to_speedscope(profile)
+    if format != "json":
+        return JSONResponse(status_code=400, content={"error": f"Formato no soportado: {format}"})
+    return profile
+
+@app.get("/workers/stats")
+def workers_stats():
+    """
+    Estado del pool de procesos (None si se usa el threadpool)
+    """
+    return {"enabled": worker_pool is not None, "stats": worker_pool.stats() if worker_pool else None}
+
+# Cards por lote en los trabajos de /validate y /generate_cloze (avance por lote)
+JOB_CARD_BATCH = int(os.environ.get("FLASHGEN_JOB_CARD_BATCH", "256"))
+
+def include_fields_names(include):
+    """Campos de include_fields presentes en `include`, en orden estable"""
+    return [field for field in ("sentences", "entities", "noun_chunks") if field in include]
+
+def run_process_job(payload, progress):
+    """
+    Trabajo /process: los textos cortos se procesan de una vez; los que superan
+    segment_chars (por defecto FLASHGEN_STREAM_SEGMENT_CHARS) se procesan por
+    segmentos como /process/stream, informando de los segmentos terminados, y
+    el resultado se reensambla con la forma de /process.
+    """
+    payload = StreamPayload(**payload)
+    nlp = registry.get(payload.lang)
+    if not nlp:
+        return {"error": model_error(payload.lang)}
+    max_chars = min(payload.segment_chars or STREAM_SEGMENT_CHARS, nlp.max_length - 1)
+    if len(payload.text) <= max_chars:
+        progress(0, 1, "segments")
+        result = process_text(payload)
+        progress(1)
+        return result
+    try:
+        dedupe = dedupe_config(payload.dedupe)
+        # Los mismos patrones que iter_process_events, para que el total cuadre
+        params = resolve_strategy_params(payload.strategy or "sentences", payload.params, payload.chapter_patterns)
+        chapters = detect_chapters(payload.text, params.get("chapter_patterns", payload.chapter_patterns))
+    except (ValueError, re.error) as e:
+        return {"error": str(e)}
     
+    total = sum(1 for _ in iter_segments(payload.text, chapters, max_chars))
+    progress(0, total, "segments")
+    response = {"chunks": [], "chunks_metadata": []}
+    include = set(payload.include or [])
+    for field in include_fields_names(include):
+        response[field] = []
+    done = 0
+    for event in iter_process_events(nlp, payload, params):
+        if event["type"] == "error":
+            return {"error": event["error"]}
+        response["chunks"].extend(event["chunks"])
+        response["chunks_metadata"].extend(event["chunks_metadata"])
+        for field in include_fields_names(include):
+            response[field].extend(event.get(field, []))
+        if event["type"] == "segment":
+            done += 1
+            progress(done)
+        else:
+            response["stats"] = dict(event["stats"], has_vectors=nlp.vocab.vectors.size > 0)
+    if "sentences" in response:
+        response["stats"]["total_sentences"] = len(response["sentences"])
+    if "entities" in response:
+        response["stats"]["total_entities"] = len(response["entities"])
+    # Como process_response: dedupe sobre los chunks ya reensamblados
+    if dedupe is not None:
+        dedupe_chunks(response, payload.lang, dedupe)
+    return response
+
+def run_cards_job(handler, items_key, merge_stats, dedupe_items=None):
+    """
+    Trabajo por lotes de cards: llama a `handler` por lote e informa del avance.
+    Con `dedupe_items` el dedupe se aplica una vez sobre todos los resultados
+    (no por lote), para que el resultado sea el del endpoint sincrono.
+    """
+    def run(payload, progress):
+        cards = payload.get("cards", [])
+        config = None
+        if dedupe_items is not None:
+            try:
+                config = dedupe_config(payload.get("dedupe"))
+            except ValueError as e:
+                return {"error": str(e)}
+        batch_payload = {key: value for key, value in payload.items() if key != "dedupe"}
+        progress(0, len(cards), "cards")
+        items = []
+        for start in range(0, len(cards), JOB_CARD_BATCH):
+            batch = cards[start:start + JOB_CARD_BATCH]
+            result = handler({**batch_payload, "cards": batch})
+            if "error" in result:
+                return result
+            items.extend(result[items_key])
+            progress(start + len(batch))
+        response = {items_key: items, "stats": merge_stats(cards, items)}
+        if config is not None:
+            dedupe_items(response, payload.get("lang", "es"), config)
+        return response
+    return run
+
+def run_batch_job(payload, progress):
+    """Trabajo /process/batch: informa de los documentos terminados"""
+    payload = BatchPayload(**payload)
+    progress(0, len(payload.documents), "documents")
+    results = [None] * len(payload.documents)
+    for done, (index, result) in enumerate(iter_process_batch(payload), 1):
+        results[index] = batch_result(payload, index, result)
+        progress(done)
+    return {"results": results, "stats": batch_stats(results)}
+
+def run_single_step_job(kind):
+    def run(payload, progress):
+        progress(0, 1, "steps")
+        result = run_handler(kind, payload)
+        progress(1)
+        return result
+    return run
+
+# Tipos de trabajo de /jobs -> runner(payload, progress)
+JOB_RUNNERS = {
+    "process": run_process_job,
+    "enhance": run_single_step_job("enhance"),
+    "validate": run_cards_job(validate_flashcards, "validated_cards", validate_stats, dedupe_cards),
+    "generate_cloze": run_cards_job(generate_cloze, "cloze_cards", cloze_stats),
+    "analyze": run_single_step_job("analyze"),
+    "process_batch": run_batch_job,
+    "process_compare": run_single_step_job("process_compare")
+}
+
+job_manager = None if IS_POOL_CHILD else JobManager.from_env(JOB_RUNNERS)
+if job_manager is not None:
+    atexit.register(job_manager.shutdown)
+    if job_manager.interrupted:
+        print(f"⚠️ {job_manager.interrupted} trabajos interrumpidos por el reinicio")
+
+@app.post("/jobs")
+def create_job(payload: dict):
+    """
+    Encola un trabajo en segundo plano para documentos grandes
+    
+    El cuerpo es el payload del endpoint correspondiente mas "type": process,
+    process_batch, process_compare, enhance, validate, generate_cloze o analyze. Devuelve el id del trabajo; el
+    avance se consulta en GET /jobs/{id} y el resultado en GET /jobs/{id}/result.
+    """
+    job_type = payload.get("type")
+    if job_type not in JOB_RUNNERS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Tipo de trabajo no valido: {job_type}. Disponibles: {list(JOB_RUNNERS)}"}
+        )
+    body = {key: value for key, value in payload.items() if key != "type"}
+    payload_model = StreamPayload if job_type == "process" else POOL_HANDLERS[job_type][1]
+    if payload_model is not None:
+        try:
+            model = payload_model(**body)
+        except Exception as e:
+            return JSONResponse(status_code=422, content={"error": f"Payload no valido: {str(e)}"})
+        # Como /process/stream: un patron o parametro invalido no llega al worker
+        error = stream_params_error(model) if job_type == "process" else None
+        if error:
+            return JSONResponse(status_code=422, content={"error": error})
+    if body.get("dedupe"):
+        # generate_cloze no hace dedupe: mejor un 422 que ignorarlo
+        if job_type == "generate_cloze":
+            return JSONResponse(status_code=422, content={"error": f"dedupe no esta disponible en trabajos {job_type}"})
+        try:
+            dedupe_config(body["dedupe"])
+        except ValueError as e:
+            return JSONResponse(status_code=422, content={"error": str(e)})
+    job_id = job_manager.submit(job_type, body)
     return {
-        "cloze_cards": cloze_cards,
-        "stats": {
-            "original_cards": len(cards),
-            "generated_cloze": len(cloze_cards),
-            "variants_per_card": round(len(cloze_cards) / len(cards), 2) if cards else 0
-        }
+        "id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
     }
 
+@app.get("/jobs/stats")
+def jobs_stats():
+    """
+    Trabajos por estado, concurrencia y TTL del gestor de trabajos
+    """
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    Estado y avance (segmentos o cards terminados) de un trabajo
+    """
+    info = job_manager.status(job_id)
+    if info is None:
+        return JSONResponse(status_code=404, content={"error": f"Trabajo no encontrado: {job_id}"})
+    return info
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str, request: Request):
+    """
+    Resultado de un trabajo terminado (409 si aun no ha terminado)
+    """
+    job, result = job_manager.result(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Trabajo no encontrado: {job_id}"})
+    if job["status"] == "error":
+        return {"error": job["error"]}
+    if result is None:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "El trabajo aun no ha terminado", "status": job["status"]}
+        )
+    return make_response(request, result)
+
+# Indice de terminos por corpus (ver term_index.py)
+term_index = None if IS_POOL_CHILD else TermIndex.from_env()
+
+@app.post("/corpus/{corpus}/documents")
+@metered("corpus_add")
+def add_corpus_document(corpus: str, payload: CorpusDocumentPayload):
+    """
+    Añade un documento al indice de terminos del corpus (o lo reemplaza si ya
+    existe su doc_id). Solo se analiza este documento: los contadores del
+    corpus se actualizan de forma incremental.
+    """
+    nlp = registry.get(payload.lang)
+    if not nlp:
+        return {"error": model_error(payload.lang)}
+    try:
+        doc = get_doc(payload.lang, payload.text, needs=SYNTAX_COMPONENTS)
+        terms = extract_terms(doc)
+        info = term_index.add_document(
+            corpus, terms, doc_id=payload.doc_id, lang=payload.lang, text=payload.text, tokens=len(doc)
+        )
+        return {"corpus": corpus, **info, "tokens": len(doc)}
+    except Exception as e:
+        return {"error": f"Error al indexar documento: {str(e)}"}
+
+@app.delete("/corpus/{corpus}/documents/{doc_id}")
+@metered("corpus_remove")
+def remove_corpus_document(corpus: str, doc_id: str):
+    """
+    Quita un documento del corpus y descuenta sus terminos
+    """
+    if not term_index.remove_document(corpus, doc_id):
+        return JSONResponse(status_code=404, content={"error": f"Documento no encontrado: {doc_id}"})
+    return {"success": True, "corpus": corpus, "doc_id": doc_id}
+
+@app.get("/corpus")
+@metered("corpus_list")
+def list_corpora():
+    """
+    Corpus indexados con su numero de documentos y tokens
+    """
+    return {"corpora": term_index.corpora()}
+
+@app.get("/corpus/{corpus}")
+@metered("corpus_stats")
+def corpus_stats(corpus: str):
+    """
+    Documentos y terminos de un corpus
+    """
+    stats = term_index.stats(corpus)
+    if stats is None:
+        return JSONResponse(status_code=404, content={"error": f"Corpus no encontrado: {corpus}"})
+    return stats
+
+@app.delete("/corpus/{corpus}")
+@metered("corpus_drop")
+def drop_corpus(corpus: str):
+    """
+    Borra un corpus completo del indice
+    """
+    return {"success": True, "corpus": corpus, "documents": term_index.drop_corpus(corpus)}
+
+@app.get("/corpus/{corpus}/terms")
+@metered("corpus_terms")
+def corpus_terms(corpus: str, request: Request, k: int = 50, kind: Optional[str] = None,
+                 doc_id: Optional[str] = None, min_df: int = 1, examples: bool = True):
+    """
+    Top-k terminos del corpus por TF-IDF
+    
+    - kind: "lemma" o "noun_phrase" (por defecto ambos)
+    - doc_id: terminos caracteristicos de ese documento frente al corpus
+    - min_df: minimo de documentos en los que aparece el termino
+    - examples: incluir oraciones de ejemplo (offsets y texto)
+    """
+    if kind is not None and kind not in TERM_KINDS:
+        return JSONResponse(status_code=400, content={"error": f"kind no valido: {kind}. Disponibles: {list(TERM_KINDS)}"})
+    terms = term_index.top_terms(corpus, k=max(k, 0), kind=kind, doc_id=doc_id, min_df=min_df, examples=examples)
+    return make_response(request, {"corpus": corpus, "doc_id": doc_id, "kind": kind, "terms": terms})
+
 if __name__ == "__main__":
     import uvicorn
     import webbrowser
@@ -0,0 +1,124 @@
+"""
+Motor vectorizado de similitud entre oraciones
+
+Apila los vectores medios de todas las oraciones de un Doc en una matriz NumPy
+(una sola pasada sobre los tokens), la normaliza y calcula similitudes coseno
+adyacentes o entre todos los pares con productos de matrices. Para documentos
+largos el calculo de todos los pares se hace por bloques de filas (y opcionalmente
+top-k por fila) para no materializar nunca la matriz n x n.
+
+Equivale a Span.similarity / Span.vector con los vectores estaticos del modelo
+(o el tensor del Doc si el modelo no tiene vectores).
+"""
+
+import os
+
+import numpy
+
+# Filas por bloque al calcular todos los pares (memoria ~ BLOCK_ROWS x n floats)
+BLOCK_ROWS = int(os.environ.get("FLASHGEN_SIMILARITY_BLOCK_ROWS", "1024"))
+
+
+def token_vectors(doc):
+    """
+    Matriz (n_tokens x dim) con el vector de cada token y mascara de tokens con vector.
+    Usa la tabla de vectores del vocabulario o, si no hay, el tensor del Doc.
+    """
+    vectors = doc.vocab.vectors
+    if vectors.size > 0:
+        if getattr(vectors, "mode", "default") != "default":
+            # Vectores floret: se calculan por subpalabras, sin tabla de filas
+            matrix = numpy.asarray([token.vector for token in doc], dtype="float32")
+            return matrix, numpy.ones(len(doc), dtype=bool)
+        attr = getattr(vectors, "attr", "ORTH")
+        keys = doc.to_array([attr]).reshape(-1)
+        rows = vectors.find(keys=keys)
+        mask = rows >= 0
+        data = numpy.asarray(vectors.data)
+        matrix = numpy.zeros((len(doc), data.shape[1]), dtype="float32")
+        if mask.any():
+            matrix[mask] = data[rows[mask]]
+        return matrix, mask
+    tensor = getattr(doc, "tensor", None)
+    if tensor is not None and getattr(tensor, "size", 0) > 0:
+        matrix = numpy.asarray(tensor, dtype="float32")
+        return matrix, numpy.ones(len(doc), dtype=bool)
+    return numpy.zeros((len(doc), 0), dtype="float32"), numpy.zeros(len(doc), dtype=bool)
+
+
+class SentenceSimilarity:
+    """Vectores de oracion apilados y normalizados para un Doc (o una lista de oraciones)"""
+
+    def __init__(self, doc, sents=None):
+        sents = list(doc.sents) if sents is None else list(sents)
+        self.n = len(sents)
+        matrix, mask = token_vectors(doc)
+        dim = matrix.shape[1]
+
+        starts = numpy.asarray([s.start for s in sents], dtype="int64")
+        ends = numpy.asarray([s.end for s in sents], dtype="int64")
+        lengths = ends - starts
+
+        # Oraciones con al menos un token con vector (como Span.has_vector)
+        with_vector = numpy.concatenate([[0], numpy.cumsum(mask, dtype="int64")])
+        self.has_vector = (with_vector[ends] - with_vector[starts]) > 0 if self.n else numpy.zeros(0, dtype=bool)
+
+        if self.n and dim:
+            # Suma por oracion en una sola pasada: reduceat sobre [inicio, fin) de cada oracion
+            padded = numpy.vstack([matrix, numpy.zeros((1, dim), dtype="float32")])
+            bounds = numpy.empty(2 * self.n, dtype="int64")
+            bounds[0::2] = starts
+            bounds[1::2] = ends
+            sums = numpy.add.reduceat(padded, bounds, axis=0)[0::2]
+            sums[lengths <= 0] = 0.0
+            self.vectors = sums / numpy.maximum(lengths, 1)[:, None].astype("float32")
+        else:
+            self.vectors = numpy.zeros((self.n, dim), dtype="float32")
+
+        self.norms = numpy.sqrt((self.vectors ** 2).sum(axis=1)) if dim else numpy.zeros(self.n, dtype="float32")
+        safe = numpy.where(self.norms > 0, self.norms, 1.0)
+        self.unit = self.vectors / safe[:, None]
+        self.unit[self.norms == 0] = 0.0
+
+    def adjacent(self):
+        """Similitud coseno entre cada oracion y la siguiente (longitud n-1)"""
+        if self.n < 2:
+            return numpy.zeros(0, dtype="float32")
+        return (self.unit[:-1] * self.unit[1:]).sum(axis=1)
+
+    def similarity_to(self, unit_vector):
+        """Similitud de cada oracion con un vector ya normalizado"""
+        if unit_vector is None or self.unit.shape[1] == 0:
+            return numpy.zeros(self.n, dtype="float32")
+        return self.unit @ unit_vector
+
+    def pairs_above(self, threshold, top_k=None, block_rows=None):
+        """
+        Para cada oracion con vector, pares (j, sim) con sim > threshold (j != i),
+        ordenados por j. Se calcula por bloques de filas; con top_k solo se
+        conservan los k pares mas similares de cada fila.
+        Devuelve un dict {i: [(j, sim), ...]} solo con las filas que tienen pares.
+        """
+        block_rows = block_rows or BLOCK_ROWS
+        result = {}
+        if self.n < 2 or self.unit.shape[1] == 0:
+            return result
+        cols_ok = self.has_vector
+        for start in range(0, self.n, block_rows):
+            stop = min(start + block_rows, self.n)
+            sims = self.unit[start:stop] @ self.unit.T
+            sims[:, ~cols_ok] = -numpy.inf
+            rows = numpy.arange(start, stop)
+            sims[rows - start, rows] = -numpy.inf
+            for offset, i in enumerate(rows):
+                if not self.has_vector[i]:
+                    continue
+                row = sims[offset]
+                js = numpy.flatnonzero(row > threshold)
+                if not len(js):
+                    continue
+                if top_k and len(js) > top_k:
+                    best = numpy.argpartition(row[js], -top_k)[-top_k:]
+                    js = numpy.sort(js[best])
+                result[int(i)] = [(int(j), float(row[j])) for j in js]
+        return result
@@ -0,0 +1,153 @@
+"""
+Registro de estrategias de segmentacion de /process
+
+Cada estrategia declara su funcion de segmentacion, sus parametros (con valor
+por defecto), los componentes spaCy que necesita y el formato de su salida:
+- "strings": lista de textos
+- "chunks": lista de {'text', 'metadata'}
+
+La funcion recibe el Doc, el texto original y los parametros resueltos:
+segment(doc, text, **params). Opcionalmente, `stream(**params)` crea el
+segmentador por segmentos de /process/stream (feed(segment, doc) / flush());
+sin el, cada segmento se procesa de forma independiente.
+
+Plugins: un paquete instalado puede declarar un entry point en el grupo
+"flashgen.strategies" que apunte a un Strategy o a una funcion
+register(registry). Ejemplo en su pyproject.toml:
+
+    [project.entry-points."flashgen.strategies"]
+    headings = "mi_paquete.flashgen:register"
+"""
+
+from importlib import metadata
+
+ENTRY_POINT_GROUP = "flashgen.strategies"
+OUTPUTS = ("strings", "chunks")
+
+
+class StrategyError(ValueError):
+    """Estrategia o parametros no validos"""
+
+
+def _coerce(name, value, default):
+    """Convierte `value` al tipo del valor por defecto (None acepta cualquiera)"""
+    if default is None or value is None:
+        return value
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+    elif isinstance(default, int):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    elif isinstance(default, float):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif isinstance(value, type(default)):
+        return value
+    raise StrategyError(f"Parametro '{name}' debe ser {type(default).__name__}, no {type(value).__name__}")
+
+
+class Strategy:
+    def __init__(self, name, segment, params=None, components=None, output="chunks",
+                 description="", stream=None):
+        if output not in OUTPUTS:
+            raise StrategyError(f"Salida no soportada: {output} (usar {', '.join(OUTPUTS)})")
+        self.name = name
+        self.segment = segment
+        self.params = dict(params or {})
+        self.components = ["senter"] if components is None else list(components)
+        self.output = output
+        self.description = description
+        self.stream = stream
+
+    def resolve_params(self, values=None):
+        """Parametros por defecto + los de la peticion (lanza StrategyError si no son validos)"""
+        resolved = dict(self.params)
+        for name, value in (values or {}).items():
+            if name not in self.params:
+                known = ", ".join(self.params) or "ninguno"
+                raise StrategyError(f"Parametro desconocido para {self.name}: '{name}' (admite: {known})")
+            resolved[name] = _coerce(name, value, self.params[name])
+        return resolved
+
+    def run(self, doc, text, params):
+        return self.segment(doc, text, **params)
+
+    def make_stream(self, params):
+        if self.stream is not None:
+            return self.stream(**params)
+        return None
+
+    def describe(self):
+        return {
+            "params": self.params,
+            "components": self.components,
+            "output": self.output,
+            "description": self.description,
+            "streaming": "stateful" if self.stream is not None else "per_segment"
+        }
+
+
+class StrategyRegistry:
+    """Estrategias por nombre; las desconocidas usan la estrategia por defecto"""
+
+    def __init__(self, default="sentences"):
+        self.default = default
+        self._strategies = {}
+
+    def register(self, name_or_strategy, segment=None, **options):
+        """
+        Registra un Strategy, o crea uno a partir de nombre, funcion y opciones.
+        Sin funcion devuelve un decorador:
+
+            @strategies.register("mi_estrategia", params={"n": 3}, output="strings")
+            def segment_mi_estrategia(doc, text, n=3): ...
+        """
+        if isinstance(name_or_strategy, Strategy):
+            self._strategies[name_or_strategy.name] = name_or_strategy
+            return name_or_strategy
+        if segment is None:
+            def decorator(fn):
+                self.register(name_or_strategy, fn, **options)
+                return fn
+            return decorator
+        strategy = Strategy(name_or_strategy, segment, **options)
+        self._strategies[strategy.name] = strategy
+        return strategy
+
+    def __contains__(self, name):
+        return name in self._strategies
+
+    def get(self, name):
+        """Strategy de `name` (la estrategia por defecto si no existe)"""
+        return self._strategies.get(name) or self._strategies[self.default]
+
+    def names(self):
+        return list(self._strategies)
+
+    def describe(self):
+        return {name: strategy.describe() for name, strategy in self._strategies.items()}
+
+    def load_entry_points(self, group=ENTRY_POINT_GROUP):
+        """Carga las estrategias de los plugins instalados. Devuelve sus nombres."""
+        try:
+            entry_points = metadata.entry_points(group=group)
+        except TypeError:  # Python < 3.10
+            entry_points = metadata.entry_points().get(group, [])
+        loaded = []
+        for entry_point in entry_points:
+            try:
+                plugin = entry_point.load()
+                before = set(self._strategies)
+                if isinstance(plugin, Strategy):
+                    self.register(plugin)
+                else:
+                    plugin(self)
+                loaded.extend(sorted(set(self._strategies) - before) or [entry_point.name])
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar el plugin de estrategias {entry_point.name}: {e}")
+        if loaded:
+            print(f"🧩 Estrategias de plugins: {', '.join(loaded)}")
+        return loaded
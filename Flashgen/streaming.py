@@ -0,0 +1,74 @@
+"""
+Utilidades para /process/stream
+
+Divide textos largos (libros) en segmentos acotados respetando capitulos y
+parrafos, y codifica los eventos de salida como NDJSON o Server-Sent Events.
+"""
+
+import re
+
+from encoding import dumps_json
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SOFT_BREAKS = ('\n', '. ', '? ', '! ', '; ', ' ')
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
+
+
+def _split_long_paragraph(paragraph, max_chars):
+    """Corta un parrafo mayor que max_chars en el ultimo corte natural disponible"""
+    if max_chars < 1:
+        raise ValueError(f"max_chars debe ser mayor que 0: {max_chars}")
+    while len(paragraph) > max_chars:
+        window = paragraph[:max_chars]
+        cut = -1
+        for sep in SOFT_BREAKS:
+            pos = window.rfind(sep)
+            if pos > max_chars // 2:
+                cut = pos + len(sep)
+                break
+        if cut <= 0:
+            cut = max_chars
+        yield paragraph[:cut]
+        paragraph = paragraph[cut:]
+    if paragraph:
+        yield paragraph
+
+
+def iter_segments(text, chapters, max_chars):
+    """
+    Genera segmentos de como maximo max_chars caracteres a partir de los
+    capitulos detectados (offsets 'start'/'end' en `text`), agrupando parrafos
+    completos siempre que sea posible. Cada segmento: {'index', 'chapter', 'text'}.
+    """
+    if max_chars < 1:
+        raise ValueError(f"max_chars debe ser mayor que 0: {max_chars}")
+    index = 0
+    for chapter in chapters:
+        buffer = []
+        size = 0
+        for paragraph in PARAGRAPH_BREAK.split(text[chapter['start']:chapter['end']]):
+            if not paragraph.strip():
+                continue
+            for piece in _split_long_paragraph(paragraph, max_chars):
+                if buffer and size + len(piece) + 2 > max_chars:
+                    yield {'index': index, 'chapter': chapter['title'], 'text': '\n\n'.join(buffer)}
+                    index += 1
+                    buffer = []
+                    size = 0
+                buffer.append(piece)
+                size += len(piece) + 2
+        if buffer:
+            yield {'index': index, 'chapter': chapter['title'], 'text': '\n\n'.join(buffer)}
+            index += 1
+
+
+def format_event(event, fmt="ndjson"):
+    """Serializa un evento ({'type': ..., ...}) como linea NDJSON o mensaje SSE"""
+    data = dumps_json(event).decode("utf-8")
+    if fmt == "sse":
+        return f"event: {event.get('type', 'message')}\ndata: {data}\n\n"
+    return data + "\n"
@@ -0,0 +1,410 @@
+"""
+Extraccion sintactica compartida (clausulas y sintagmas verbales) con arrays
+
+El arbol de dependencias de un Doc se lee una vez con
+doc.to_array([HEAD, DEP, POS, ORTH]). En docs pequeños (cards, chunks) cada
+consulta recorre el subarbol que necesita con una pila, sin precalculo. En los
+grandes se precalculan, la primera vez que hacen falta y sin recursion ni
+limite de profundidad:
+- profundidad de cada token (saltos de punteros)
+- tamaño del subarbol y posicion en preorden: el subarbol de un token es un
+  intervalo contiguo del preorden, exacto aunque el arbol no sea proyectivo
+- extremos izquierdo y derecho del subarbol (left_edge / right_edge)
+- el dependiente excluido (conjuncion coordinante) mas cercano por encima de
+  cada token, para cortar las clausulas
+con NumPy nivel a nivel si el arbol es poco profundo o con un recorrido
+iterativo en Python si no.
+
+Los resultados son listas de indices de token ordenados; el texto se obtiene
+de los tokens o de los offsets de caracteres segun lo que espere cada llamador.
+Lo usan clause_segment y verb_phrase_segment (/process), verb_phrases
+(/enhance) y los sintagmas verbales de cloze.py.
+
+syntax_columns() devuelve el analisis sintactico de un Doc (a traves de su
+DocView) en columnas (arrays paralelos + diccionario de etiquetas) para el
+formato columnar de /enhance.
+"""
+
+import os
+
+import numpy
+from spacy.attrs import DEP, HEAD, ORTH, POS, SPACY
+from spacy.symbols import CCONJ, VERB
+
+# Tokens a partir de los que se precalculan tablas del arbol (por debajo, cada consulta recorre su subarbol)
+ARRAYS_MIN_TOKENS = int(os.environ.get("FLASHGEN_SYNTAX_ARRAYS_MIN_TOKENS", "500"))
+CLAUSE_CUT_DEPS = ("cc", "conj")
+CONJUNCTIONS = frozenset(['y', 'pero', 'mas', 'sino', 'o', 'and', 'but', 'or', 'yet'])
+
+
+def _depths(heads):
+    """Profundidad de cada token (0 = raiz) por saltos de punteros"""
+    index = numpy.arange(len(heads))
+    depth = (heads != index).astype(numpy.int64)
+    pointer = heads.copy()
+    # log2(n) saltos bastan en un arbol (el limite evita un bucle infinito con ciclos)
+    for _ in range(len(heads).bit_length() + 1):
+        following = pointer[pointer]
+        if numpy.array_equal(following, pointer):
+            break
+        depth = depth + depth[pointer]
+        pointer = following
+    return depth
+
+
+def _children(heads):
+    """Raices e hijos de cada token ({token: [hijos]} en orden de indice)"""
+    children = {}
+    roots = []
+    for i, head in enumerate(heads):
+        if head == i:
+            roots.append(i)
+        elif head in children:
+            children[head].append(i)
+        else:
+            children[head] = [i]
+    return roots, children
+
+
+class DependencyArrays:
+    """
+    Arbol de dependencias de un Doc preparado para las consultas por token
+    (una vez por Doc). Las columnas HEAD, DEP y POS se leen con un to_array; el
+    resto depende del tamaño:
+    - menos de ARRAYS_MIN_TOKENS tokens (cards, chunks, trozos de un stream):
+      columnas en listas y cada consulta recorre su subarbol con una pila, sin
+      precalculo (el coste fijo de NumPy no compensa)
+    - docs grandes: columnas en arrays y tablas de preorden, tamaño,
+      profundidad y extremos del subarbol, calculadas la primera vez que una
+      consulta las necesita, con NumPy nivel a nivel si el arbol es poco
+      profundo o con un recorrido en Python si no (cadenas largas)
+    Las dos rutas dan el mismo resultado.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        n = len(doc)
+        columns = doc.to_array([HEAD, DEP, POS, ORTH]).reshape(n, 4)
+        offsets = columns[:, 0].astype(numpy.int64)
+        self._orth = columns[:, 3]
+        self._texts = None
+        self._children = None
+        self._preorder = None
+        self._cut = None
+        self._label_ids = {}
+        self._dependents = {}
+        self._excluded = None
+        self._small = n < ARRAYS_MIN_TOKENS
+        if self._small:
+            # Docs pequeños: listas (unas pocas operaciones NumPy cuestan mas que el recorrido)
+            self._heads = [i + offset for i, offset in enumerate(offsets.tolist())]
+            self._deps = columns[:, 1].tolist()
+            self._pos = columns[:, 2].tolist()
+        else:
+            self._index = numpy.arange(n, dtype=numpy.int64)
+            self._heads = self._index + offsets
+            self._deps = columns[:, 1]
+            self._pos = columns[:, 2]
+
+    @property
+    def texts(self):
+        """Texto de cada token"""
+        if self._texts is None:
+            strings = self.doc.vocab.strings
+            self._texts = [strings[orth] for orth in self._orth.tolist()]
+        return self._texts
+
+    def _tables(self):
+        """Calcula las tablas de un doc grande (ver la descripcion de la clase)"""
+        if self._preorder is None:
+            depth = _depths(self._heads)
+            # NumPy hace unas pocas operaciones por nivel: solo compensa con un
+            # arbol poco profundo
+            if int(depth.max(initial=0)) * 4 < len(self._heads):
+                self._precompute(depth)
+            else:
+                self._walk(depth)
+
+    def _walk(self, depth):
+        """Tablas con un recorrido iterativo en preorden (raices e hijos por indice)"""
+        heads = self._heads.tolist()
+        n = len(heads)
+        roots, children = _children(heads)
+        by_preorder = []
+        stack = roots[::-1]
+        while stack:
+            i = stack.pop()
+            by_preorder.append(i)
+            below = children.get(i)
+            if below:
+                stack.extend(reversed(below))
+        preorder = [0] * n
+        for position, i in enumerate(by_preorder):
+            preorder[i] = position
+        size = [1] * n
+        left = list(range(n))
+        right = list(range(n))
+        for i in reversed(by_preorder):
+            head = heads[i]
+            if head != i:
+                size[head] += size[i]
+                if left[i] < left[head]:
+                    left[head] = left[i]
+                if right[i] > right[head]:
+                    right[head] = right[i]
+        self._preorder = preorder
+        self._by_preorder = by_preorder
+        self._size = size
+        self._depth = depth.tolist()
+        self._left = left
+        self._right = right
+
+    def _precompute(self, depth):
+        """Tablas con NumPy, nivel a nivel (sin recursion, sin limite de profundidad)"""
+        heads = self._heads
+        index = self._index
+        n = len(heads)
+
+        # Tokens agrupados por nivel (de la raiz hacia abajo)
+        by_depth = numpy.argsort(depth, kind="stable")
+        counts = numpy.bincount(depth, minlength=1)
+        levels = numpy.split(by_depth, numpy.cumsum(counts)[:-1])
+
+        # Hijos de cada token en orden de indice (como token.children)
+        is_child = heads != index
+        order = numpy.lexsort((index[is_child], heads[is_child]))
+        children_index = index[is_child][order]
+        children_heads = heads[is_child][order]
+
+        # Tamaño y extremos del subarbol, de las hojas hacia la raiz
+        size = numpy.ones(n, dtype=numpy.int64)
+        left = index.copy()
+        right = index.copy()
+        for level in reversed(levels[1:]):
+            parents = heads[level]
+            numpy.add.at(size, parents, size[level])
+            numpy.minimum.at(left, parents, left[level])
+            numpy.maximum.at(right, parents, right[level])
+
+        # Posicion en preorden: raices por indice, hijos por indice tras su padre
+        preorder = numpy.zeros(n, dtype=numpy.int64)
+        roots = levels[0]
+        preorder[roots] = numpy.cumsum(size[roots]) - size[roots]
+        sizes = size[children_index]
+        before = numpy.cumsum(sizes) - sizes
+        group_start = numpy.searchsorted(children_heads, children_heads)
+        offset = numpy.zeros(n, dtype=numpy.int64)
+        offset[children_index] = before - before[group_start]
+        for level in levels[1:]:
+            preorder[level] = preorder[heads[level]] + 1 + offset[level]
+        by_preorder = numpy.empty(n, dtype=numpy.int64)
+        by_preorder[preorder] = index
+
+        self._preorder = preorder.tolist()
+        self._by_preorder = by_preorder.tolist()
+        self._size = size.tolist()
+        self._depth = depth.tolist()
+        self._left = left.tolist()
+        self._right = right.tolist()
+
+    def label_ids(self, labels):
+        """Ids (hash) de unas etiquetas de dependencia"""
+        labels = tuple(labels)
+        if labels not in self._label_ids:
+            strings = self.doc.vocab.strings
+            self._label_ids[labels] = [strings[name] for name in labels]
+        return self._label_ids[labels]
+
+    def _arcs(self, labels, pos=None):
+        """(padre, hijo) de los tokens con dependencia en `labels` (y POS `pos`), en orden de indice"""
+        ids = self.label_ids(labels)
+        if self._small:
+            heads = self._heads
+            tags = self._pos
+            return [
+                (heads[i], i) for i, dep in enumerate(self._deps)
+                if dep in ids and heads[i] != i and (pos is None or tags[i] == pos)
+            ]
+        # Pocas etiquetas: comparar una a una es mas rapido que numpy.isin
+        mask = self._heads != self._index
+        matches = numpy.zeros(len(mask), dtype=bool)
+        for label in ids:
+            matches |= self._deps == label
+        mask &= matches
+        if pos is not None:
+            mask &= self._pos == pos
+        children = numpy.flatnonzero(mask)
+        return list(zip(self._heads[children].tolist(), children.tolist()))
+
+    def verbs(self):
+        """Indices de los tokens con POS VERB"""
+        if self._small:
+            return [i for i, pos in enumerate(self._pos) if pos == VERB]
+        return numpy.flatnonzero(self._pos == VERB).tolist()
+
+    def dependents(self, labels):
+        """{token: [hijos con dependencia en `labels`]} en orden de indice"""
+        labels = tuple(labels)
+        if labels not in self._dependents:
+            grouped = {}
+            for head, child in self._arcs(labels):
+                if head in grouped:
+                    grouped[head].append(child)
+                else:
+                    grouped[head] = [child]
+            self._dependents[labels] = grouped
+        return self._dependents[labels]
+
+    def _clause_excluded(self):
+        """Conjunciones coordinantes que cortan las clausulas (dep cc/conj y POS CCONJ)"""
+        if self._excluded is None:
+            self._excluded = {child for _, child in self._arcs(CLAUSE_CUT_DEPS, CCONJ)}
+        return self._excluded
+
+    def _descendants(self, i, excluded=None):
+        """
+        Subarbol de i (incluido), sin ordenar. En docs pequeños (sin tablas),
+        con `excluded` se podan esos tokens y sus subarboles por debajo de i.
+        """
+        if not self._small:
+            self._tables()
+            start = self._preorder[i]
+            return self._by_preorder[start:start + self._size[i]]
+        if self._children is None:
+            self._children = _children(self._heads)[1]
+        children = self._children
+        tokens = []
+        stack = [i]
+        while stack:
+            t = stack.pop()
+            tokens.append(t)
+            below = children.get(t)
+            if below:
+                if excluded:
+                    stack.extend([c for c in below if c not in excluded])
+                else:
+                    stack.extend(below)
+        return tokens
+
+    def subtree(self, i):
+        """Indices (ordenados) del subarbol de i, incluido i"""
+        return sorted(self._descendants(i))
+
+    def _clause_cut(self):
+        """Conjuncion coordinante excluida mas cercana en cada camino a la raiz (docs grandes)"""
+        if self._cut is None:
+            self._tables()
+            excluded = self._clause_excluded()
+            heads = self._heads.tolist()
+            cut = [-1] * len(heads)
+            if excluded:
+                # En preorden el padre siempre se visita antes que sus hijos
+                for i in self._by_preorder:
+                    if i in excluded:
+                        cut[i] = i
+                    elif heads[i] != i:
+                        cut[i] = cut[heads[i]]
+            self._cut = cut
+        return self._cut
+
+    def clause(self, i):
+        """
+        Clausula de i: su subarbol sin las conjunciones coordinantes que dependen
+        de el (ni sus subarboles). Indices ordenados.
+        """
+        if self._small:
+            return sorted(self._descendants(i, self._clause_excluded()))
+        cut = self._clause_cut()
+        depth = self._depth
+        limit = depth[i]
+        return sorted(t for t in self._descendants(i) if cut[t] < 0 or depth[cut[t]] <= limit)
+
+    def phrase(self, i, labels):
+        """i + los subarboles de sus hijos con dependencia en `labels`. Indices ordenados."""
+        children = self.dependents(labels).get(i)
+        if not children:
+            return [i]
+        tokens = {i}
+        for child in children:
+            tokens.update(self._descendants(child))
+        return sorted(tokens)
+
+    def covering_span(self, i, labels):
+        """
+        (inicio, fin) en tokens del span que cubre i y los subarboles de sus hijos
+        con dependencia en `labels`, o None si no tiene ninguno.
+        """
+        children = self.dependents(labels).get(i)
+        if not children:
+            return None
+        if self._small:
+            tokens = [i]
+            for child in children:
+                tokens.extend(self._descendants(child))
+            return min(tokens), max(tokens) + 1
+        self._tables()
+        left = self._left
+        right = self._right
+        return min(i, min(left[c] for c in children)), max(i, max(right[c] for c in children)) + 1
+
+    def join(self, indices):
+        """Texto de los tokens separados por un espacio"""
+        texts = self.texts
+        return ' '.join([texts[i] for i in indices])
+
+
+def split_by_conjunctions(arrays, indices, min_tokens=5):
+    """
+    Divide una clausula larga por conjunciones coordinantes ('y', 'pero', 'and'...)
+    cuando el trozo actual tiene mas de `min_tokens` tokens. Devuelve listas de
+    indices (la conjuncion no se incluye) o [indices] si no hay division.
+    """
+    sub_clauses = []
+    current = []
+    texts = arrays.texts
+    for i in indices:
+        if len(current) > min_tokens and texts[i].lower() in CONJUNCTIONS:
+            sub_clauses.append(current)
+            current = []
+        else:
+            current.append(i)
+    if current:
+        sub_clauses.append(current)
+    return sub_clauses if len(sub_clauses) > 1 else [indices]
+
+
+def syntax_columns(view):
+    """
+    Analisis sintactico del Doc de un DocView (doc_view.py) en columnas
+    (struct-of-arrays):
+    - texts, spaces: texto de cada token y si le sigue un espacio (el texto
+      original es la concatenacion)
+    - deps, pos: ids en labels['dep'] / labels['pos'] (diccionario del documento)
+    - heads: indice del token padre en el documento (la raiz apunta a si misma)
+    - sentences: limites de oracion en tokens (n_oraciones + 1 valores)
+    - roots / root_lemmas: primer token ROOT de cada oracion (-1 / None si no hay)
+    """
+    doc = view.doc
+    n = len(doc)
+    strings = doc.vocab.strings
+    array = doc.to_array([HEAD, DEP, POS, ORTH, SPACY]).reshape(n, 5)
+    heads = numpy.arange(n, dtype=numpy.int64) + array[:, 0].astype(numpy.int64)
+    dep_hashes, deps = numpy.unique(array[:, 1], return_inverse=True)
+    pos_symbols, pos = numpy.unique(array[:, 2], return_inverse=True)
+    starts = view.sent_starts.tolist() if n else []
+    roots = [sent_roots[0] if sent_roots else -1 for sent_roots in view.roots] if n else []
+
+    return {
+        "labels": {
+            "dep": [strings[int(label)] if label else "" for label in dep_hashes.tolist()],
+            "pos": [strings[int(label)] if label else "" for label in pos_symbols.tolist()]
+        },
+        "texts": [strings[orth] for orth in array[:, 3].tolist()],
+        "spaces": array[:, 4].astype(bool).tolist(),
+        "deps": deps.tolist(),
+        "pos": pos.tolist(),
+        "heads": heads.tolist(),
+        "sentences": starts + [n],
+        "roots": roots,
+        "root_lemmas": [doc[i].lemma_ if i >= 0 else None for i in roots]
+    }
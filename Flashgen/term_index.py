@@ -0,0 +1,276 @@
+"""
+Indice de terminos de un corpus (vocabulario a nivel de mazo/libro)
+
+vocab_extract solo cuenta frecuencias dentro de una peticion. Este indice
+acumula, por corpus, los terminos de todos los documentos añadidos:
+- lemas de palabras de contenido (NOUN, PROPN, VERB, ADJ, ADV sin stopwords)
+- sintagmas nominales de 2+ palabras (como vocab_extract)
+
+Para cada termino guarda la frecuencia de documento (df), la frecuencia total
+(tf) y, por documento, su frecuencia y los offsets de caracteres de hasta
+MAX_EXAMPLES oraciones de ejemplo. Añadir un documento solo analiza ese
+documento: los contadores se actualizan de forma incremental (y se descuentan
+si se reemplaza o borra un documento), sin volver a procesar los anteriores.
+El texto de cada documento se guarda para devolver las oraciones de ejemplo.
+
+Configuracion por variables de entorno:
+- FLASHGEN_TERM_DB: ruta del fichero SQLite (":memory:" = sin persistencia)
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from doc_view import doc_view
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flashgen_terms.db")
+
+LEMMA = "lemma"
+NOUN_PHRASE = "noun_phrase"
+KINDS = (LEMMA, NOUN_PHRASE)
+
+CONTENT_POS = {"NOUN", "PROPN", "VERB", "ADJ", "ADV"}
+MAX_EXAMPLES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    corpus TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    lang TEXT,
+    text TEXT,
+    tokens INTEGER NOT NULL,
+    terms INTEGER NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (corpus, doc_id)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    corpus TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    df INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (corpus, kind, term)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    corpus TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    examples TEXT NOT NULL,
+    PRIMARY KEY (corpus, kind, term, doc_id)
+);
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (corpus, doc_id);
+"""
+
+
+def extract_terms(doc, max_examples=MAX_EXAMPLES):
+    """
+    Terminos de un Doc analizado: {(kind, term): {'tf', 'examples': [[start, end], ...]}}
+    con los offsets de caracteres de las oraciones de ejemplo.
+    """
+    terms = {}
+
+    def add(kind, term, sent):
+        entry = terms.setdefault((kind, term), {'tf': 0, 'examples': []})
+        entry['tf'] += 1
+        example = [sent.start_char, sent.end_char]
+        if len(entry['examples']) < max_examples and example not in entry['examples']:
+            entry['examples'].append(example)
+
+    view = doc_view(doc)
+    sentences = view.sents if doc.has_annotation("SENT_START") else [doc[:]]
+    noun_chunks = iter(view.noun_chunks) if doc.has_annotation("DEP") else iter(())
+    chunk = next(noun_chunks, None)
+    for sent in sentences:
+        for token in sent:
+            if token.pos_ in CONTENT_POS and token.is_alpha and not token.is_stop:
+                add(LEMMA, (token.lemma_ or token.text).lower(), sent)
+        # Los noun chunks llegan en orden: se asignan a la oracion de su primer token
+        while chunk is not None and chunk.start < sent.end:
+            term = chunk.text.lower().strip()
+            if len(term.split()) >= 2:
+                add(NOUN_PHRASE, term, sent)
+            chunk = next(noun_chunks, None)
+    return terms
+
+
+class TermIndex:
+    """Indice de terminos por corpus en SQLite (una conexion compartida protegida por lock)"""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("FLASHGEN_TERM_DB", DEFAULT_DB))
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _remove_document(self, corpus, doc_id):
+        """Descuenta los terminos de un documento (dentro de una transaccion abierta)"""
+        postings = self._conn.execute(
+            "SELECT kind, term, tf FROM postings WHERE corpus = ? AND doc_id = ?", (corpus, doc_id)
+        ).fetchall()
+        if not postings:
+            existed = self._conn.execute(
+                "DELETE FROM documents WHERE corpus = ? AND doc_id = ?", (corpus, doc_id)
+            ).rowcount
+            return bool(existed)
+        self._conn.executemany(
+            "UPDATE terms SET df = df - 1, tf = tf - ? WHERE corpus = ? AND kind = ? AND term = ?",
+            [(row["tf"], corpus, row["kind"], row["term"]) for row in postings]
+        )
+        self._conn.execute("DELETE FROM terms WHERE corpus = ? AND df <= 0", (corpus,))
+        self._conn.execute("DELETE FROM postings WHERE corpus = ? AND doc_id = ?", (corpus, doc_id))
+        self._conn.execute("DELETE FROM documents WHERE corpus = ? AND doc_id = ?", (corpus, doc_id))
+        return True
+
+    def add_document(self, corpus, terms, doc_id=None, lang=None, text=None, tokens=0):
+        """
+        Añade (o reemplaza, si doc_id ya existe) un documento con los terminos de
+        extract_terms. Devuelve {'doc_id', 'replaced', 'terms'}.
+        """
+        doc_id = doc_id or uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            replaced = self._remove_document(corpus, doc_id)
+            self._conn.execute(
+                "INSERT INTO documents (corpus, doc_id, lang, text, tokens, terms, added) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (corpus, doc_id, lang, text, tokens, len(terms), time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (corpus, kind, term, doc_id, tf, examples) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (corpus, kind, term, doc_id, entry['tf'], json.dumps(entry['examples']))
+                    for (kind, term), entry in terms.items()
+                ]
+            )
+            self._conn.executemany(
+                "INSERT INTO terms (corpus, kind, term, df, tf) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (corpus, kind, term) DO UPDATE SET df = df + 1, tf = tf + excluded.tf",
+                [(corpus, kind, term, entry['tf']) for (kind, term), entry in terms.items()]
+            )
+        return {"doc_id": doc_id, "replaced": replaced, "terms": len(terms)}
+
+    def remove_document(self, corpus, doc_id):
+        """Quita un documento del corpus. False si no existia."""
+        with self._lock, self._conn:
+            return self._remove_document(corpus, doc_id)
+
+    def drop_corpus(self, corpus):
+        with self._lock, self._conn:
+            documents = self._conn.execute("DELETE FROM documents WHERE corpus = ?", (corpus,)).rowcount
+            self._conn.execute("DELETE FROM postings WHERE corpus = ?", (corpus,))
+            self._conn.execute("DELETE FROM terms WHERE corpus = ?", (corpus,))
+        return documents
+
+    def corpora(self):
+        rows = self._execute(
+            "SELECT corpus, COUNT(*) AS documents, SUM(tokens) AS tokens FROM documents GROUP BY corpus"
+        )
+        return [dict(row) for row in rows]
+
+    def stats(self, corpus):
+        """Documentos, tokens y terminos de un corpus (None si no existe)"""
+        row = self._execute(
+            "SELECT COUNT(*) AS documents, COALESCE(SUM(tokens), 0) AS tokens FROM documents WHERE corpus = ?",
+            (corpus,)
+        )[0]
+        if not row["documents"]:
+            return None
+        terms = self._execute(
+            "SELECT kind, COUNT(*) AS n FROM terms WHERE corpus = ? GROUP BY kind", (corpus,)
+        )
+        documents = self._execute(
+            "SELECT doc_id, lang, tokens, terms, added FROM documents WHERE corpus = ? ORDER BY added",
+            (corpus,)
+        )
+        return {
+            "corpus": corpus,
+            "documents": row["documents"],
+            "tokens": row["tokens"],
+            "terms": {r["kind"]: r["n"] for r in terms},
+            "document_list": [dict(r) for r in documents]
+        }
+
+    def top_terms(self, corpus, k=50, kind=None, doc_id=None, min_df=1, examples=True):
+        """
+        Top-k terminos por TF-IDF: tf * (ln((1 + N) / (1 + df)) + 1), con N documentos
+        del corpus. Con doc_id, tf es la frecuencia en ese documento (terminos
+        caracteristicos del documento frente al corpus); sin el, la del corpus.
+        """
+        n_docs = self._execute("SELECT COUNT(*) AS n FROM documents WHERE corpus = ?", (corpus,))[0]["n"]
+        if not n_docs:
+            return []
+        params = [corpus, min_df]
+        kind_filter = ""
+        if kind:
+            kind_filter = " AND t.kind = ?"
+            params.append(kind)
+        if doc_id:
+            rows = self._execute(
+                "SELECT t.kind, t.term, t.df, p.tf FROM postings p JOIN terms t "
+                "ON t.corpus = p.corpus AND t.kind = p.kind AND t.term = p.term "
+                "WHERE t.corpus = ? AND t.df >= ?" + kind_filter + " AND p.doc_id = ?",
+                params + [doc_id]
+            )
+        else:
+            rows = self._execute(
+                "SELECT t.kind, t.term, t.df, t.tf FROM terms t WHERE t.corpus = ? AND t.df >= ?" + kind_filter,
+                params
+            )
+        scored = []
+        for row in rows:
+            idf = math.log((1 + n_docs) / (1 + row["df"])) + 1
+            scored.append({
+                "term": row["term"],
+                "kind": row["kind"],
+                "tf": row["tf"],
+                "df": row["df"],
+                "tfidf": round(row["tf"] * idf, 4)
+            })
+        scored.sort(key=lambda item: (-item["tfidf"], item["term"]))
+        top = scored[:k]
+        if examples:
+            for item in top:
+                item["examples"] = self.examples(corpus, item["kind"], item["term"], doc_id)
+        return top
+
+    def examples(self, corpus, kind, term, doc_id=None, limit=MAX_EXAMPLES):
+        """Oraciones de ejemplo de un termino: [{'doc_id', 'start', 'end', 'text'}]"""
+        sql = (
+            "SELECT p.doc_id, p.examples, d.text FROM postings p JOIN documents d "
+            "ON d.corpus = p.corpus AND d.doc_id = p.doc_id "
+            "WHERE p.corpus = ? AND p.kind = ? AND p.term = ?"
+        )
+        params = [corpus, kind, term]
+        if doc_id:
+            sql += " AND p.doc_id = ?"
+            params.append(doc_id)
+        sql += " ORDER BY d.added LIMIT ?"
+        params.append(limit)
+        result = []
+        for row in self._execute(sql, params):
+            for start, end in json.loads(row["examples"]):
+                if len(result) >= limit:
+                    return result
+                result.append({
+                    "doc_id": row["doc_id"],
+                    "start": start,
+                    "end": end,
+                    "text": row["text"][start:end].strip() if row["text"] is not None else None
+                })
+        return result
@@ -0,0 +1,149 @@
+"""
+Pool de procesos para el analisis spaCy
+
+spaCy retiene el GIL durante buena parte del analisis, asi que con el
+threadpool de FastAPI las peticiones concurrentes se serializan en un nucleo.
+Con FLASHGEN_WORKERS > 0 los handlers envian cada trabajo (analisis +
+segmentacion/enriquecimiento) a uno de N procesos, cada uno con sus propios
+modelos cargados.
+
+Configuracion por variables de entorno:
+- FLASHGEN_WORKERS: numero de procesos (0 = desactivado, modo threadpool)
+- FLASHGEN_WORKER_QUEUE: trabajos admitidos a la vez, en cola o en ejecucion;
+  por encima se responde 503 (por defecto 4 x FLASHGEN_WORKERS)
+- FLASHGEN_WORKER_TIMEOUT: segundos maximos de espera por trabajo (504)
+- FLASHGEN_WORKER_START: "spawn" (carga perezosa por proceso), "fork"
+  (hereda los modelos ya cargados en el proceso principal) o "forkserver"
+
+Los trabajos usan el modulo server que ya esta cargado en el proceso: "server"
+con uvicorn server:app y "__main__" (o "__mp_main__" con spawn) con
+python server.py. Asi no se importa una segunda copia con su propio registro,
+caches y metricas, y con fork se heredan los modelos en los dos casos.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+WORKER_ENV = "FLASHGEN_WORKER_PROCESS"
+
+
+class WorkerPoolFull(Exception):
+    """La cola del pool esta llena"""
+
+
+def in_worker():
+    """True dentro de un proceso hijo (para no precargar ni crear pools anidados)"""
+    # Con spawn el hijo ejecuta __main__ (python server.py) antes de conocer a su
+    # padre, pero ya con su nombre de proceso
+    return (
+        os.environ.get(WORKER_ENV) == "1"
+        or multiprocessing.parent_process() is not None
+        or multiprocessing.current_process().name != "MainProcess"
+    )
+
+
+def _server():
+    """Modulo server.py ya cargado en el proceso (importado o como programa principal)"""
+    for name in ("server", "__main__", "__mp_main__"):
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, "run_pool_job"):
+            return module
+    import server
+    return server
+
+
+def _init_worker(preload):
+    os.environ[WORKER_ENV] = "1"
+    _server().registry.preload(preload)
+
+
+def _run_job(kind, payload, profile=False):
+    """Ejecuta un handler sincrono de server.py dentro del proceso trabajador"""
+    return _server().run_pool_job(kind, payload, profile)
+
+
+class WorkerPool:
+    """ProcessPoolExecutor con cola acotada y timeout por trabajo"""
+
+    def __init__(self, workers, max_queue=None, timeout=None, start_method="spawn", preload=None):
+        self.workers = workers
+        self.max_queue = max_queue or workers * 4
+        self.timeout = timeout
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(list(preload or []),)
+        )
+
+    @classmethod
+    def from_env(cls, preload=None):
+        """Crea el pool si FLASHGEN_WORKERS > 0 (None en otro caso o dentro de un worker)"""
+        workers = int(os.environ.get("FLASHGEN_WORKERS", "0") or 0)
+        if workers <= 0 or in_worker():
+            return None
+        max_queue = int(os.environ.get("FLASHGEN_WORKER_QUEUE", "0") or 0) or None
+        timeout = float(os.environ.get("FLASHGEN_WORKER_TIMEOUT", "0") or 0) or None
+        start_method = os.environ.get("FLASHGEN_WORKER_START", "spawn")
+        print(f"🧵 Pool de {workers} procesos spaCy ({start_method}, cola {max_queue or workers * 4})")
+        return cls(workers, max_queue=max_queue, timeout=timeout, start_method=start_method, preload=preload)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    async def run(self, kind, payload, profile=False):
+        """
+        Envia un trabajo al pool y espera su resultado sin bloquear el event loop
+        (con profile=True el trabajo se perfila en el proceso hijo).
+        Lanza WorkerPoolFull si la cola esta llena y asyncio.TimeoutError si se
+        supera el timeout (el proceso termina el trabajo, pero su resultado se descarta).
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise WorkerPoolFull(f"Cola de trabajos llena ({self.max_queue})")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(_run_job, kind, payload, profile)
+        except Exception:
+            self._release(None)
+            raise
+        # El hueco se libera cuando el trabajo termina de verdad, no al expirar el timeout
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "start_method": self.start_method,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "timeout": self.timeout
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)